@@ -0,0 +1,146 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Parser of the body of the ATAB station files.
+
+The numeric columns of the body after the PARAMETER line are parsed by
+the C reader of np.loadtxt, the PARAMETER column is taken from the lines
+of the memory-mapped file, and the timestamps are assembled vectorially
+from the YYYY MM DD hh mm columns. Two column
+layouts are supported:
+    obs: PARAMETER YYYY MM DD hh mm <stations>
+    mod: PARAMETER LEVTYPE LEVEL YYYY MM DD hh mm <stations>
+"""
+
+# Standard library
+import mmap
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np  # type: ignore
+
+# First-party
+from realtime_pollen_calibration.errors import CalibrationError
+
+AtabBody = namedtuple("AtabBody", ["parameters", "times", "values"])
+Window = namedtuple("Window", ["times", "values", "present"])
+
+# Index of the YYYY column and of the first station column per layout
+layouts = {"obs": (1, 6), "mod": (3, 8)}
+
+
+def get_times(date_columns) -> np.ndarray:
+    """Assemble timestamps from integer YYYY MM DD hh mm columns.
+
+    Args:
+        date_columns: Integer array of shape (nrows, 5).
+
+    Returns:
+        Array of datetime64[m].
+
+    """
+    year, month, day, hour, minute = date_columns.T
+    months = (year - 1970) * 12 + month - 1
+    days = np.asarray(months, dtype="datetime64[M]").astype("datetime64[D]")
+    return days.astype("datetime64[m]") + (day - 1) * 1440 + hour * 60 + minute
+
+
+def read_body(file_data: str, n_header: int, layout: str = "obs") -> AtabBody:
+    """Read the body of an ATAB file.
+
+    Args:
+        file_data: Location of the ATAB file.
+        n_header: Line number of the PARAMETER line.
+        layout: "obs" for the observation file, "mod" for the model file.
+
+    Returns:
+        parameters: Array of the PARAMETER column (pollen types).
+        times: Array of datetime64[m] of the rows.
+        values: Array of shape (nrows, nstns) of the station values.
+
+    """
+    first_date, first_value = layouts[layout]
+    with open(file_data, "rb") as fh, mmap.mmap(
+        fh.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        pos = 0
+        for _ in range(n_header + 1):
+            pos = mm.find(b"\n", pos) + 1
+        ncols = len(mm[mm.rfind(b"\n", 0, pos - 1) + 1 : pos].split())
+        # The PARAMETER column is the only text column needed
+        parameters = np.array(
+            [line.split(None, 1)[0] for line in mm[pos:].splitlines() if line.strip()]
+        ).astype(str)
+    try:
+        # Numeric columns are parsed by the C reader of NumPy
+        table = np.loadtxt(
+            file_data,
+            skiprows=n_header + 1,
+            usecols=range(first_date, ncols),
+            ndmin=2,
+        )
+    except ValueError as err:
+        raise CalibrationError(
+            f"The body of {file_data} does not match its PARAMETER line: {err}"
+        ) from err
+    return AtabBody(
+        parameters,
+        get_times(table[:, :5].astype(np.int64)),
+        table[:, first_value - first_date :],
+    )
+
+
+@lru_cache(maxsize=8)
+def _read_body_cached(file_data, n_header, layout, mtime_ns, size):
+    # pylint: disable=unused-argument
+    body = read_body(file_data, n_header, layout)
+    for array in body:
+        array.flags.writeable = False
+    return body
+
+
+def get_body(file_data: str, n_header: int, layout: str = "obs") -> AtabBody:
+    """Read the body of an ATAB file, parsed only once per file version.
+
+    The arrays are read-only, they are shared by all callers in the process.
+    """
+    stat = os.stat(file_data)
+    return _read_body_cached(
+        os.path.realpath(file_data), n_header, layout, stat.st_mtime_ns, stat.st_size
+    )
+
+
+def build_window(  # pylint: disable=too-many-positional-arguments,too-many-arguments
+    times, values, end_time, nhours: int = 120, fill_value: float = np.nan
+) -> Window:
+    """Align rows on an hourly window ending at end_time.
+
+    Args:
+        times: Array of datetime64 of the rows.
+        values: Array (nrows, nstns) of the rows.
+        end_time: Last hour of the window (datetime64).
+        nhours: Length of the window in hours.
+        fill_value: Value of the hours without a row.
+
+    Returns:
+        times: Array (nhours,) of the hours of the window, oldest first.
+        values: Array (nhours, nstns) of the values of each hour.
+        present: Mask (nhours,) of the hours found in the rows.
+
+    """
+    end_time = np.datetime64(end_time, "m")
+    window_times = end_time - np.arange(nhours - 1, -1, -1) * np.timedelta64(60, "m")
+    offset = (np.asarray(times, dtype="datetime64[m]") - window_times[0]).astype(
+        np.int64
+    )
+    hour = offset // 60
+    inside = (offset % 60 == 0) & (hour >= 0) & (hour < nhours)
+    window = np.full((nhours, values.shape[1]), fill_value, dtype=np.float64)
+    window[hour[inside]] = values[inside]
+    present = np.zeros(nhours, dtype=bool)
+    present[hour[inside]] = True
+    return Window(window_times, window, present)
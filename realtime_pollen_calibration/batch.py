@@ -0,0 +1,161 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Run several calibration jobs (grids, products) in one process."""
+
+# Standard library
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+# First-party
+from realtime_pollen_calibration import result_cache
+from realtime_pollen_calibration.cache import grid_cache
+from realtime_pollen_calibration.set_up import config_from_dict, set_up_config
+from realtime_pollen_calibration.update_phenology import update_phenology_realtime
+from realtime_pollen_calibration.update_strength import update_strength_realtime
+from realtime_pollen_calibration.utils import CalibrationError
+
+Job = namedtuple("Job", ["name", "mode", "config_obj"])
+JobResult = namedtuple("JobResult", ["name", "mode", "ok", "message", "duration"])
+
+# Weight operators kept in cache.grid_cache during a batch run
+batch_operators = 4
+
+modes = {
+    "phenology": update_phenology_realtime,
+    "strength": update_strength_realtime,
+}
+
+
+def read_batch_config(batch_file: str):
+    """Read the jobs of a batch yaml file.
+
+    The file lists the jobs, each with a name, a mode (phenology or
+    strength) and either the path of its yaml configuration file or the
+    configuration entries inline:
+
+        max_workers: 2
+        jobs:
+          - name: icon-ch1-strength
+            mode: strength
+            config: <path>/config_ch1.yaml
+          - name: icon-ch2-strength
+            mode: strength
+            config:
+              pov_infile: <path>/ART_POV_iconR19B08-grid_0002.gb2
+              ...
+
+    Args:
+        batch_file: yaml batch configuration file.
+
+    Returns:
+        jobs: List of Job.
+        max_workers: Maximum number of jobs running at the same time.
+
+    Raises:
+        CalibrationError: If the batch file or the config of a job is invalid.
+
+    """
+    with open(batch_file, "r", encoding="utf-8") as fh_batch_file:
+        data = yaml.safe_load(fh_batch_file)
+
+    if not isinstance(data, dict) or not isinstance(data.get("jobs"), list):
+        raise CalibrationError(f"The batch file {batch_file} must list the jobs.")
+    jobs = []
+    for ijob, entry in enumerate(data["jobs"]):
+        name = entry.get("name", f"job{ijob}")
+        if "config" not in entry:
+            raise CalibrationError(f"Job {name} has no config.")
+        if entry.get("mode") not in modes:
+            raise CalibrationError(
+                f"Mode of job {name} must be one of {list(modes)}, "
+                f"not {entry.get('mode')}."
+            )
+        if isinstance(entry["config"], dict):
+            config_obj = config_from_dict(entry["config"])
+        else:
+            config_obj = set_up_config(entry["config"])
+        jobs.append(Job(name, entry["mode"], config_obj))
+    return jobs, data.get("max_workers", 1)
+
+
+def run_job(job: Job, verbose: bool = True, use_cache: bool = True) -> JobResult:
+    """Run a single job, failures are reported instead of raised."""
+    start = time.perf_counter()
+    try:
+        result_cache.run_cached(
+            job.config_obj,
+            job.mode,
+            lambda: modes[job.mode](job.config_obj, verbose),
+            use_cache,
+        )
+    except CalibrationError as err:
+        # Invalid input data of a job must not stop the other jobs
+        return JobResult(
+            job.name, job.mode, False, str(err), time.perf_counter() - start
+        )
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        return JobResult(
+            job.name,
+            job.mode,
+            False,
+            f"{type(err).__name__}: {err}",
+            time.perf_counter() - start,
+        )
+    return JobResult(job.name, job.mode, True, "", time.perf_counter() - start)
+
+
+def run_batch(
+    jobs: list, max_workers: int = 1, verbose: bool = True, use_cache: bool = True
+) -> list:
+    """Run the jobs concurrently.
+
+    The jobs run in threads of the same process, so the grid geometry,
+    the station cells and the weight operators (see cache.grid_cache) are
+    computed only once per grid.
+
+    Args:
+        jobs: List of Job.
+        max_workers: Maximum number of jobs running at the same time.
+        verbose: Optional additional debug prints.
+        use_cache: False to ignore the result cache of the jobs.
+
+    Returns:
+        List of JobResult in the order of jobs.
+
+    """
+    # The weight operators are only kept while jobs on the same grid can
+    # share them
+    grid_cache.set_max_operators(batch_operators)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            return list(
+                executor.map(lambda job: run_job(job, verbose, use_cache), jobs)
+            )
+    finally:
+        grid_cache.set_max_operators(0)
+
+
+def print_report(results: list) -> bool:
+    """Print the report of a batch run.
+
+    Returns:
+        True if all jobs succeeded.
+
+    """
+    print("=== Batch report ===")
+    for result in results:
+        status = "OK" if result.ok else "FAILED"
+        print(
+            f"{result.name} ({result.mode}): {status} "
+            f"after {result.duration:.1f}s {result.message}"
+        )
+    nfailed = sum(not result.ok for result in results)
+    print(f"{len(results) - nfailed} of {len(results)} jobs succeeded.")
+    return nfailed == 0
@@ -0,0 +1,137 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Process-wide cache of grid geometry, station cells, remaps and weight operators."""
+
+# Standard library
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class GridCache:
+    """Cache of the grid dependent data shared by the calibration jobs.
+
+    All entries are keyed by the grid (path of the const_file), so that
+    several jobs on the same grid running in one process compute them
+    only once. The values are produced by the compute callables passed
+    to the getters on a cache miss. The compute callables run outside of
+    the lock of the cache, concurrent getters of the same entry wait for
+    its first computation, the others are not blocked.
+    """
+
+    def __init__(self, max_operators: int = 0):
+        self.max_operators = max_operators
+        self._lock = threading.Lock()
+        self._pending: dict = {}
+        self._geometry: dict = {}
+        self._unit_vectors: dict = {}
+        self._station_cells: dict = {}
+        self._remaps: dict = {}
+        self._operators: OrderedDict = OrderedDict()
+
+    def _get(self, store: dict, key, compute, keep: bool = True):
+        """Get an entry of store, computed once by the first getter.
+
+        Args:
+            store: One of the dicts of the entries.
+            key: Key of the entry in store.
+            compute: Callable computing the entry on a miss.
+            keep: False to return the computed entry without storing it.
+
+        """
+        with self._lock:
+            if key in store:
+                return store[key]
+            pending = self._pending.get((id(store), key))
+            owner = pending is None
+            if owner:
+                pending = self._pending[id(store), key] = Future()
+        if not owner:
+            return pending.result()
+        try:
+            value = compute()
+        except BaseException as err:
+            with self._lock:
+                del self._pending[id(store), key]
+            pending.set_exception(err)
+            raise
+        with self._lock:
+            if keep:
+                store[key] = value
+            del self._pending[id(store), key]
+        pending.set_result(value)
+        return value
+
+    def geometry(self, grid_key: str, compute):
+        """Get (clon, clat) of a grid."""
+        return self._get(self._geometry, grid_key, compute)
+
+    def unit_vectors(self, grid_key: str, compute):
+        """Get the 3D unit vectors of the cells of a grid."""
+        return self._get(self._unit_vectors, grid_key, compute)
+
+    def remap(self, grid_key: str, step: float, compute):
+        """Get the remap of a coarse mesh to the cells of a grid."""
+        return self._get(self._remaps, (grid_key, step), compute)
+
+    def station_cell(
+        self, grid_key: str, coords: tuple, compute, metric: str = "equirectangular"
+    ) -> int:
+        """Get the index of the grid cell closest to a station."""
+        key = (grid_key, float(coords[0]), float(coords[1]), metric)
+        return self._get(self._station_cells, key, compute)
+
+    def station_cells(self, grid_key: str, metric: str) -> dict:
+        """Get all known station cells of a grid as {(lat, lon): cell}."""
+        with self._lock:
+            return {
+                (key[1], key[2]): cell
+                for key, cell in self._station_cells.items()
+                if key[0] == grid_key and key[3] == metric
+            }
+
+    def preload_station_cells(self, grid_key: str, metric: str, cells: dict) -> None:
+        """Add station cells known from a previous run, {(lat, lon): cell}."""
+        with self._lock:
+            for coords, cell in cells.items():
+                key = (grid_key, float(coords[0]), float(coords[1]), metric)
+                self._station_cells.setdefault(key, cell)
+
+    def weight_operator(self, grid_key: str, key: tuple, compute):
+        """Get a (nstns, ncells) weight operator of the interpolation.
+
+        The operators are large, only the max_operators most recently
+        used ones are kept (none by default, see set_max_operators).
+        """
+        key = (grid_key,) + key
+        with self._lock:
+            if key in self._operators:
+                self._operators.move_to_end(key)
+                return self._operators[key]
+        operator = self._get(
+            self._operators, key, compute, keep=self.max_operators > 0
+        )
+        self.set_max_operators(self.max_operators)
+        return operator
+
+    def set_max_operators(self, max_operators: int) -> None:
+        """Set the number of weight operators kept, the oldest are removed."""
+        with self._lock:
+            self.max_operators = max_operators
+            while len(self._operators) > max_operators:
+                self._operators.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._geometry.clear()
+            self._unit_vectors.clear()
+            self._station_cells.clear()
+            self._remaps.clear()
+            self._operators.clear()
+
+
+grid_cache = GridCache()
@@ -0,0 +1,146 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Checkpoints of the stages of the calibration.
+
+The calibration runs in stages (loading of the GRIB fields, reading of the
+station data, changes at the stations, interpolation, writing of the
+output). With checkpoint_dir set, the outputs of each stage are saved as an
+.npz file named after the key of the run (see result_cache.get_key), i.e. of
+the content of the input files and of the settings. A run with resume
+loads the outputs of the completed stages of the same key instead of
+computing them again. The checkpoints are removed once the output file is
+written.
+"""
+
+# Standard library
+import glob
+import os
+import threading
+
+import numpy as np  # type: ignore
+
+# First-party
+from realtime_pollen_calibration import result_cache, utils
+
+
+class Checkpoints:
+    """Checkpoints of the stages of one run, inactive without checkpoint_dir."""
+
+    def __init__(self, config_obj: utils.Config, mode: str, resume: bool = False):
+        self.directory = config_obj.checkpoint_dir
+        self.resume = resume
+        self.key = None
+        if not self.directory or config_obj.ensemble:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            self.key = result_cache.get_key(config_obj, mode, self.directory)
+        except FileNotFoundError:
+            # Missing inputs are reported by the input checks
+            return
+        if not resume:
+            self.clear()
+
+    @classmethod
+    def inactive(cls):
+        """Checkpoints saving and loading nothing, e.g. for in-memory runs."""
+        return cls(utils.Config(), "")
+
+    def path(self, stage: str) -> str:
+        return os.path.join(self.directory, f"{self.key}.{stage}.npz")
+
+    def load(self, stage: str):
+        """Get the arrays of a completed stage, None if it has to be run."""
+        if self.key is None or not self.resume:
+            return None
+        try:
+            with np.load(self.path(stage)) as data:
+                arrays = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            return None
+        print(f"Stage {stage} resumed from {self.path(stage)}.")
+        return arrays
+
+    def save(self, stage: str, arrays: dict) -> None:
+        """Save the arrays of a completed stage."""
+        if self.key is None:
+            return
+        tmp = f"{self.path(stage)}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmp, self.path(stage))
+
+    def run(self, stage: str, compute, pack, unpack):
+        """Run a stage, or load its outputs if it was completed before.
+
+        Args:
+            stage: Name of the stage.
+            compute: Callable computing the outputs of the stage.
+            pack: Callable converting the outputs to a dict of arrays.
+            unpack: Callable converting the dict of arrays to the outputs.
+
+        Returns:
+            Outputs of the stage.
+
+        """
+        arrays = self.load(stage)
+        if arrays is not None:
+            return unpack(arrays)
+        outputs = compute()
+        self.save(stage, pack(outputs))
+        return outputs
+
+    def clear(self) -> None:
+        """Remove the checkpoints of the run."""
+        if self.key is None:
+            return
+        for path in glob.glob(os.path.join(self.directory, f"{self.key}.*.npz")):
+            os.remove(path)
+
+
+def pack_fields(fields: dict) -> dict:
+    """Convert {name: field} to arrays (dask arrays are computed)."""
+    return {name: np.asarray(values) for name, values in fields.items()}
+
+
+def unpack_fields(arrays: dict) -> dict:
+    return dict(arrays)
+
+
+def pack_records(records: dict) -> dict:
+    """Convert {pollen_type: namedtuple} to arrays named <pollen_type>.<field>.
+
+    Fields set to None (e.g. no model data in the phenology) are left out,
+    they cannot be loaded without pickle.
+    """
+    return {
+        f"{pollen_type}.{name}": np.asarray(value)
+        for pollen_type, record in records.items()
+        for name, value in record._asdict().items()
+        if value is not None
+    }
+
+
+def unpack_records(arrays: dict, record_type) -> dict:
+    """Convert the arrays of pack_records back to {pollen_type: record_type}.
+
+    Fields missing from the arrays get the default of record_type (None).
+    """
+    records = {}
+    for pollen_type in dict.fromkeys(name.split(".")[0] for name in arrays):
+        values = []
+        for name in record_type._fields:
+            value = arrays.get(f"{pollen_type}.{name}")
+            if value is None:
+                value = record_type._field_defaults.get(name)
+            elif name == "coord_stns":
+                value = list(zip(*value.reshape(-1, 2).T))
+            elif value.ndim == 0:
+                value = value[()]
+            values.append(value)
+        records[pollen_type] = record_type(*values)
+    return records
@@ -1,12 +1,25 @@
 """Command line interface of realtime_pollen_calibration."""
 
+# Standard library
+import functools
+import sys
+
 import click
 
 # First-party
+from realtime_pollen_calibration import planner, result_cache
+from realtime_pollen_calibration.batch import print_report, read_batch_config, run_batch
 from realtime_pollen_calibration.set_up import set_up_config
+from realtime_pollen_calibration.sweep import default_eps_vals, print_sweep, sweep_strength
 from realtime_pollen_calibration.update_phenology import update_phenology_realtime
 from realtime_pollen_calibration.update_strength import update_strength_realtime
-from realtime_pollen_calibration.utils import Config
+from realtime_pollen_calibration.utils import (
+    CalibrationError,
+    Config,
+    ipstyles,
+    weighting_types,
+)
+from realtime_pollen_calibration.validation import print_scores, validate
 
 # Local
 from . import __version__
@@ -20,6 +33,20 @@ def print_version(ctx, param, value: bool) -> None:
         ctx.exit(0)
 
 
+def exit_on_error(command):
+    """Print the CalibrationError raised by a command and exit with status 1."""
+
+    @functools.wraps(command)
+    def wrapper(*args, **kwargs):
+        try:
+            return command(*args, **kwargs)
+        except CalibrationError as err:
+            print(err)
+            sys.exit(1)
+
+    return wrapper
+
+
 @click.option(
     "--version",
     "-V",
@@ -33,29 +60,204 @@ def main():
     pass
 
 
+no_cache_option = click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Run the calibration even if its result is in the result cache.",
+)
+
+resume_option = click.option(
+    "--resume",
+    is_flag=True,
+    help="Skip the stages completed by a previous run (needs checkpoint_dir).",
+)
+
+dry_run_option = click.option(
+    "--dry-run",
+    is_flag=True,
+    help="Print the execution plan and its estimated memory and time, without running.",
+)
+
+
 @main.command("update_phenology")
 @click.argument("config_file", type=click.Path(exists=True, readable=True))
-def update_phenology(config_file):
+@no_cache_option
+@resume_option
+@dry_run_option
+@exit_on_error
+def update_phenology(config_file, no_cache, resume, dry_run):
     """Configure and call update_phenology_realtime.
 
     Args:
         config_file (str): yaml configuration file
+        no_cache (bool): ignore the result cache
+        resume (bool): resume from the checkpoints of a previous run
+        dry_run (bool): only print the execution plan
 
     """
     config_obj: Config = set_up_config(config_file)
 
-    update_phenology_realtime(config_obj, True)
+    if dry_run:
+        planner.dry_run(config_obj, "phenology")
+        return
+
+    result_cache.run_cached(
+        config_obj,
+        "phenology",
+        lambda: update_phenology_realtime(config_obj, True, resume),
+        use_cache=not no_cache,
+    )
 
 
 @main.command("update_strength")
 @click.argument("config_file", type=click.Path(exists=True, readable=True))
-def update_strength(config_file):
+@no_cache_option
+@resume_option
+@dry_run_option
+@exit_on_error
+def update_strength(config_file, no_cache, resume, dry_run):
     """Configure and call update_strength_realtime.
 
     Args:
         config_file (str): yaml configuration file
+        no_cache (bool): ignore the result cache
+        resume (bool): resume from the checkpoints of a previous run
+        dry_run (bool): only print the execution plan
+
+    """
+    config_obj: Config = set_up_config(config_file)
+
+    if dry_run:
+        planner.dry_run(config_obj, "strength")
+        return
+
+    result_cache.run_cached(
+        config_obj,
+        "strength",
+        lambda: update_strength_realtime(config_obj, True, resume),
+        use_cache=not no_cache,
+    )
+
+
+@main.command("batch")
+@click.argument("batch_file", type=click.Path(exists=True, readable=True))
+@click.option(
+    "--max-workers",
+    type=int,
+    default=None,
+    help="Maximum number of jobs running at the same time (overrides the file).",
+)
+@no_cache_option
+@exit_on_error
+def batch(batch_file, max_workers, no_cache):
+    """Run all calibration jobs of a batch file in one process.
+
+    Args:
+        batch_file (str): yaml batch configuration file
+        max_workers (int): maximum number of concurrent jobs
+        no_cache (bool): ignore the result cache
+
+    """
+    jobs, max_workers_file = read_batch_config(batch_file)
+
+    results = run_batch(jobs, max_workers or max_workers_file, use_cache=not no_cache)
+
+    if not print_report(results):
+        sys.exit(1)
+
+
+@main.command("sweep")
+@click.argument("config_file", type=click.Path(exists=True, readable=True))
+@click.option(
+    "--ipstyle",
+    "ipstyle_list",
+    multiple=True,
+    type=click.Choice(ipstyles),
+    default=ipstyles,
+    help="Interpolation style to evaluate (repeatable).",
+)
+@click.option(
+    "--eps-val",
+    "eps_val_list",
+    multiple=True,
+    type=float,
+    default=default_eps_vals,
+    help="Value of eps_val to evaluate (repeatable).",
+)
+@click.option(
+    "--weighting-type",
+    "weighting_type_list",
+    multiple=True,
+    default=weighting_types,
+    help="Weighting type to evaluate, built-in or defined in weighting_kernels (repeatable).",
+)
+@click.option("--output", type=click.Path(), default="", help="Save the scores as csv.")
+@exit_on_error
+def sweep(config_file, ipstyle_list, eps_val_list, weighting_type_list, output):
+    """Score combinations of ipstyle, eps_val and weighting_type for update_strength.
+
+    Args:
+        config_file (str): yaml configuration file
+        ipstyle_list (tuple): interpolation styles
+        eps_val_list (tuple): values of eps_val
+        weighting_type_list (tuple): weighting types
+        output (str): optional csv file for the scores
 
     """
     config_obj: Config = set_up_config(config_file)
 
-    update_strength_realtime(config_obj, True)
+    results = sweep_strength(
+        config_obj, ipstyle_list, eps_val_list, weighting_type_list
+    )
+
+    print_sweep(results, output)
+
+
+@main.command("validate")
+@click.argument("config_file", type=click.Path(exists=True, readable=True))
+@click.option(
+    "--mode",
+    type=click.Choice(["strength", "phenology"]),
+    default="strength",
+    help="Validate the change of tune (strength) or of the phenological fields.",
+)
+@click.option(
+    "--station-obs-file",
+    "station_obs_files",
+    multiple=True,
+    type=click.Path(exists=True, readable=True),
+    help="Observation ATAB file of one hour (repeatable, hindcast mode).",
+)
+@click.option(
+    "--station-mod-file",
+    "station_mod_files",
+    multiple=True,
+    type=click.Path(exists=True, readable=True),
+    help="Model ATAB file of the same hour (repeatable, hindcast mode).",
+)
+@click.option("--output", type=click.Path(), default="", help="Save the scores as csv.")
+@exit_on_error
+def validate_command(config_file, mode, station_obs_files, station_mod_files, output):
+    """Leave-one-station-out cross-validation of the interpolated changes.
+
+    Args:
+        config_file (str): yaml configuration file
+        mode (str): strength or phenology
+        station_obs_files (tuple): observation ATAB files of the hindcast hours
+        station_mod_files (tuple): model ATAB files of the hindcast hours
+        output (str): optional csv file for the scores
+
+    """
+    config_obj: Config = set_up_config(config_file)
+
+    station_files = None
+    if station_obs_files:
+        if mode == "phenology" and not station_mod_files:
+            station_mod_files = ("",) * len(station_obs_files)
+        if len(station_obs_files) != len(station_mod_files):
+            raise click.BadParameter(
+                "--station-obs-file and --station-mod-file must be given the same number of times."
+            )
+        station_files = list(zip(station_obs_files, station_mod_files))
+
+    print_scores(validate(config_obj, mode, station_files), output)
@@ -0,0 +1,112 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Coarse regular lat/lon mesh and its bilinear remap to the grid cells.
+
+The interpolation kernels are smooth on the scale of eps_val (about 1
+degree), so the interpolated change can be evaluated on a regular mesh
+covering the grid, with a step much larger than the cells, and remapped
+bilinearly to the cells. The remap weights only depend on the grid and the
+step of the mesh, they are computed once per grid.
+"""
+
+# Standard library
+from collections import namedtuple
+
+import numpy as np  # type: ignore
+
+Mesh = namedtuple("Mesh", ["latitude", "longitude"])
+Remap = namedtuple("Remap", ["mesh", "nodes", "weights"])
+
+# Number of cells at which the remapped interpolation is checked
+nsamples = 1000
+
+
+def get_mesh(latitude, longitude, step: float) -> Mesh:
+    """Get a regular mesh covering the cells, with a margin of one step.
+
+    Args:
+        latitude: Latitudes of the cells in degrees.
+        longitude: Longitudes of the cells in degrees.
+        step: Step of the mesh in degrees.
+
+    Returns:
+        Latitudes (nlat,) and longitudes (nlon,) of the mesh lines.
+
+    """
+
+    def lines(coords):
+        start = np.floor(np.min(coords) / step) * step - step
+        count = int(np.ceil((np.max(coords) - start) / step)) + 2
+        return start + step * np.arange(count)
+
+    return Mesh(lines(latitude), lines(longitude))
+
+
+def get_remap(latitude, longitude, step: float) -> Remap:
+    """Get the bilinear remap of a mesh covering the cells to the cells.
+
+    Args:
+        latitude: Latitudes of the cells in degrees.
+        longitude: Longitudes of the cells in degrees.
+        step: Step of the mesh in degrees.
+
+    Returns:
+        mesh: Mesh covering the cells.
+        nodes: Array (ncells, 4) of the indices of the surrounding nodes
+            in the flattened mesh (latitude major).
+        weights: Array (ncells, 4) of the bilinear weights of the nodes.
+
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    mesh = get_mesh(latitude, longitude, step)
+    nlon = mesh.longitude.size
+
+    def locate(coords, mesh_lines):
+        index = np.clip(
+            np.floor((coords - mesh_lines[0]) / step).astype(np.int64),
+            0,
+            mesh_lines.size - 2,
+        )
+        return index, (coords - mesh_lines[index]) / step
+
+    i, t = locate(latitude, mesh.latitude)
+    j, u = locate(longitude, mesh.longitude)
+    nodes = np.stack(
+        [i * nlon + j, i * nlon + j + 1, (i + 1) * nlon + j, (i + 1) * nlon + j + 1],
+        axis=-1,
+    )
+    weights = np.stack(
+        [(1 - t) * (1 - u), (1 - t) * u, t * (1 - u), t * u], axis=-1
+    )
+    for array in (nodes, weights):
+        array.flags.writeable = False
+    return Remap(mesh, nodes, weights)
+
+
+def get_nodes(mesh: Mesh):
+    """Get the latitudes and longitudes of the nodes of the flattened mesh."""
+    lat, lon = np.meshgrid(mesh.latitude, mesh.longitude, indexing="ij")
+    return lat.ravel(), lon.ravel()
+
+
+def remap(node_values, remap_obj: Remap, cells=None):
+    """Remap values of the mesh nodes to the cells.
+
+    Args:
+        node_values: Array (..., nnodes) of values at the nodes.
+        remap_obj: Remap of the mesh to the cells (see get_remap).
+        cells: Optional indices of the cells to be evaluated.
+
+    Returns:
+        Array (..., ncells) of the values at the cells.
+
+    """
+    nodes, weights = remap_obj.nodes, remap_obj.weights
+    if cells is not None:
+        nodes, weights = nodes[cells], weights[cells]
+    return np.sum(np.asarray(node_values)[..., nodes] * weights, axis=-1)
@@ -0,0 +1,116 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Distances between the stations and the cells of the grid.
+
+All distances are angles in radians (i.e. on the unit sphere), so that
+the interpolation kernels and eps_val do not depend on the metric.
+
+Metrics:
+    equirectangular: Approximation used in COSMO (default, for compatibility
+        with the previous results).
+    chord: Straight-line distance between the points on the unit sphere.
+    haversine: Great-circle distance.
+
+chord and haversine are computed from the 3D unit vectors of the points
+with a single matrix product of the station and the grid vectors.
+"""
+
+import numpy as np
+
+metrics = ("equirectangular", "chord", "haversine")
+
+# Lower limit of the distances, prevents division by zero in idw
+min_dist = 1e-14
+
+
+def unit_vectors(latitude, longitude) -> np.ndarray:
+    """Get the 3D unit vectors of points on the sphere.
+
+    Args:
+        latitude: Latitudes in degrees.
+        longitude: Longitudes in degrees.
+
+    Returns:
+        Array of shape (npoints, 3).
+
+    """
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))
+    lon = np.radians(np.asarray(longitude, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack(
+        [cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1
+    )
+
+
+def station_distances(  # pylint: disable=too-many-positional-arguments,R0913
+    latitude, longitude, coord_stns, metric: str = "equirectangular", xyz=None
+) -> np.ndarray:
+    """Get the distances between the stations and the cells.
+
+    Args:
+        latitude: Latitudes of the cells in degrees.
+        longitude: Longitudes of the cells in degrees.
+        coord_stns: List of (lat, lon) tuples of the stations' coordinates.
+        metric: One of metrics.
+        xyz: Optional precomputed unit vectors of the cells (chord and
+            haversine only).
+
+    Returns:
+        Array of shape (nstns, ncells) with the distances in radians.
+
+    """
+    stns = np.asarray(coord_stns, dtype=np.float64).reshape(-1, 2)
+    if metric == "equirectangular":
+        eps = 1e-14  # prevents division by zero
+        diff_lon = (
+            (longitude[np.newaxis, :] - stns[:, 1:2] + eps)
+            * np.pi
+            / 180
+            * np.cos(latitude[np.newaxis, :] * np.pi / 180)
+        )
+        diff_lat = (latitude[np.newaxis, :] - stns[:, 0:1]) * np.pi / 180
+        return np.sqrt(diff_lon**2 + diff_lat**2)
+
+    if xyz is None:
+        xyz = unit_vectors(latitude, longitude)
+    dot = unit_vectors(stns[:, 0], stns[:, 1]) @ xyz.T
+    # |a - b|**2 = 2 - 2 a.b for unit vectors
+    chord = np.sqrt(np.maximum(2.0 - 2.0 * dot, 0.0))
+    if metric == "haversine":
+        dist = 2.0 * np.arcsin(np.minimum(chord / 2.0, 1.0))
+    elif metric == "chord":
+        dist = chord
+    else:
+        raise ValueError(f"Distance metric must be one of {metrics}, not {metric}.")
+    return np.maximum(dist, min_dist)
+
+
+def nearest_cell(
+    latitude, longitude, coords: tuple, metric: str = "equirectangular", xyz=None
+) -> int:
+    """Get the index of the cell closest to a location.
+
+    Args:
+        latitude: Latitudes of the cells in degrees.
+        longitude: Longitudes of the cells in degrees.
+        coords: (lat, lon) tuple of the location.
+        metric: One of metrics.
+        xyz: Optional precomputed unit vectors of the cells (chord and
+            haversine only).
+
+    Returns:
+        Index of the closest cell.
+
+    """
+    if metric == "equirectangular":
+        # Same as in COSMO: distance in degrees without scaling of the longitude
+        dist = (latitude - coords[0]) ** 2 + (longitude - coords[1]) ** 2
+        return int(np.argmin(dist))
+    if xyz is None:
+        xyz = unit_vectors(latitude, longitude)
+    # chord and great-circle distances both decrease with the dot product
+    return int(np.argmax(xyz @ unit_vectors(coords[0], coords[1])))
@@ -0,0 +1,123 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Decomposition of the grid-wide stages into contiguous ranges of cells.
+
+The interpolation of the change at the cells, the clamping to the limits
+and the masking of the inactive cells only depend on the cell itself and
+the stations. The grid is split into contiguous ranges of cells, processed
+by a pool of worker processes of the node, or of MPI ranks with mpi4py (if
+installed, domain_backend: mpi). The results are gathered in the order of
+the ranges, i.e. of the cells.
+
+The pools are started at the first use and kept until the end of the
+process, so that the workers are shared by all fields and pollen types.
+The worker processes are started by a fork server, not forked from the
+calling process, which may run threads.
+"""
+
+# Standard library
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np  # type: ignore
+
+# First-party
+from realtime_pollen_calibration.errors import CalibrationError
+
+try:
+    from mpi4py.futures import MPIPoolExecutor  # type: ignore
+except ImportError:  # mpi4py is optional, only needed for domain_backend mpi
+    MPIPoolExecutor = None
+
+backends = ("processes", "mpi")
+
+# Ranges per worker, balancing ranges with few active cells
+ranges_per_worker = 4
+
+executors: dict = {}
+lock = threading.Lock()
+
+
+def get_workers(domain_workers: int) -> int:
+    """Get the number of workers, 0 for all CPUs of the node."""
+    if domain_workers < 0:
+        raise CalibrationError("domain_workers in config must be >= 0.")
+    return domain_workers or os.cpu_count() or 1
+
+
+def get_ranges(ncells: int, nranges: int) -> list:
+    """Split the cells into contiguous ranges of (almost) equal size.
+
+    Returns:
+        List of slices covering range(ncells) in order, without empty ones.
+
+    """
+    bounds = np.linspace(0, ncells, max(min(nranges, ncells), 1) + 1).astype(int)
+    return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def get_executor(backend: str, workers: int):
+    """Get the pool of workers of a backend, started at the first call."""
+    if backend not in backends:
+        raise CalibrationError(f"domain_backend in config must be one of {backends}.")
+    if backend == "mpi" and MPIPoolExecutor is None:
+        print("mpi4py is not installed, the ranges of cells are processed by processes.")
+        backend = "processes"
+    with lock:
+        executor = executors.get((backend, workers))
+        if executor is None:
+            if backend == "mpi":
+                executor = MPIPoolExecutor(max_workers=workers)
+            else:
+                # Not forked, the calling process may run threads (batch
+                # jobs, writers of the output)
+                executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("forkserver"),
+                )
+            executors[backend, workers] = executor
+    return executor
+
+
+def shutdown() -> None:
+    """Stop the pools of workers."""
+    with lock:
+        for executor in executors.values():
+            executor.shutdown()
+        executors.clear()
+
+
+atexit.register(shutdown)
+
+
+def map_ranges(function, arrays, config_obj, **kwargs):
+    """Apply a function to contiguous ranges of cells and gather the results.
+
+    Args:
+        function: Function of the arrays restricted to a range of cells (and
+            kwargs), returning an array over the range. It must be defined at
+            the top level of a module, to be sent to the workers.
+        arrays: Arrays over the cells, (ncells,) or (nmembers, ncells).
+        config_obj: Configured data structure of class Config, with
+            domain_workers and domain_backend.
+        kwargs: Keyword arguments of function, the same for all ranges.
+
+    Returns:
+        Concatenation of the results of the ranges along the last axis.
+
+    """
+    workers = get_workers(config_obj.domain_workers)
+    executor = get_executor(config_obj.domain_backend, workers)
+    ranges = get_ranges(np.shape(arrays[0])[-1], workers * ranges_per_worker)
+    futures = [
+        executor.submit(function, *(array[..., cells] for array in arrays), **kwargs)
+        for cells in ranges
+    ]
+    return np.concatenate([future.result() for future in futures], axis=-1)
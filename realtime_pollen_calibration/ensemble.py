@@ -0,0 +1,178 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Ensemble mode: calibration of several POV members in one pass.
+
+The members share the grid, the stations and the observations, so the
+geometry, the parsing of the ATAB files and the weight operators are set up
+once. The changes at the stations are computed for all members as a stacked
+array (nmembers, nstns) and interpolated with one product with the weight
+operator. The members are configured in the config (ensemble), e.g.:
+
+    ensemble:
+      pov_infiles: /data/eps/pov_*.grib2
+      station_mod_files: /data/eps/mod_*.atab
+      pov_outfile: /data/eps/pov_out_{member:03d}.grib2
+
+The glob patterns are sorted, the n-th files of the lists form the n-th
+member, and {member} is replaced by the index of the member.
+"""
+
+# Standard library
+import dataclasses
+import glob
+from collections import namedtuple
+
+import numpy as np  # type: ignore
+
+# First-party
+from realtime_pollen_calibration import utils
+
+Member = namedtuple(
+    "Member", ["name", "pov_infile", "station_mod_file", "t2m_file", "pov_outfile"]
+)
+
+
+def expand_files(files) -> list:
+    """Get the files of a glob pattern (sorted) or of a list."""
+    if isinstance(files, str):
+        if any(char in files for char in "*?["):
+            return sorted(glob.glob(files))
+        return [files] if files else []
+    return list(files)
+
+
+def get_members(config_obj: utils.Config, mode: str) -> list:
+    """Get the members of the ensemble defined in the config.
+
+    Args:
+        config_obj: Configured data structure of class Config.
+        mode: "phenology" or "strength".
+
+    Returns:
+        List of Member.
+
+    Raises:
+        CalibrationError: If the files of the members do not match.
+
+    """
+    ensemble = config_obj.ensemble
+    pov_infiles = expand_files(ensemble.get("pov_infiles", []))
+    nmembers = len(pov_infiles)
+    problems = []
+    if nmembers == 0:
+        problems.append("No member POV files found (ensemble: pov_infiles).")
+    mod_files = expand_files(ensemble.get("station_mod_files", []))
+    if mode == "strength" and len(mod_files) != nmembers:
+        problems.append(
+            f"{len(mod_files)} model ATAB files (ensemble: station_mod_files) "
+            f"for {nmembers} members."
+        )
+    t2m_files = expand_files(ensemble.get("t2m_files", []))
+    if t2m_files and len(t2m_files) != nmembers:
+        problems.append(
+            f"{len(t2m_files)} T_2M files (ensemble: t2m_files) for {nmembers} members."
+        )
+    template = ensemble.get("pov_outfile", "")
+    if "{member" not in template:
+        problems.append("ensemble: pov_outfile must contain the placeholder {member}.")
+    if problems:
+        raise utils.CalibrationError("\n".join(problems))
+
+    return [
+        Member(
+            i,
+            pov_infile,
+            mod_files[i] if mode == "strength" else "",
+            t2m_files[i] if t2m_files else config_obj.t2m_file,
+            template.format(member=i),
+        )
+        for i, pov_infile in enumerate(pov_infiles)
+    ]
+
+
+def member_config(config_obj: utils.Config, member: Member) -> utils.Config:
+    """Get the config of a single member."""
+    return dataclasses.replace(
+        config_obj,
+        pov_infile=member.pov_infile,
+        station_mod_file=member.station_mod_file,
+        t2m_file=member.t2m_file,
+        pov_outfile=member.pov_outfile,
+        ensemble={},
+    )
+
+
+def group_members(obs_mod_data: list) -> list:
+    """Group the members with the same stations.
+
+    The stations usually are the same for all members, they only differ if
+    gaps in the model data of a member change the stations removed by
+    utils.treat_missing.
+
+    Args:
+        obs_mod_data: utils.ObsModData of each member.
+
+    Returns:
+        List of the lists of the indices of the members of each group.
+
+    """
+    groups: dict = {}
+    for i, data in enumerate(obs_mod_data):
+        groups.setdefault(tuple(data.coord_stns), []).append(i)
+    return list(groups.values())
+
+
+def get_station_values(ds, values, coord_stns) -> np.ndarray:
+    """Get the values (nmembers, nstns) of the fields (nmembers, ncells) at the stations."""
+    cells = [utils.get_station_cell(ds, coords) for coords in coord_stns]
+    return np.asarray(values)[:, cells]
+
+
+def get_change_tune_members(
+    pollen_type: str,
+    obs_mod_data: list,
+    tune_stns,
+    saisn_stns,
+    config_obj: utils.Config,
+):
+    """Compute the change of the tune field of several members at once.
+
+    Args:
+        pollen_type: String describing the pollen type analysed.
+        obs_mod_data: utils.ObsModData of each member, with the same stations.
+        tune_stns: Array (nmembers, nstns) of tune at the stations.
+        saisn_stns: Array (nmembers, nstns) of saisn at the stations.
+        config_obj: Configured data structure of class Config.
+
+    Returns:
+        Array (nmembers, nstns) of the change of tune at the stations
+        (see utils.get_change_tune).
+
+    """
+    nstns = obs_mod_data[0].data_obs.shape[1]
+    weights = utils.get_weight_bank(
+        ("constant", config_obj.weighting_type),
+        config_obj.window_hours,
+        config_obj.weighting_kernels,
+    )
+    data = np.stack(
+        [
+            np.hstack([data.data_obs, data.data_mod[:, data.istation_mod]])
+            for data in obs_mod_data
+        ]
+    )
+    # (nmembers, nkernels, 2 * nstns)
+    sums = utils.get_weighted_sums(data, weights)
+    return utils.get_change_tune_stns(
+        pollen_type,
+        sums[:, 0, :nstns],
+        sums[:, 0, nstns:],
+        sums[:, 1, :nstns],
+        sums[:, 1, nstns:],
+        tune_stns,
+        saisn_stns,
+    )
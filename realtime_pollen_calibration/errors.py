@@ -0,0 +1,16 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Errors of the calibration."""
+
+
+class CalibrationError(Exception):
+    """Invalid inputs or settings, the calibration is not performed.
+
+    The library raises it instead of exiting, so that the calibration can be
+    called repeatedly in one process. The command line interface prints the
+    message and exits with status 1.
+    """
@@ -0,0 +1,180 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Fused interpolation kernel, compiled with numba if installed.
+
+The NumPy path of utils.interpolate evaluates the distances, the kernels,
+their normalization and the weighted sum over the stations as separate
+passes over (nstns, ncells) arrays. Here all steps, including the limits
+and the masking of the inactive cells, run in one loop over the cells
+(parallel with numba.prange), without temporaries of the size of the grid.
+
+Selected with interpolation_backend: numba. Without numba, utils.interpolate
+uses the NumPy path; the kernel below then runs as plain Python, which is
+only suitable for tests on small grids. rbf_exact is not fused (it needs
+the solution of the station system), it always uses the NumPy path.
+"""
+
+import math
+
+import numpy as np  # type: ignore
+
+try:
+    import numba  # type: ignore
+except ImportError:
+    numba = None
+
+if numba is not None:
+    jit = numba.njit(parallel=True, cache=True)
+    prange = numba.prange
+else:
+
+    def jit(function):
+        return function
+
+    prange = range
+
+# Codes of the options inside of the compiled kernel
+fused_ipstyles = {"idw": 0, "rbf_g": 1, "rbf_mq": 2}
+fused_metrics = {"equirectangular": 0, "chord": 1, "haversine": 2}
+fused_methods = {"multiply": 0, "sum": 1}
+
+# Lower limit of the distances (see distance.min_dist)
+min_dist = 1e-14
+
+# Cells per iteration of the parallel loop, sharing one buffer of sums
+block_cells = 256
+
+
+@jit
+def _interpolate_cells(  # pylint: disable=R0913,R0914,too-many-positional-arguments
+    values,
+    latitude,
+    longitude,
+    mask,
+    change,
+    stns,
+    ipstyle,
+    epsilon,
+    metric,
+    method,
+    min_value,
+    max_value,
+    out,
+):  # pragma: no cover - compiled
+    nmembers, ncells = values.shape
+    nstns = stns.shape[0]
+    deg = math.pi / 180.0
+    nblocks = (ncells + block_cells - 1) // block_cells
+    for block in prange(nblocks):  # pylint: disable=not-an-iterable
+        # Sums over the stations per member, allocated once per block
+        num = np.empty(nmembers)
+        for cell in range(block * block_cells, min((block + 1) * block_cells, ncells)):
+            active = False
+            for member in range(nmembers):
+                out[member, cell] = values[member, cell]
+                if mask[member, cell]:
+                    active = True
+            if not active:
+                continue
+            lat = latitude[cell]
+            lon = longitude[cell]
+            cos_lat = math.cos(lat * deg)
+            x = cos_lat * math.cos(lon * deg)
+            y = cos_lat * math.sin(lon * deg)
+            z = math.sin(lat * deg)
+            den = 0.0
+            num[:] = 0.0
+            for stn in range(nstns):
+                if metric == 0:
+                    diff_lon = (lon - stns[stn, 1] + 1e-14) * deg * cos_lat
+                    diff_lat = (lat - stns[stn, 0]) * deg
+                    dist = math.sqrt(diff_lon * diff_lon + diff_lat * diff_lat)
+                else:
+                    cos_stn = math.cos(stns[stn, 0] * deg)
+                    dot = (
+                        cos_stn * math.cos(stns[stn, 1] * deg) * x
+                        + cos_stn * math.sin(stns[stn, 1] * deg) * y
+                        + math.sin(stns[stn, 0] * deg) * z
+                    )
+                    dist = math.sqrt(max(2.0 - 2.0 * dot, 0.0))
+                    if metric == 2:
+                        dist = 2.0 * math.asin(min(dist / 2.0, 1.0))
+                    dist = max(dist, min_dist)
+                if ipstyle == 0:
+                    kernel = 1.0 / dist
+                elif ipstyle == 1:
+                    kernel = math.exp(-((dist / epsilon) ** 2))
+                else:
+                    kernel = 1.0 / math.sqrt(1.0 + (dist / epsilon) ** 2)
+                den += kernel
+                for member in range(nmembers):
+                    num[member] += kernel * change[member, stn]
+            for member in range(nmembers):
+                if not mask[member, cell]:
+                    continue
+                if method == 0:
+                    updated = values[member, cell] * (num[member] / den)
+                else:
+                    updated = values[member, cell] + num[member] / den
+                out[member, cell] = max(min(updated, max_value), min_value)
+
+
+def interpolate_cells(  # pylint: disable=R0913,too-many-positional-arguments
+    values,
+    latitude,
+    longitude,
+    mask,
+    change,
+    coord_stns,
+    ipstyle: str,
+    eps_val: float,
+    metric: str,
+    method: str,
+    min_value: float,
+    max_value: float,
+):
+    """Apply the interpolated change to a field in one fused pass.
+
+    Args:
+        values: Values of the field, (ncells,) or (nmembers, ncells).
+        latitude: Latitudes of the cells.
+        longitude: Longitudes of the cells.
+        mask: Active cells, the others keep their values (shape of values).
+        change: Value of the change at the stations, (nstns,) or
+            (nmembers, nstns).
+        coord_stns: List of (lat, lon) tuples of the stations' coordinates.
+        ipstyle: One of fused_ipstyles.
+        eps_val: Free parameter of the rbf kernels in degrees.
+        metric: One of fused_metrics.
+        method: Either 'multiply' (strength) or 'sum' (phenology).
+        min_value: Lower limit of the updated field.
+        max_value: Upper limit of the updated field.
+
+    Returns:
+        Updated values of the field (same results as utils.interpolate_chunk,
+        up to rounding).
+
+    """
+    shape = np.shape(values)
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    out = np.empty_like(values)
+    _interpolate_cells(
+        values,
+        np.ascontiguousarray(latitude, dtype=np.float64),
+        np.ascontiguousarray(longitude, dtype=np.float64),
+        np.atleast_2d(np.asarray(mask, dtype=np.bool_)),
+        np.atleast_2d(np.asarray(change, dtype=np.float64)),
+        np.asarray(coord_stns, dtype=np.float64).reshape(-1, 2),
+        fused_ipstyles[ipstyle],
+        eps_val * np.pi / 180,
+        fused_metrics[metric],
+        fused_methods[method],
+        float(min_value),
+        float(max_value),
+        out,
+    )
+    return out.reshape(shape)
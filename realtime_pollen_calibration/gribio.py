@@ -0,0 +1,104 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Memory-mapped access to the messages of GRIB files.
+
+The file is mapped into memory and the messages are located by an index of
+their offsets and lengths, read from section 0 of each message. Handles are
+created from the mapped bytes of one message at a time. The values are
+decoded with the public eccodes API, which always returns a new array:
+eccodes-python cannot decode into buffers of the caller.
+"""
+
+# Standard library
+import mmap
+from collections import namedtuple
+
+import eccodes  # type: ignore
+import numpy as np  # type: ignore
+
+GribMessage = namedtuple("GribMessage", ["offset", "length"])
+
+
+def index_messages(buffer) -> list:
+    """Get the offset and length of the GRIB messages in a buffer.
+
+    Args:
+        buffer: Bytes-like object (e.g. mmap) of a GRIB file.
+
+    Returns:
+        List of GribMessage.
+
+    """
+    messages = []
+    pos = buffer.find(b"GRIB")
+    while pos >= 0 and pos + 16 <= len(buffer):
+        edition = buffer[pos + 7]
+        if edition == 2:
+            length = int.from_bytes(buffer[pos + 8 : pos + 16], "big")
+        else:
+            length = int.from_bytes(buffer[pos + 4 : pos + 7], "big")
+        if length <= 0 or pos + length > len(buffer):
+            break
+        messages.append(GribMessage(pos, length))
+        pos = buffer.find(b"GRIB", pos + length)
+    return messages
+
+
+class GribFile:
+    """Memory-mapped GRIB file with an index of its messages."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = open(path, "rb")  # pylint: disable=consider-using-with
+        try:
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._mm = None
+        self.messages = [] if self._mm is None else index_messages(self._mm)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.messages)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._fh.close()
+
+    def handle(self, message: GribMessage):
+        """Create an eccodes handle of a message, to be released by the caller."""
+        end = message.offset + message.length
+        with memoryview(self._mm) as view, view[message.offset : end] as raw:
+            return eccodes.codes_new_from_message(raw)
+
+    def handles(self):
+        """Iterate over the handles of all messages, released after each step."""
+        for message in self.messages:
+            gid = self.handle(message)
+            try:
+                yield gid
+            finally:
+                eccodes.codes_release(gid)
+
+
+def decode_values(gid) -> np.ndarray:
+    """Decode the values of a message with the public eccodes API.
+
+    Args:
+        gid: eccodes handle.
+
+    Returns:
+        New float64 array of the values.
+
+    """
+    return eccodes.codes_get_values(gid)
@@ -0,0 +1,342 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Input stage: check all input files concurrently, then load them in parallel.
+
+The checks only read the GRIB message headers and the ATAB files, so a run
+with a missing or incomplete input stops within milliseconds instead of
+after the GRIB loads. All problems found are reported together.
+"""
+
+# Standard library
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import eccodes  # type: ignore
+import numpy as np  # type: ignore
+
+# First-party
+from realtime_pollen_calibration import atab, utils
+
+
+def read_headers(grib_file: str, keys: tuple) -> list:
+    """Get keys of the messages of a GRIB file, without loading the data sections.
+
+    Returns:
+        List of the tuples of the values of keys, one per message.
+
+    """
+    headers = []
+    with open(grib_file, "rb") as fin:
+        while True:
+            gid = eccodes.codes_grib_new_from_file(fin, headers_only=True)
+            if gid is None:
+                return headers
+            try:
+                headers.append(tuple(eccodes.codes_get(gid, key) for key in keys))
+            finally:
+                eccodes.codes_release(gid)
+
+
+def scan_grib(grib_file: str) -> list:
+    """Get the short names of the messages of a GRIB file (headers only)."""
+    return [name for (name,) in read_headers(grib_file, ("shortName",))]
+
+
+def get_fields_time(grib_file: str, short_names: list, hour_incr: int):
+    """Get the time of the updated fields, as read_pov_file and read_t2m_file.
+
+    Returns:
+        Time (datetime64) of the first message of short_names advanced by
+        hour_incr hours, None if there is none.
+
+    """
+    for name, data_date, hour in read_headers(
+        grib_file, ("shortName", "dataDate", "hour")
+    ):
+        if name in short_names:
+            date_obj = datetime.strptime(f"{data_date}{hour:02d}", "%Y%m%d%H")
+            return np.datetime64(date_obj + timedelta(hours=hour_incr), "ns")
+    return None
+
+
+def check_pov(pov_infile: str, pol_fields: list) -> tuple:
+    """Check the presence of the mandatory fields in the POV file.
+
+    Returns:
+        problems: List of messages, empty if the file is complete.
+        species: Pollen types present in the file.
+
+    """
+    short_names = set(scan_grib(pov_infile))
+    species = sorted({fld[:4] for fld in pol_fields if fld in short_names})
+    if not species:
+        return [f"No pollen fields {pol_fields} found in {pov_infile}."], species
+    missing_fields = [
+        fld for fld in pol_fields if fld[:4] in species and fld not in short_names
+    ]
+    if missing_fields:
+        return [
+            f"The mandatory field(s) {missing_fields} is/are missing in {pov_infile}."
+        ], species
+    return [], species
+
+
+def check_grib_fields(grib_file: str, short_names: list) -> list:
+    """Check the presence of fields in a GRIB file."""
+    present = set(scan_grib(grib_file))
+    missing = [name for name in short_names if name not in present]
+    if missing:
+        return [f"The mandatory field(s) {missing} is/are missing in {grib_file}."]
+    return []
+
+
+def read_atab_values(file_data: str, layout: str = "obs") -> tuple:
+    """Read the station header and the values of an ATAB file.
+
+    Returns:
+        headerdata: utils.HeaderData of the file.
+        parameters: Array of the PARAMETER column.
+        times: Array of datetime64 of the rows.
+        values: Array of shape (nrows, nstns).
+
+    """
+    _, headerdata = utils.read_atab_header(file_data, layout)
+    body = atab.get_body(file_data, headerdata.n_header, layout)
+    return headerdata, body.parameters, body.times, body.values
+
+
+def get_removed_stations(values, missing_value: float) -> np.ndarray:
+    """Mask of the stations removed by utils.treat_missing (>= 50% missing)."""
+    if values.shape[0] == 0:
+        return np.zeros(values.shape[1], dtype=bool)
+    has_missing = np.any(values == missing_value, axis=0)
+    fraction = np.count_nonzero(np.abs(values - missing_value) < 0.01, axis=0)
+    return has_missing & (fraction / values.shape[0] >= 0.5)
+
+
+def check_obs_atab(station_obs_file: str, nhours: int = 120, end_time=None) -> tuple:
+    """Check the window of nhours of the observation ATAB file.
+
+    The window ends at end_time (see utils.read_atab), defaults to the last
+    observation of each pollen type.
+
+    Returns:
+        problems: List of messages, empty if the file is usable.
+        stations: {pollen_type: (nhours with data, indicators of the stations kept,
+            number of stations removed)}.
+
+    """
+    headerdata, parameters, times, values = read_atab_values(station_obs_file, "obs")
+    if values.shape[1] != len(headerdata.stn_indicators):
+        return [
+            f"{station_obs_file} has {values.shape[1]} value columns but "
+            f"{len(headerdata.stn_indicators)} stations in the header."
+        ], {}
+    stations = {}
+    for pollen_type in utils.pollen_types:
+        rows = parameters == pollen_type
+        values_type = values[rows]
+        nhours_present = 0
+        if values_type.shape[0] > 0:
+            window = atab.build_window(
+                times[rows],
+                values_type,
+                times[rows].max() if end_time is None else end_time,
+                nhours,
+                headerdata.missing_value,
+            )
+            values_type = window.values
+            nhours_present = int(np.count_nonzero(window.present))
+        removed = get_removed_stations(values_type, headerdata.missing_value)
+        stations[pollen_type] = (
+            nhours_present,
+            set(headerdata.stn_indicators[~removed].tolist()),
+            int(np.count_nonzero(removed)),
+        )
+    return [], stations
+
+
+def check_mod_atab(station_mod_file: str, nhours: int = 120, end_time=None) -> tuple:
+    """Check the window of nhours of the model ATAB file.
+
+    Only the window read by utils.read_mod_window is checked, ending at
+    end_time (defaults to the last row of each pollen type).
+
+    Returns:
+        indicators: Set of the stations of the model data.
+        types_missing: Pollen types with missing values in the window.
+
+    """
+    headerdata, parameters, times, values = read_atab_values(station_mod_file, "mod")
+    types_missing = set()
+    for pollen_type in utils.pollen_types:
+        rows = parameters == pollen_type
+        if not np.any(rows):
+            continue
+        window = atab.build_window(
+            times[rows],
+            values[rows],
+            times[rows].max() if end_time is None else end_time,
+            nhours,
+            0.0,
+        )
+        if np.any(window.values == headerdata.missing_value):
+            types_missing.add(pollen_type)
+    return set(headerdata.stn_indicators.tolist()), types_missing
+
+
+def get_problems(results: dict, species: list, config_obj: utils.Config) -> list:
+    """Collect the problems of the input checks for the pollen types present."""
+    problems = []
+    for name, result in results.items():
+        if isinstance(result, BaseException):
+            problems.append(f"Check of {name} failed: {result!r}")
+        elif name in ("pov", "obs_atab"):
+            problems += result[0]
+        elif name != "mod_atab":
+            problems += result
+    obs = results.get("obs_atab")
+    mod = results.get("mod_atab")
+    if isinstance(obs, BaseException) or not obs[1]:
+        return problems
+    for pollen_type in species:
+        nrows, kept, nremoved = obs[1][pollen_type]
+        if nrows == 0:
+            problems.append(
+                f"No observations of {pollen_type} in {config_obj.station_obs_file}."
+            )
+            continue
+        if nremoved > config_obj.max_miss_stns:
+            problems.append(
+                f"{nremoved} stations have more than 50% missing data of "
+                f"{pollen_type} (max_miss_stns: {config_obj.max_miss_stns})."
+            )
+        if mod is None or isinstance(mod, BaseException):
+            continue
+        missing = sorted(kept - mod[0])
+        if missing:
+            problems.append(
+                f"Stations {missing} are missing in the model data file "
+                f"{config_obj.station_mod_file}."
+            )
+        if pollen_type in mod[1]:
+            problems.append(
+                f"There is at least one missing value of {pollen_type} "
+                f"in the model data file {config_obj.station_mod_file}."
+            )
+    return problems
+
+
+async def check_inputs(config_obj: utils.Config, mode: str, pol_fields: list) -> list:
+    """Run the checks of all inputs concurrently.
+
+    Args:
+        config_obj: Configured data structure of class Config.
+        mode: "phenology" or "strength".
+        pol_fields: Names of the pollen fields needed from pov_infile.
+
+    Returns:
+        List of the problems found, empty if all inputs are usable.
+
+    """
+    files = {
+        "pov_infile": config_obj.pov_infile,
+        "const_file": config_obj.const_file,
+        "station_obs_file": config_obj.station_obs_file,
+    }
+    if mode == "phenology":
+        files["t2m_file"] = config_obj.t2m_file
+    else:
+        files["station_mod_file"] = config_obj.station_mod_file
+    missing = [
+        f"The input {key} {path!r} does not exist."
+        for key, path in files.items()
+        if not os.path.isfile(path)
+    ]
+    if missing:
+        return missing
+
+    # The station windows end at the time of the updated fields, the
+    # headers of the first message give it in a few milliseconds
+    if mode == "phenology":
+        time_file, time_fields = config_obj.t2m_file, ["T_2M"]
+    else:
+        time_file, time_fields = config_obj.pov_infile, pol_fields
+    try:
+        end_time = await asyncio.to_thread(
+            get_fields_time, time_file, time_fields, config_obj.hour_incr
+        )
+    except Exception:  # pylint: disable=broad-exception-caught
+        end_time = None  # reported by the check of the file
+    checks = {
+        "pov": asyncio.to_thread(check_pov, config_obj.pov_infile, pol_fields),
+        "const": asyncio.to_thread(
+            check_grib_fields, config_obj.const_file, ["CLON", "CLAT"]
+        ),
+        "obs_atab": asyncio.to_thread(
+            check_obs_atab,
+            config_obj.station_obs_file,
+            config_obj.window_hours,
+            end_time,
+        ),
+    }
+    if mode == "phenology":
+        checks["t2m"] = asyncio.to_thread(
+            check_grib_fields, config_obj.t2m_file, ["T_2M"]
+        )
+    else:
+        checks["mod_atab"] = asyncio.to_thread(
+            check_mod_atab,
+            config_obj.station_mod_file,
+            config_obj.window_hours,
+            end_time,
+        )
+    results = dict(
+        zip(checks, await asyncio.gather(*checks.values(), return_exceptions=True))
+    )
+    species = [] if isinstance(results["pov"], BaseException) else results["pov"][1]
+    return get_problems(results, species, config_obj)
+
+
+async def _check_and_load(config_obj, mode, pol_fields, loaders):
+    problems = await check_inputs(config_obj, mode, pol_fields)
+    if problems:
+        return problems, {}
+    loaded = await asyncio.gather(*(asyncio.to_thread(load) for load in loaders.values()))
+    return [], dict(zip(loaders, loaded))
+
+
+def prepare_inputs(
+    config_obj: utils.Config, mode: str, pol_fields: list, loaders: dict
+) -> dict:
+    """Check all inputs and, if they are usable, load them in parallel.
+
+    Args:
+        config_obj: Configured data structure of class Config.
+        mode: "phenology" or "strength".
+        pol_fields: Names of the pollen fields needed from pov_infile.
+        loaders: {name: callable} of the loads to run in parallel.
+
+    Returns:
+        {name: result} of the loaders.
+
+    Raises:
+        CalibrationError: If any input is missing or incomplete.
+
+    """
+    problems, loaded = asyncio.run(
+        _check_and_load(config_obj, mode, pol_fields, loaders)
+    )
+    if problems:
+        raise utils.CalibrationError(
+            "\n".join(problems)
+            + "\nNo pollen calibration update is performed until this is fixed!\n"
+            "Pollen in ICON will still work, but calibration fields get "
+            "more and more outdated."
+        )
+    return loaded
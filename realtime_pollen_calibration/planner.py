@@ -0,0 +1,332 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Planner of the execution of a run within a memory budget.
+
+The memory of a run is dominated by arrays of the size of the grid: the
+decoded input fields, the updated fields, the messages being encoded and,
+above all, the (nstns, ncells) intermediates of the interpolation. The
+sizes of the run (cells, stations, pollen types, members) are read from the
+GRIB message headers and the ATAB header, without decoding any field. The
+memory and time of each stage are estimated from them, and the planner
+chooses within memory_budget:
+    chunk_size: the whole grid at once if it fits, else the largest chunks
+        (a power of 2) that fit.
+    use_dask: whether the updated fields are kept resident until written,
+        or streamed chunk by chunk into the output file (needs dask).
+    write_workers: the most threads encoding the output that fit.
+The estimates are upper bounds of the arrays allocated by the package; the
+times assume rough single-core throughputs and only give the magnitude. With
+domain_workers, the memory of the interpolation is summed over the workers
+of the node and its time is divided among them (see domain.py).
+"""
+
+# Standard library
+import dataclasses
+import os
+from collections import namedtuple
+
+import eccodes  # type: ignore
+
+# First-party
+from realtime_pollen_calibration import domain, ensemble, fused, gribio, inputs, utils
+from realtime_pollen_calibration.cache import grid_cache
+
+Sizes = namedtuple(
+    "Sizes", ["ncells", "nstns", "nspecies", "ninputs", "noutputs", "nmembers"]
+)
+Stage = namedtuple("Stage", ["name", "memory", "seconds"])
+Plan = namedtuple(
+    "Plan", ["chunk_size", "write_workers", "use_dask", "stages", "peak", "fits"]
+)
+
+# The fields are decoded and interpolated in float64
+itemsize = 8
+
+# Fields read and written per pollen type
+input_fields = {"strength": 2, "phenology": 4}
+output_fields = {"strength": 1, "phenology": 2}
+
+# Peak number of (nstns, ncells) arrays while the weight operator is built
+operator_arrays = 4
+
+# Rough single-core throughputs in seconds per value
+decode_time = 10e-9
+encode_time = 40e-9
+# per station and cell
+kernel_time = 40e-9
+fused_time = 10e-9
+apply_time = 2e-9
+
+# Smallest chunks considered
+min_chunk_size = 1024
+
+
+def get_sizes(config_obj: utils.Config, mode: str) -> Sizes:
+    """Get the sizes of a run from the headers of its input files.
+
+    Args:
+        config_obj: Configured data structure of class Config.
+        mode: "strength" or "phenology".
+
+    Returns:
+        ncells: Number of cells of the grid.
+        nstns: Number of stations of the observations.
+        nspecies: Number of pollen types in the POV file.
+        ninputs: Number of fields read per member.
+        noutputs: Number of updated fields per member.
+        nmembers: Number of members (1 without ensemble).
+
+    """
+    pov_infile = config_obj.pov_infile
+    nmembers = 1
+    if config_obj.ensemble:
+        members = ensemble.get_members(config_obj, mode)
+        pov_infile = members[0].pov_infile
+        nmembers = len(members)
+    ncells = 0
+    with gribio.GribFile(config_obj.const_file) as grib:
+        for gid in grib.handles():
+            ncells = eccodes.codes_get(gid, "numberOfDataPoints")
+            break
+    nspecies = len(
+        {
+            name[:4]
+            for name in inputs.scan_grib(pov_infile)
+            if name[:4] in utils.pollen_types
+        }
+    )
+    _, headerdata = utils.get_atab_header(config_obj.station_obs_file, "obs")
+    return Sizes(
+        ncells,
+        len(headerdata.coord_stns),
+        nspecies,
+        # T_2M of phenology
+        input_fields[mode] * nspecies + (mode == "phenology"),
+        output_fields[mode] * nspecies,
+        nmembers,
+    )
+
+
+def estimate(  # pylint: disable=too-many-locals
+    sizes: Sizes,
+    config_obj: utils.Config,
+    chunk_size: int,
+    write_workers: int,
+    use_dask: bool,
+) -> list:
+    """Estimate the memory and time of the stages of a run.
+
+    Args:
+        sizes: Sizes of the run (see get_sizes).
+        config_obj: Configured data structure of class Config.
+        chunk_size: Number of cells per chunk of the interpolation, 0 for
+            the whole grid.
+        write_workers: Number of threads encoding the output.
+        use_dask: Stream the updated fields into the output file.
+
+    Returns:
+        List of Stage (name, memory in bytes, seconds).
+
+    """
+    field = sizes.ncells * itemsize
+    grid = 2 * field
+    if config_obj.distance_metric != "equirectangular":
+        # Unit vectors of the cells
+        grid += 3 * field
+    loaded = grid + sizes.ninputs * sizes.nmembers * field
+    nupdated = sizes.noutputs * sizes.nmembers
+    station_cells = sizes.nstns * sizes.ncells
+    fused_kernel = (
+        config_obj.interpolation_backend == "numba"
+        and config_obj.ipstyle in fused.fused_ipstyles
+        and fused.numba is not None
+    )
+    cached = 0
+    if fused_kernel:
+        temporaries = 0
+        seconds = fused_time * station_cells * nupdated
+    elif config_obj.domain_workers != 1:
+        # The kernels are evaluated per field by the workers, each on one
+        # range of cells (or one chunk of it) at a time
+        workers = domain.get_workers(config_obj.domain_workers)
+        cells = -(-sizes.ncells // (workers * domain.ranges_per_worker))
+        if chunk_size > 0:
+            cells = min(cells, chunk_size)
+        temporaries = operator_arrays * sizes.nstns * workers * cells * itemsize
+        # The results of the ranges and their concatenation
+        temporaries += 2 * sizes.nmembers * field
+        seconds = (kernel_time + apply_time) * station_cells * nupdated / workers
+    elif chunk_size <= 0:
+        # The operator of the active cells is built per field, it is only
+        # kept in cache.grid_cache during batch runs
+        cached = min(nupdated, grid_cache.max_operators) * station_cells * itemsize
+        temporaries = operator_arrays * station_cells * itemsize + cached
+        seconds = (kernel_time + apply_time) * station_cells * nupdated
+    else:
+        # The operator is built per chunk and field, the change of each
+        # member is interpolated and applied on the chunk
+        temporaries = (operator_arrays * sizes.nstns + 3 * sizes.nmembers) * min(
+            chunk_size, sizes.ncells
+        )
+        temporaries *= itemsize
+        seconds = (kernel_time + apply_time) * station_cells * nupdated
+    updated = nupdated * field
+    encoding = write_workers * 2 * field
+    encode_seconds = encode_time * nupdated * sizes.ncells / write_workers
+    stages = [
+        Stage("load", loaded, decode_time * sizes.ninputs * sizes.nmembers * sizes.ncells)
+    ]
+    if use_dask:
+        # The chunks are interpolated while the output is written
+        stages.append(
+            Stage(
+                "interpolation+write",
+                loaded + temporaries + nupdated * chunk_size * itemsize + encoding,
+                seconds + encode_seconds,
+            )
+        )
+    else:
+        stages.append(Stage("interpolation", loaded + updated + temporaries, seconds))
+        stages.append(Stage("write", loaded + cached + updated + encoding, encode_seconds))
+    return stages
+
+
+def make_plan(sizes: Sizes, config_obj: utils.Config) -> Plan:
+    """Choose chunk_size, use_dask and write_workers within memory_budget.
+
+    Without memory_budget, the plan keeps the settings of config_obj.
+
+    Args:
+        sizes: Sizes of the run (see get_sizes).
+        config_obj: Configured data structure of class Config.
+
+    Returns:
+        chunk_size, write_workers, use_dask: Chosen settings.
+        stages: Estimates of the stages (see estimate).
+        peak: Estimated peak memory in bytes.
+        fits: Whether the peak is within memory_budget.
+
+    """
+
+    def plan(chunk_size, write_workers, use_dask):
+        stages = estimate(sizes, config_obj, chunk_size, write_workers, use_dask)
+        peak = max(stage.memory for stage in stages)
+        return Plan(chunk_size, write_workers, use_dask, stages, peak, peak <= budget)
+
+    budget = config_obj.memory_budget * 2**20
+    if budget <= 0:
+        budget = float("inf")
+        return plan(
+            config_obj.chunk_size,
+            config_obj.write_workers,
+            config_obj.use_dask and config_obj.chunk_size > 0 and sizes.nmembers == 1,
+        )
+
+    chunk_sizes = [0]
+    chunk_size = 2 ** max(sizes.ncells - 1, 1).bit_length() // 2
+    while chunk_size >= min_chunk_size:
+        chunk_sizes.append(chunk_size)
+        chunk_size //= 2
+    streaming = [False]
+    if utils.da is not None and sizes.nmembers == 1:
+        # The streaming of the updated fields is limited to single members
+        streaming.append(True)
+    candidates = [
+        plan(chunk_size, 1, use_dask)
+        for use_dask in streaming
+        for chunk_size in chunk_sizes
+        if chunk_size > 0 or not use_dask
+    ]
+    chosen = next((candidate for candidate in candidates if candidate.fits), None)
+    if chosen is None:
+        # The smallest footprint, beyond the budget
+        return min(candidates, key=lambda candidate: candidate.peak)
+
+    max_workers = min(os.cpu_count() or 1, max(sizes.noutputs * sizes.nmembers, 1))
+    for write_workers in range(max_workers, 1, -1):
+        candidate = plan(chosen.chunk_size, write_workers, chosen.use_dask)
+        if candidate.fits:
+            return candidate
+    return chosen
+
+
+def apply_plan(config_obj: utils.Config, plan: Plan) -> utils.Config:
+    """Get a copy of config_obj with the settings of the plan."""
+    return dataclasses.replace(
+        config_obj,
+        chunk_size=plan.chunk_size,
+        write_workers=plan.write_workers,
+        use_dask=plan.use_dask,
+    )
+
+
+def print_plan(sizes: Sizes, plan: Plan, config_obj: utils.Config) -> None:
+    """Print the plan and its estimated memory and time per stage."""
+    mib = 2**20
+    print(
+        f"Plan for {sizes.ncells} cells, {sizes.nstns} stations,",
+        f"{sizes.nspecies} pollen types and {sizes.nmembers} member(s):",
+    )
+    print(
+        f"  chunk_size: {plan.chunk_size}, write_workers: {plan.write_workers},",
+        "updated fields:",
+        "streamed into the output file" if plan.use_dask else "resident",
+    )
+    print(f"  {'stage':20s} {'memory [MB]':>12s} {'time [s]':>10s}")
+    for stage in plan.stages:
+        print(f"  {stage.name:20s} {stage.memory / mib:12.0f} {stage.seconds:10.2f}")
+    budget = (
+        f" of the budget of {config_obj.memory_budget:g} MB"
+        if config_obj.memory_budget > 0
+        else ""
+    )
+    print(
+        f"  estimated peak memory: {plan.peak / mib:.0f} MB{budget},",
+        f"estimated time: {sum(stage.seconds for stage in plan.stages):.1f} s",
+    )
+    if not plan.fits:
+        print(
+            "  The estimated peak memory exceeds memory_budget even with the",
+            "smallest chunks.",
+        )
+
+
+def plan_run(config_obj: utils.Config, mode: str, verbose: bool = True):
+    """Get config_obj with the settings planned within its memory_budget.
+
+    Args:
+        config_obj: Configured data structure of class Config.
+        mode: "strength" or "phenology".
+        verbose: Print the plan.
+
+    Returns:
+        config_obj unchanged without memory_budget, or a copy with the
+        planned chunk_size, use_dask and write_workers.
+
+    """
+    if config_obj.memory_budget <= 0:
+        return config_obj
+    try:
+        sizes = get_sizes(config_obj, mode)
+    except (OSError, IndexError):
+        # Missing inputs are reported by the input checks
+        return config_obj
+    plan = make_plan(sizes, config_obj)
+    if verbose or not plan.fits:
+        print_plan(sizes, plan, config_obj)
+    return apply_plan(config_obj, plan)
+
+
+def dry_run(config_obj: utils.Config, mode: str) -> None:
+    """Print the plan of a run without reading any field, raise if impossible."""
+    try:
+        sizes = get_sizes(config_obj, mode)
+    except (OSError, IndexError) as err:
+        raise utils.CalibrationError(
+            f"The sizes of the run cannot be determined: {err}"
+        ) from err
+    print_plan(sizes, make_plan(sizes, config_obj), config_obj)
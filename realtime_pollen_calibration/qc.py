@@ -0,0 +1,211 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Quality control of the observed concentrations at the stations.
+
+The checks run on the window of observations before the missing values are
+treated (see utils.read_atab), vectorized over arrays (..., nhours, nstns),
+e.g. (nhours, nstns) of one pollen type or (npollen_types, nhours, nstns):
+    negative: negative concentrations (other than the missing value).
+    spike: deviation from the rolling median of spike_hours (centered)
+        larger than spike_threshold times the rolling MAD (scaled to the
+        standard deviation) and than spike_min.
+    flatline: the same nonzero value repeated for flatline_hours or more.
+    ratio: (obs + ratio_offset) / (mod + ratio_offset) beyond max_ratio or
+        below 1 / max_ratio (only with the model concentrations).
+Each check sets a bit of the flag cube (0 for valid values). Flagged values
+are replaced by the missing value, i.e. treated as missing observations.
+A setting of 0 disables its check.
+"""
+
+import numpy as np  # type: ignore
+
+# Bits of the flags
+MISSING = 1
+NEGATIVE = 2
+SPIKE = 4
+FLATLINE = 8
+RATIO = 16
+
+flag_names = {
+    MISSING: "missing",
+    NEGATIVE: "negative",
+    SPIKE: "spike",
+    FLATLINE: "flatline",
+    RATIO: "ratio",
+}
+
+defaults = {
+    "spike_hours": 7,
+    "spike_threshold": 5.0,
+    "spike_min": 100.0,
+    "flatline_hours": 12,
+    "max_ratio": 100.0,
+    "ratio_offset": 10.0,
+}
+
+# Scale of the MAD to the standard deviation of normal distributions
+mad_scale = 1.4826
+
+
+def check_settings(settings: dict) -> list:
+    """Check the settings of the quality control.
+
+    Returns:
+        List of the problems found, empty if the settings are valid.
+
+    """
+    problems = []
+    unknown = sorted(set(settings) - set(defaults))
+    if unknown:
+        problems.append(
+            f"Unknown obs_qc settings {unknown}. Valid settings are {list(defaults)}."
+        )
+    for name, value in settings.items():
+        if name in defaults and (
+            not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0
+        ):
+            problems.append(f"obs_qc setting {name} must be a number >= 0.")
+    max_ratio = settings.get("max_ratio", defaults["max_ratio"])
+    if not problems and 0 < max_ratio < 1:
+        problems.append("obs_qc setting max_ratio must be 0 (disabled) or >= 1.")
+    return problems
+
+
+def window_median(windows, count):
+    """Median of the windows along the last axis, ignoring NaN (NaN if empty).
+
+    Args:
+        windows: Array (..., nwindow), nwindow odd.
+        count: Number of values other than NaN of each window.
+
+    """
+    windows = np.sort(windows, axis=-1)
+    median = windows[..., windows.shape[-1] // 2]
+    # NaN are sorted last, the windows with missing values are rare
+    partial = count < windows.shape[-1]
+    if np.any(partial):
+        sorted_values = windows[partial]
+        lower = np.maximum(count[partial] - 1, 0) // 2
+        upper = count[partial] // 2
+        rows = np.arange(sorted_values.shape[0])
+        median[partial] = 0.5 * (
+            sorted_values[rows, lower] + sorted_values[rows, upper]
+        )
+    return median
+
+
+def rolling_median(values, nhours: int):
+    """Rolling median and MAD of a centered window of nhours along axis -2.
+
+    Args:
+        values: Array (..., nhours, nstns), NaN for missing values.
+        nhours: Length of the window (odd, the window is centered).
+
+    Returns:
+        median: Array of the rolling medians, shape of values.
+        mad: Array of the rolling median absolute deviations.
+
+    """
+    half = int(nhours) // 2
+    padding = [(0, 0)] * values.ndim
+    padding[-2] = (half, half)
+    padded = np.pad(values, padding, constant_values=np.nan)
+    # (..., nhours, nstns, 2 * half + 1)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * half + 1, axis=-2)
+    missing = np.isnan(padded).astype(np.int64)
+    count = 2 * half + 1 - np.lib.stride_tricks.sliding_window_view(
+        missing, 2 * half + 1, axis=-2
+    ).sum(axis=-1)
+    median = window_median(windows, count)
+    mad = window_median(np.abs(windows - median[..., None]), count)
+    return median, mad
+
+
+def get_run_lengths(values):
+    """Length of the run of equal consecutive values along axis -2 of each value.
+
+    NaN never repeats, its runs have the length 1.
+    """
+    series = np.moveaxis(values, -2, -1)
+    flat = series.reshape(-1, series.shape[-1])
+    starts = np.ones(flat.shape, dtype=bool)
+    starts[:, 1:] = flat[:, 1:] != flat[:, :-1]
+    run = np.cumsum(starts.ravel()) - 1
+    lengths = np.bincount(run)[run].reshape(series.shape)
+    return np.moveaxis(lengths, -1, -2)
+
+
+def get_flags(data_obs, missing_value: float, settings: dict, data_mod=None):
+    """Get the flags of the quality control of the observations.
+
+    Args:
+        data_obs: Observed concentrations (..., nhours, nstns).
+        missing_value: Value of the missing observations.
+        settings: Settings of the checks, missing keys take the defaults.
+        data_mod: Optional modelled concentrations of the same stations
+            (NaN for stations without model data), enables the ratio check.
+
+    Returns:
+        Array of uint8 flags, shape of data_obs, bits of flag_names.
+
+    """
+    settings = {**defaults, **settings}
+    data_obs = np.asarray(data_obs, dtype=np.float64)
+    missing = data_obs == missing_value
+    values = np.where(missing, np.nan, data_obs)
+    flags = np.where(missing, MISSING, 0).astype(np.uint8)
+    flags[values < 0] |= NEGATIVE
+
+    if settings["spike_hours"] > 0 and settings["spike_threshold"] > 0:
+        median, mad = rolling_median(values, settings["spike_hours"])
+        limit = np.maximum(
+            settings["spike_threshold"] * mad_scale * mad, settings["spike_min"]
+        )
+        flags[np.abs(values - median) > limit] |= SPIKE
+
+    if settings["flatline_hours"] > 0:
+        flatline = (get_run_lengths(values) >= settings["flatline_hours"]) & (
+            values != 0
+        )
+        flags[flatline & ~missing] |= FLATLINE
+
+    if data_mod is not None and settings["max_ratio"] > 0:
+        offset = settings["ratio_offset"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = (values + offset) / (np.asarray(data_mod, dtype=np.float64) + offset)
+        flags[
+            (ratio > settings["max_ratio"]) | (ratio < 1 / settings["max_ratio"])
+        ] |= RATIO
+    return flags
+
+
+def clean(data_obs, flags, missing_value: float):
+    """Replace the flagged observations by the missing value (copy)."""
+    return np.where(flags != 0, missing_value, data_obs)
+
+
+def summarize(flags, stn_indicators) -> list:
+    """Describe the flagged observations of each station (missing excluded).
+
+    Args:
+        flags: Flags (nhours, nstns) of get_flags.
+        stn_indicators: Indicators of the stations.
+
+    Returns:
+        List of lines, e.g. "Station PBS: 2 spike, 12 flatline".
+
+    """
+    lines = []
+    for istation, stn in enumerate(stn_indicators):
+        counts = [
+            f"{np.count_nonzero(flags[:, istation] & bit)} {name}"
+            for bit, name in flag_names.items()
+            if bit != MISSING and np.any(flags[:, istation] & bit)
+        ]
+        if counts:
+            lines.append(f"Station {stn}: {', '.join(counts)}")
+    return lines
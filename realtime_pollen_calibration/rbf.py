@@ -0,0 +1,115 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Exact radial basis function interpolation (ipstyle rbf_exact).
+
+Unlike rbf_g and rbf_mq, which are normalized kernel averages, the
+interpolated field reproduces the station values: the coefficients c of
+the Gaussian kernels solve (K + regularization * I) c = values, with K the
+kernel matrix between the stations. The factorized station system only
+depends on the stations, eps_val and the metric. Its Cholesky (LU for
+non-symmetric metrics) factorization is computed with scipy if installed,
+otherwise its inverse with NumPy, and cached, so each field only needs the
+solve with the factorization plus one matrix-vector product over the grid.
+"""
+
+# Standard library
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+# First-party
+from realtime_pollen_calibration import distance
+
+try:
+    from scipy import linalg  # type: ignore
+except ImportError:  # scipy is optional, NumPy caches the inverse instead
+    linalg = None
+
+StationSystem = namedtuple("StationSystem", ["factor", "kind"])
+
+
+def kernel(dist, eps_val: float):
+    """Gaussian kernel of the distances (radians), eps_val in degrees."""
+    epsilon = eps_val * np.pi / 180
+    return np.exp(-((dist / epsilon) ** 2))
+
+
+@lru_cache(maxsize=16)
+def _factorize(
+    coord_stns: tuple, eps_val: float, metric: str, regularization: float
+) -> StationSystem:
+    stns = np.asarray(coord_stns, dtype=np.float64).reshape(-1, 2)
+    # matrix[j, i] is the kernel of station i at the location of station j
+    matrix = kernel(
+        distance.station_distances(stns[:, 0], stns[:, 1], stns, metric), eps_val
+    ).T
+    # The station to itself is at distance ~0, the kernel is 1
+    np.fill_diagonal(matrix, 1.0 + regularization)
+    if np.allclose(matrix, matrix.T):
+        try:
+            if linalg is not None:
+                return StationSystem(linalg.cho_factor(matrix), "cholesky")
+            # (L L^T)^-1 = L^-T L^-1 from the inverse of the triangular factor
+            inverse_factor = np.linalg.inv(np.linalg.cholesky(matrix))
+            return StationSystem(inverse_factor.T @ inverse_factor, "inverse")
+        except np.linalg.LinAlgError:
+            # Not numerically positive definite (stations very close to each
+            # other compared to eps_val), fall back to the LU factorization.
+            print(
+                "The rbf_exact station system is not positive definite, "
+                "consider setting rbf_regularization > 0."
+            )
+    # The equirectangular metric is not symmetric (the longitude is scaled
+    # with the latitude of the second point), use the LU factorization.
+    if linalg is not None:
+        return StationSystem(linalg.lu_factor(matrix), "lu")
+    return StationSystem(np.linalg.inv(matrix), "inverse")
+
+
+def get_station_system(
+    coord_stns, eps_val: float, metric: str = "equirectangular", regularization: float = 0.0
+) -> StationSystem:
+    """Get the factorized kernel system of the stations (cached).
+
+    Args:
+        coord_stns: List of (lat, lon) tuples of the stations' coordinates.
+        eps_val: Free parameter of the kernel in degrees.
+        metric: Distance metric, one of distance.metrics.
+        regularization: Value added to the diagonal of the kernel matrix.
+
+    Returns:
+        StationSystem with the Cholesky or LU factorization of scipy.linalg
+        (kind "cholesky" or "lu"), or the inverse matrix computed with
+        NumPy without scipy (kind "inverse").
+
+    """
+    return _factorize(
+        tuple(map(tuple, np.asarray(coord_stns, dtype=np.float64).reshape(-1, 2))),
+        float(eps_val),
+        metric,
+        float(regularization),
+    )
+
+
+def get_coefficients(values, system: StationSystem):
+    """Solve the station system for the coefficients of the kernels.
+
+    Args:
+        values: Array (..., nstns) of values at the stations.
+        system: Factorized station system (see get_station_system).
+
+    Returns:
+        Array (..., nstns) of coefficients of the kernels of the stations.
+
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if system.kind == "cholesky":
+        return linalg.cho_solve(system.factor, values.T).T
+    if system.kind == "lu":
+        return linalg.lu_solve(system.factor, values.T).T
+    return values @ system.factor.T
@@ -0,0 +1,254 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Content-addressed cache of the output files of the calibration.
+
+A run is identified by the content of its input files (pov_infile,
+const_file, the ATAB files and t2m_file for phenology), the settings of the
+Config that affect the result and the version of the package. If the same
+run was done before, pov_outfile is hard-linked (or copied) from the cache
+instead of being computed again, e.g. on operational retries.
+
+The cache is a directory (result_cache_dir) with one GRIB file per key. The
+digests of the input files are kept in digests.json, keyed by path,
+modification time and size, so unchanged inputs are hashed only once.
+Entries not used for result_cache_max_age_hours are removed, and the least
+recently used entries are removed while the cache exceeds
+result_cache_max_mb.
+"""
+
+# Standard library
+import dataclasses
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# First-party
+from realtime_pollen_calibration import __version__, utils
+
+# Settings of the Config without influence on the content of pov_outfile.
+# The input files enter the key by their content, not by their path.
+ignored_settings = (
+    "pov_infile",
+    "pov_outfile",
+    "t2m_file",
+    "const_file",
+    "station_obs_file",
+    "station_mod_file",
+    "station_registry",
+    "write_workers",
+    "ensemble",
+    "result_cache_dir",
+    "result_cache_max_mb",
+    "result_cache_max_age_hours",
+    "checkpoint_dir",
+    "shared_memory_dir",
+)
+
+_lock = threading.Lock()
+
+
+def hash_file(path: str) -> str:
+    """Get the blake2b digest of the content of a file."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size > 0:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest.update(mm)
+    return digest.hexdigest()
+
+
+def get_file_digests(cache_dir: str, paths: list) -> list:
+    """Get the digests of files, hashing only the files changed since last time.
+
+    Args:
+        cache_dir: Directory of the cache.
+        paths: Locations of the files.
+
+    Returns:
+        List of the digests in the order of paths.
+
+    """
+    index_file = os.path.join(cache_dir, "digests.json")
+    with _lock:
+        try:
+            with open(index_file, encoding="utf-8") as fh:
+                index = json.load(fh)
+        except (OSError, ValueError):
+            index = {}
+        digests = []
+        changed = False
+        for path in paths:
+            real_path = os.path.realpath(path)
+            stat = os.stat(real_path)
+            entry = index.get(real_path)
+            if entry is None or entry[:2] != [stat.st_mtime_ns, stat.st_size]:
+                entry = [stat.st_mtime_ns, stat.st_size, hash_file(real_path)]
+                index[real_path] = entry
+                changed = True
+            digests.append(entry[2])
+        if changed:
+            write_atomic(index_file, json.dumps(index).encode())
+    return digests
+
+
+def write_atomic(path: str, content: bytes) -> None:
+    """Write a file through a temporary file, renamed once complete."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(content)
+    os.replace(tmp, path)
+
+
+def get_input_files(config_obj: utils.Config, mode: str) -> list:
+    """Get the input files of a run."""
+    files = [config_obj.pov_infile, config_obj.const_file, config_obj.station_obs_file]
+    if mode == "phenology":
+        files.append(config_obj.t2m_file)
+    else:
+        files.append(config_obj.station_mod_file)
+    return files
+
+
+def get_key(config_obj: utils.Config, mode: str, index_dir: str = "") -> str:
+    """Get the key of a run in the cache.
+
+    Args:
+        config_obj: Configured data structure of class Config.
+        mode: "phenology" or "strength".
+        index_dir: Directory of digests.json, defaults to result_cache_dir.
+
+    Returns:
+        Hex digest of the inputs, the settings and the package version.
+
+    """
+    settings = {
+        name: value
+        for name, value in dataclasses.asdict(config_obj).items()
+        if name not in ignored_settings
+    }
+    content = {
+        "version": __version__,
+        "mode": mode,
+        "inputs": get_file_digests(
+            index_dir or config_obj.result_cache_dir,
+            get_input_files(config_obj, mode),
+        ),
+        "settings": settings,
+    }
+    return hashlib.blake2b(
+        json.dumps(content, sort_keys=True, default=str).encode(), digest_size=20
+    ).hexdigest()
+
+
+def get_entry(cache_dir: str, key: str) -> str:
+    """Get the location of the cache entry of a key."""
+    return os.path.join(cache_dir, key[:2], key + ".grib2")
+
+
+def link_or_copy(source: str, target: str) -> None:
+    """Replace target by a hard link to source, or by a copy across devices."""
+    tmp = f"{target}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+def materialize(config_obj: utils.Config, key: str) -> bool:
+    """Create pov_outfile from the cache.
+
+    Returns:
+        True on a hit, False if the key is not in the cache.
+
+    """
+    entry = get_entry(config_obj.result_cache_dir, key)
+    try:
+        link_or_copy(entry, config_obj.pov_outfile)
+    except FileNotFoundError:
+        return False
+    # The modification time of the entry is the time of its last use
+    os.utime(entry)
+    return True
+
+
+def store(config_obj: utils.Config, key: str) -> None:
+    """Add pov_outfile to the cache."""
+    entry = get_entry(config_obj.result_cache_dir, key)
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    link_or_copy(config_obj.pov_outfile, entry)
+
+
+def evict(cache_dir: str, max_mb: float = 0, max_age_hours: float = 0) -> list:
+    """Remove the entries unused for max_age_hours and the least recently used
+    entries while the cache exceeds max_mb (0 disables the limit).
+
+    Returns:
+        List of the entries removed.
+
+    """
+    entries = []
+    for root, _, names in os.walk(cache_dir):
+        for name in names:
+            if name.endswith(".grib2"):
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+    removed = []
+    now = time.time()
+    total = sum(entry[1] for entry in entries)
+    for mtime, size, path in entries:
+        too_old = max_age_hours > 0 and now - mtime > max_age_hours * 3600
+        too_large = max_mb > 0 and total > max_mb * 1024**2
+        if not (too_old or too_large):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        total -= size
+        removed.append(path)
+    return removed
+
+
+def run_cached(config_obj: utils.Config, mode: str, run, use_cache: bool = True):
+    """Run the calibration, or take its result from the cache.
+
+    Args:
+        config_obj: Configured data structure of class Config.
+        mode: "phenology" or "strength".
+        run: Callable running the calibration, writing pov_outfile.
+        use_cache: False to ignore the cache (the result is not stored either).
+
+    """
+    cache_dir = config_obj.result_cache_dir
+    if not use_cache or not cache_dir or config_obj.ensemble:
+        run()
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        key = get_key(config_obj, mode)
+    except FileNotFoundError:
+        # Missing inputs are reported by the calibration itself
+        run()
+        return
+    if materialize(config_obj, key):
+        print(f"{config_obj.pov_outfile} taken from the result cache ({key}).")
+        return
+    run()
+    store(config_obj, key)
+    evict(
+        cache_dir,
+        config_obj.result_cache_max_mb,
+        config_obj.result_cache_max_age_hours,
+    )
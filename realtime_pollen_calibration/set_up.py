@@ -3,7 +3,8 @@
 import yaml
 
 # First-party
-from realtime_pollen_calibration.utils import Config
+from realtime_pollen_calibration import qc, weighting
+from realtime_pollen_calibration.utils import CalibrationError, Config
 
 
 def set_up_config(config_file: str) -> Config:
@@ -19,6 +20,19 @@ def set_up_config(config_file: str) -> Config:
     with open(config_file, "r", encoding="utf-8") as fh_config_file:
         data = yaml.safe_load(fh_config_file)
 
+    return config_from_dict(data)
+
+
+def config_from_dict(data: dict) -> Config:
+    """Set the configuration from the content of a yaml configuration file.
+
+    Args:
+        data: Mapping of the configuration entries.
+
+    Returns:
+        Configured data structure of class Config.
+
+    """
     config = Config()
 
     config.station_obs_file = data["station_obs_file"]
@@ -39,12 +53,72 @@ def set_up_config(config_file: str) -> Config:
 
     config.weighting_type = data.get("weighting_type","constant")
 
+    config.weighting_kernels = data.get("weighting_kernels", {})
+
     config.ipstyle = data.get("ipstyle", "idw")
 
     config.eps_val = data.get("eps_val", 1)
 
+    config.rbf_regularization = data.get("rbf_regularization", 0.0)
+
+    config.distance_metric = data.get("distance_metric", "equirectangular")
+
+    config.chunk_size = data.get("chunk_size", 0)
+
+    config.use_dask = data.get("use_dask", False)
+
+    config.interpolation_backend = data.get("interpolation_backend", "numpy")
+
+    config.domain_workers = data.get("domain_workers", 1)
+
+    config.domain_backend = data.get("domain_backend", "processes")
+
+    config.coarse_mesh_step = data.get("coarse_mesh_step", 0.0)
+
+    config.coarse_mesh_tolerance = data.get("coarse_mesh_tolerance", 0.01)
+
+    config.station_registry = data.get("station_registry", "")
+
+    config.write_workers = data.get("write_workers", 1)
+
+    config.output_packing = data.get("output_packing", {})
+
+    config.window_hours = data.get("window_hours", 120)
+
+    config.obs_qc = data.get("obs_qc", {})
+
+    config.ensemble = data.get("ensemble", {})
+
+    config.result_cache_dir = data.get("result_cache_dir", "")
+
+    config.result_cache_max_mb = data.get("result_cache_max_mb", 0)
+
+    config.result_cache_max_age_hours = data.get("result_cache_max_age_hours", 0)
+
+    config.checkpoint_dir = data.get("checkpoint_dir", "")
+
+    config.shared_memory_dir = data.get("shared_memory_dir", "")
+
+    config.memory_budget = data.get("memory_budget", 0)
+
+    check_weighting(config)
+
+    problems = qc.check_settings(config.obs_qc)
+    if problems:
+        raise CalibrationError("\n".join(problems))
+
     # Provide default if missing in YAML
     config.max_param = data.get("max_param", config.max_param)
     config.min_param = data.get("min_param", config.min_param)
 
     return config
+
+
+def check_weighting(config: Config) -> None:
+    """Check the weighting kernels and the weighting type, raise if invalid."""
+    problems = weighting.check_kernels(config.weighting_kernels)
+    names = weighting.get_kernel_names(config.weighting_kernels)
+    if not problems and config.weighting_type not in names:
+        problems.append(f"weighting_type in config must be one of {names}.")
+    if problems:
+        raise CalibrationError("\n".join(problems))
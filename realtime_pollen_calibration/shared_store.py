@@ -0,0 +1,147 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Shared-memory store of the grid geometry and the decoded input fields.
+
+Several calibration processes on one node (phenology, strength, products)
+read the same CLON/CLAT and often the same POV file. With shared_memory_dir
+set (e.g. /dev/shm), the first process decodes the arrays of a file into
+.npy files of an entry of the store, and all processes attach read-only
+memory-mapped views of them, so the node holds the arrays only once.
+
+An entry is identified by the path, modification time and size of the
+source file and by the kind of arrays read from it. Each process attaching
+an entry registers a reference (a file named after its pid). At exit, a
+process removes its references, and the last process referencing an entry
+removes the entry. References of processes no longer running are ignored.
+"""
+
+# Standard library
+import atexit
+import fcntl
+import hashlib
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+import numpy as np  # type: ignore
+
+_attached: set = set()
+_lock = threading.Lock()
+
+
+@contextmanager
+def _store_lock(directory: str):
+    """Lock of the store across processes (and threads of this process)."""
+    with _lock, open(os.path.join(directory, "rpc-store.lock"), "a+b") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def get_entry(directory: str, source: str, kind: str) -> str:
+    """Get the location of the entry of the arrays of kind read from source."""
+    stat = os.stat(source)
+    key = f"{os.path.realpath(source)}:{stat.st_mtime_ns}:{stat.st_size}:{kind}"
+    digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    return os.path.join(directory, f"rpc-{digest}")
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def get_references(entry: str) -> list:
+    """Get the pids of the running processes referencing an entry."""
+    refs = os.path.join(entry, "refs")
+    pids = [int(name) for name in os.listdir(refs)] if os.path.isdir(refs) else []
+    return [pid for pid in pids if _is_running(pid)]
+
+
+def _write(entry: str, arrays: dict) -> None:
+    tmp = f"{entry}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(os.path.join(tmp, "refs"))
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(values))
+    os.replace(tmp, entry)
+
+
+def _add_reference(directory: str, entry: str, arrays) -> bool:
+    """Reference an entry, written from arrays if given and not in the store.
+
+    Returns:
+        False if the entry is not in the store and arrays is None.
+
+    """
+    with _store_lock(directory):
+        if not os.path.isdir(entry):
+            if arrays is None:
+                return False
+            _write(entry, arrays)
+        with open(os.path.join(entry, "refs", str(os.getpid())), "w", encoding="utf-8"):
+            pass
+        _attached.add((directory, entry))
+    return True
+
+
+def attach(directory: str, source: str, kind: str, load) -> dict:
+    """Get arrays read from a file, through the store if directory is set.
+
+    Args:
+        directory: Directory of the store (e.g. /dev/shm), empty to disable it.
+        source: File the arrays are read from.
+        kind: Identifier of the arrays read from source (e.g. the fields).
+        load: Callable reading the arrays, {name: array}, only called if the
+            entry is not in the store yet.
+
+    Returns:
+        {name: array}, read-only memory-mapped views (0-d arrays as scalars).
+
+    """
+    if not directory:
+        return load()
+    os.makedirs(directory, exist_ok=True)
+    entry = get_entry(directory, source, kind)
+    loaded = None
+    while not _add_reference(directory, entry, loaded):
+        # Read outside of the lock, the other entries stay available
+        loaded = load()
+    arrays = {}
+    for file_name in sorted(os.listdir(entry)):
+        if file_name.endswith(".npy"):
+            values = np.load(os.path.join(entry, file_name), mmap_mode="r")
+            arrays[file_name[:-4]] = values[()] if values.ndim == 0 else values
+    return arrays
+
+
+def release(directory: str, entry: str) -> None:
+    """Remove the reference of this process, and the entry if it was the last."""
+    with _store_lock(directory):
+        try:
+            os.remove(os.path.join(entry, "refs", str(os.getpid())))
+        except FileNotFoundError:
+            pass
+        if os.path.isdir(entry) and not get_references(entry):
+            # The mapped views of this process stay valid after the removal
+            shutil.rmtree(entry, ignore_errors=True)
+        _attached.discard((directory, entry))
+
+
+@atexit.register
+def release_all() -> None:
+    """Release all entries attached by this process."""
+    for directory, entry in list(_attached):
+        release(directory, entry)
@@ -0,0 +1,176 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Persistent registry of the stations of the ATAB files.
+
+The registry (a json file, see Config.station_registry) keeps across runs:
+    - the parsed ATAB headers (indicators, coordinates, missing value code),
+      keyed by a hash of the station lines of the header, so that a header
+      is only parsed again when the station set changes (the most recently
+      used max_headers are kept),
+    - the column of each station in the model ATAB file,
+    - the grid cell of each station per grid and distance metric.
+"""
+
+# Standard library
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np  # type: ignore
+
+# First-party
+from realtime_pollen_calibration.cache import grid_cache
+
+
+# Header lines defining the stations, the other lines do not change the key
+header_labels = ("Indicator", "Latitude", "Longitude", "Missing_value_code")
+
+# Number of parsed headers kept in the registry
+max_headers = 16
+
+
+def header_key(lines: list, layout: str = "obs") -> str:
+    """Hash of the station lines of an ATAB header.
+
+    Args:
+        lines: Header lines up to the PARAMETER line.
+        layout: "obs" for the observation file, "mod" for the model file.
+
+    """
+    digest = hashlib.sha1(f"{layout}:{len(lines)}\n".encode("utf-8"))
+    for line in lines:
+        if line.strip().partition(":")[0] in header_labels:
+            digest.update(line.strip().encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+class StationRegistry:
+    """Station metadata registry stored in a json file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._changed = False
+        self._data: dict = {"headers": {}, "mod_columns": {}, "cells": {}}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                self._data.update(json.load(fh))
+
+    def get_header(self, key: str):
+        """Get a parsed header (dict) by its hash, None if unknown."""
+        with self._lock:
+            headers = self._data["headers"]
+            if key not in headers:
+                return None
+            # Most recently used last
+            headers[key] = headers.pop(key)
+            return headers[key]
+
+    def put_header(self, key: str, header: dict) -> None:
+        """Add a parsed header, keeping the max_headers most recently used."""
+        with self._lock:
+            headers = self._data["headers"]
+            headers[key] = header
+            for old_key in list(headers)[: max(len(headers) - max_headers, 0)]:
+                del headers[old_key]
+                self._data["mod_columns"].pop(old_key, None)
+            self._changed = True
+
+    def get_mod_columns(self, key: str):
+        """Get the {indicator: column} mapping of a model ATAB header."""
+        return self._data["mod_columns"].get(key)
+
+    def put_mod_columns(self, key: str, columns: dict) -> None:
+        with self._lock:
+            self._data["mod_columns"][key] = columns
+            self._changed = True
+
+    def get_cells(self, grid_key: str) -> dict:
+        """Get the {"lat,lon": cell} mapping of the stations on a grid."""
+        return dict(self._data["cells"].get(grid_key, {}))
+
+    def put_cells(self, grid_key: str, cells: dict) -> None:
+        with self._lock:
+            known = self._data["cells"].setdefault(grid_key, {})
+            if any(known.get(coords) != cell for coords, cell in cells.items()):
+                known.update(cells)
+                self._changed = True
+
+    def save(self) -> None:
+        """Write the registry if it changed (atomically, no partial files)."""
+        with self._lock:
+            if not self._changed:
+                return
+            directory = os.path.dirname(os.path.abspath(self.path))
+            with tempfile.NamedTemporaryFile(
+                "w", dir=directory, suffix=".tmp", delete=False, encoding="utf-8"
+            ) as fh:
+                json.dump(self._data, fh)
+            os.replace(fh.name, self.path)
+            self._changed = False
+
+
+_registries: dict = {}
+_registries_lock = threading.Lock()
+
+
+def open_registry(path: str):
+    """Get the registry of a file, shared in the process; None if path is empty."""
+    if not path:
+        return None
+    path = os.path.realpath(path)
+    with _registries_lock:
+        if path not in _registries:
+            _registries[path] = StationRegistry(path)
+        return _registries[path]
+
+
+def grid_registry_key(ds) -> str:
+    """Key of the grid and distance metric of a DataSet in the registry.
+
+    The key is built from the number of cells and a sample of the cell
+    coordinates, so that a new grid in the same const_file is detected.
+    """
+    latitude = np.ascontiguousarray(ds.latitude.values, dtype=np.float64)
+    longitude = np.ascontiguousarray(ds.longitude.values, dtype=np.float64)
+    step = max(1, latitude.size // 1024)
+    digest = hashlib.sha1(latitude[::step].tobytes())
+    digest.update(longitude[::step].tobytes())
+    metric = ds.attrs.get("distance_metric", "equirectangular")
+    return f"{latitude.size}:{digest.hexdigest()}:{metric}"
+
+
+def load_cells(registry, ds) -> None:
+    """Preload the grid cache with the station cells stored in the registry."""
+    grid_key = ds.attrs.get("grid")
+    if registry is None or grid_key is None:
+        return
+    cells = {}
+    for coords, cell in registry.get_cells(grid_registry_key(ds)).items():
+        lat, lon = coords.split(",")
+        cells[(float(lat), float(lon))] = cell
+    grid_cache.preload_station_cells(
+        grid_key, ds.attrs.get("distance_metric", "equirectangular"), cells
+    )
+
+
+def store_cells(registry, ds) -> None:
+    """Store the station cells found in this run in the registry and save it."""
+    grid_key = ds.attrs.get("grid")
+    if registry is None:
+        return
+    if grid_key is not None:
+        cells = grid_cache.station_cells(
+            grid_key, ds.attrs.get("distance_metric", "equirectangular")
+        )
+        registry.put_cells(
+            grid_registry_key(ds),
+            {f"{lat!r},{lon!r}": int(cell) for (lat, lon), cell in cells.items()},
+        )
+    registry.save()
@@ -0,0 +1,163 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Sweep of the interpolation and weighting parameters of update_strength.
+
+The inputs are loaded once and all combinations of ipstyle, eps_val and
+weighting_type are scored by leave-one-station-out cross-validation of the
+change of the tune field at the stations: the change at each station is
+predicted from the other stations and compared with its actual value.
+
+All combinations are evaluated with array operations: the distances
+between the stations are computed once (only the kernel changes with
+eps_val) and the weighted sums of all weighting types are one matrix
+product with the stacked weights.
+"""
+
+# Standard library
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+# First-party
+from realtime_pollen_calibration import distance, rbf, utils
+from realtime_pollen_calibration.update_strength import read_pov_file
+from realtime_pollen_calibration.validation import get_scores, loo_predictions
+
+SweepResult = namedtuple(
+    "SweepResult", ["ipstyle", "eps_val", "weighting_type", "rmse", "bias", "nstns"]
+)
+
+default_eps_vals = (0.25, 0.5, 1.0, 2.0)
+
+
+def sweep_strength(  # pylint: disable=too-many-locals
+    config_obj: utils.Config,
+    ipstyles=utils.ipstyles,
+    eps_vals=default_eps_vals,
+    weighting_types=utils.weighting_types,
+    verbose: bool = False,
+) -> list:
+    """Score the parameter combinations of update_strength.
+
+    Args:
+        config_obj: Configured data structure of class Config.
+        ipstyles: Interpolation styles to evaluate.
+        eps_vals: Values of eps_val to evaluate (ignored for idw).
+        weighting_types: Weighting types to evaluate (built-in or defined in
+            the config).
+        verbose: Optional additional debug prints.
+
+    Returns:
+        List of SweepResult, one per combination, with the
+        leave-one-station-out RMSE and bias of the change of tune over the
+        stations of all species.
+
+    """
+    specs = ["ALNU", "BETU", "POAC", "CORY"]
+    pol_fields = [x + y for x in specs for y in ["tune", "saisn"]]
+    cal_fields, time_values = read_pov_file(
+        config_obj.pov_infile, pol_fields, config_obj
+    )
+    clon, clat = utils.get_grid(config_obj.const_file, config_obj.shared_memory_dir)
+    # constant weights for the plain sums, then the weighting types
+    weights = utils.get_weight_bank(
+        ("constant",) + tuple(weighting_types),
+        config_obj.window_hours,
+        config_obj.weighting_kernels,
+    )
+
+    changes = []
+    coord_lists = []
+    distances = []
+    for pollen_type in sorted({field[:4] for field in cal_fields}):
+        obs_mod_data = utils.read_atab(
+            pollen_type,
+            config_obj.max_miss_stns,
+            config_obj.station_obs_file,
+            config_obj.station_mod_file,
+            verbose=verbose,
+            nhours=config_obj.window_hours,
+            end_time=time_values,
+            qc_settings=config_obj.obs_qc,
+        )
+        stns = np.asarray(obs_mod_data.coord_stns, dtype=np.float64)
+        cells = [
+            distance.nearest_cell(clat, clon, coords, config_obj.distance_metric)
+            for coords in obs_mod_data.coord_stns
+        ]
+        data_mod = obs_mod_data.data_mod[:, obs_mod_data.istation_mod]
+        nstns = data_mod.shape[1]
+        # (1 + nweighting_types, 2 * nstns), obs and model at once
+        sums = utils.get_weighted_sums(
+            np.hstack([obs_mod_data.data_obs, data_mod]), weights
+        )
+        # (nweighting_types, nstns)
+        changes.append(
+            utils.get_change_tune_stns(
+                pollen_type,
+                sums[0, :nstns],
+                sums[0, nstns:],
+                sums[1:, :nstns],
+                sums[1:, nstns:],
+                cal_fields[pollen_type + "tune"][cells],
+                cal_fields[pollen_type + "saisn"][cells],
+            )
+        )
+        coord_lists.append(obs_mod_data.coord_stns)
+        distances.append(
+            distance.station_distances(
+                stns[:, 0], stns[:, 1], stns, config_obj.distance_metric
+            )
+        )
+
+    results = []
+    for ipstyle in ipstyles:
+        for eps_val in eps_vals if ipstyle != "idw" else eps_vals[:1]:
+            predictions = []
+            for change, coord_stns, dist in zip(changes, coord_lists, distances):
+                system = None
+                if ipstyle == "rbf_exact":
+                    system = rbf.get_station_system(
+                        coord_stns,
+                        eps_val,
+                        config_obj.distance_metric,
+                        config_obj.rbf_regularization,
+                    )
+                predictions.append(
+                    loo_predictions(
+                        change,
+                        utils.get_kernel(dist, ipstyle, eps_val),
+                        ipstyle,
+                        system,
+                        baseline=1.0,
+                    )
+                )
+            for iweight, weighting_type in enumerate(weighting_types):
+                rmse, bias = get_scores(
+                    np.concatenate([change[iweight] for change in changes]),
+                    np.concatenate([prediction[iweight] for prediction in predictions]),
+                )
+                results.append(
+                    SweepResult(
+                        ipstyle,
+                        eps_val if ipstyle != "idw" else None,
+                        weighting_type,
+                        rmse,
+                        bias,
+                        sum(change.shape[1] for change in changes),
+                    )
+                )
+    return results
+
+
+def print_sweep(results: list, output: str = "") -> None:
+    """Print the sweep results sorted by RMSE, optionally save them as csv."""
+    table = pd.DataFrame(results, columns=SweepResult._fields).sort_values("rmse")
+    print(table.to_string(index=False))
+    if output:
+        table.to_csv(output, index=False)
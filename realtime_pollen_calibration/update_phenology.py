@@ -7,20 +7,22 @@
 """A module for the update of start and end of the pollen season."""
 
 # Standard library
-import sys
 from datetime import datetime, timedelta
 
 import numpy as np
-import xarray as xr
-from eccodes import (  # type: ignore
-    codes_get,
-    codes_get_array,
-    codes_grib_new_from_file,
-    codes_release,
-)
+from eccodes import codes_get  # type: ignore
 
 # First-party
-from realtime_pollen_calibration import utils
+from realtime_pollen_calibration import (
+    checkpoint,
+    ensemble,
+    gribio,
+    inputs,
+    planner,
+    shared_store,
+    stations,
+    utils,
+)
 
 
 def read_pov_file(pov_infile, pol_fields):
@@ -35,24 +37,16 @@ def read_pov_file(pov_infile, pol_fields):
 
     """
     cal_fields = {}
-    with open(pov_infile, "rb") as fh:
-        while True:
-            # Get the next message
-            rec = codes_grib_new_from_file(fh)
-            if rec is None:
-                break
-
+    with gribio.GribFile(pov_infile) as grib:
+        for rec in grib.handles():
             # Get the short name of the current field
             short_name = codes_get(rec, "shortName")
 
             # Extract field if present
             if short_name in pol_fields:
-                cal_fields[short_name] = codes_get_array(rec, "values")
+                cal_fields[short_name] = gribio.decode_values(rec)
 
-            # Delete the message
-            codes_release(rec)
-
-    # Check if all mandatory fields for all species read are present. If not, exit.
+    # Check if all mandatory fields for all species read are present. If not, raise.
     utils.check_mandatory_fields(cal_fields, pol_fields, pov_infile)
 
     return cal_fields
@@ -62,17 +56,12 @@ def read_t2m_file(t2m_file, config_obj):
     time_values = None
     cal_fields = {}
 
-    with open(t2m_file, "rb") as fh:
-        while True:
-
-            # Get the next message
-            rec = codes_grib_new_from_file(fh)
-            if rec is None:
-                break
+    with gribio.GribFile(t2m_file) as grib:
+        for rec in grib.handles():
             short_name = codes_get(rec, "shortName")
 
             if short_name == "T_2M":
-                cal_fields["T_2M"] = codes_get_array(rec, "values")
+                cal_fields["T_2M"] = gribio.decode_values(rec)
 
                 # timestamp is needed. Take it from the T_2M field
                 data_date = str(codes_get(rec, "dataDate"))
@@ -85,65 +74,244 @@ def read_t2m_file(t2m_file, config_obj):
                 )
                 date_obj_fmt = date_obj.strftime("%Y-%m-%dT%H:00:00.000000000")
                 time_values = np.datetime64(date_obj_fmt)
-            codes_release(rec)
     if "T_2M" not in cal_fields:
-        print(
+        raise utils.CalibrationError(
             f"The mandatory field T_2M could not be read from {t2m_file}\n"
             "No update of the phenology is done until this is fixed!\n"
             "Pollen are still calculated but this should be fixed "
             "within a few days."
         )
-        sys.exit(1)
-    else:
-        print("T_2M field has been read from t2m_file.")
+    print("T_2M field has been read from t2m_file.")
     return cal_fields, time_values
 
 
-def update_phenology_realtime(config_obj: utils.Config, verbose: bool = True):
+def update_phenology_realtime(
+    config_obj: utils.Config, verbose: bool = True, resume: bool = False
+):
     """Update the temperature threshold fields and POACsaisl.
 
+    The update runs in stages, see load_stage, station_stage, change_stage
+    and interpolation_stage. With config_obj.checkpoint_dir set, the outputs
+    of each stage are checkpointed (see checkpoint.py).
+
     Args:
         config_obj: Configured data structure of class Config.
         verbose: Optional additional debug prints.
+        resume: Skip the stages completed by a previous run on the same inputs.
 
     Returns:
         File in GRIB2 format containing the updated temperature threshold fields
         and the length of the grass pollen season (POACsaisl).
 
     """
+    config_obj = planner.plan_run(config_obj, "phenology", verbose)
+    if config_obj.ensemble:
+        update_phenology_ensemble(config_obj, verbose)
+        return
     pol_fields = ["ALNU", "BETU", "POAC", "CORY"]
     pol_fields = [
         x + y for x in pol_fields for y in ["tthrs", "tthre", "saisn", "ctsum"]
     ]
     pol_fields[9] = "POACsaisl"
-    cal_fields = read_pov_file(config_obj.pov_infile, pol_fields)
-    t2m_fields, time_values = read_t2m_file(config_obj.t2m_file, config_obj)
-    cal_fields.update(t2m_fields)
-    cal_fields_arrays = utils.create_data_arrays(
-        cal_fields,
-        utils.read_clon_clat(config_obj.const_file)[0],
-        utils.read_clon_clat(config_obj.const_file)[1],
-        time_values,
+    checkpoints = checkpoint.Checkpoints(config_obj, "phenology", resume)
+
+    dict_fields = checkpoints.load("interpolation")
+    if dict_fields is None:
+        cal_fields = checkpoints.run(
+            "load",
+            lambda: load_stage(config_obj, pol_fields),
+            checkpoint.pack_fields,
+            checkpoint.unpack_fields,
+        )
+        time_values = cal_fields.pop("time_values")
+        # Create an xarray Dataset with the DataArrays
+        ds = utils.create_dataset(cal_fields, time_values, config_obj)
+        registry = stations.open_registry(config_obj.station_registry)
+        stations.load_cells(registry, ds)
+
+        if verbose:
+            print(f"Detected pollen types in the DataSet: {utils.get_pollen_type(ds)}")
+
+        obs_mod_data = checkpoints.run(
+            "stations",
+            lambda: station_stage(
+                config_obj, utils.get_pollen_type(ds), registry, verbose, time_values
+            ),
+            checkpoint.pack_records,
+            lambda arrays: checkpoint.unpack_records(arrays, utils.ObsModData),
+        )
+        dict_fields = calibrate_phenology(
+            ds, obs_mod_data, config_obj, verbose, checkpoints
+        ).fields
+        stations.store_cells(registry, ds)
+
+    utils.to_grib(
+        config_obj.pov_infile,
+        config_obj.pov_outfile,
+        dict_fields,
+        config_obj.hour_incr,
+        workers=config_obj.write_workers,
+        packing=config_obj.output_packing,
     )
+    checkpoints.clear()
 
-    # Create an xarray Dataset with the DataArrays
-    ds = xr.Dataset(cal_fields_arrays)
 
-    if verbose:
-        print(f"Detected pollen types in the DataSet: {utils.get_pollen_type(ds)}")
+def calibrate_phenology(
+    ds,
+    obs_mod_data: dict,
+    config_obj: utils.Config,
+    verbose: bool = True,
+    checkpoints=None,
+) -> utils.CalibrationResult:
+    """Update the phenology fields in memory, without reading or writing files.
 
-    dict_fields = {}
-    for pollen_type in utils.get_pollen_type(ds):
-        obs_mod_data = utils.read_atab(
+    Args:
+        ds: xarray.DataSet of T_2M and the fields <pollen_type>tthrs,
+            <pollen_type>tthre (POACsaisl instead for POAC), <pollen_type>saisn
+            and <pollen_type>ctsum, with the timestamp of the updated fields
+            (see utils.make_dataset).
+        obs_mod_data: {pollen_type: utils.ObsModData} of the pollen types
+            to be updated (see utils.get_station_data).
+        config_obj: Configured data structure of class Config, its file
+            locations are not used.
+        verbose: Optional additional debug prints.
+        checkpoints: Optional checkpoint.Checkpoints of the stages.
+
+    Returns:
+        fields: {field name: updated field} of the non-zero changes.
+        changes: {pollen_type: utils.ChangePhenologyFields at the stations}.
+        station_data: obs_mod_data.
+
+    Raises:
+        CalibrationError: If the inputs or the settings are invalid.
+
+    """
+    utils.check_dataset_fields(
+        ds,
+        ["T_2M"]
+        + [
+            pollen_type + name
+            for pollen_type in obs_mod_data
+            for name in ("tthrs", "saisl" if pollen_type == "POAC" else "tthre")
+            + ("saisn", "ctsum")
+        ],
+    )
+    if checkpoints is None:
+        checkpoints = checkpoint.Checkpoints.inactive()
+    changes = checkpoints.run(
+        "changes",
+        lambda: change_stage(obs_mod_data, ds, verbose),
+        checkpoint.pack_records,
+        lambda arrays: checkpoint.unpack_records(arrays, utils.ChangePhenologyFields),
+    )
+    dict_fields = checkpoints.run(
+        "interpolation",
+        lambda: interpolation_stage(changes, obs_mod_data, ds, config_obj, verbose),
+        checkpoint.pack_fields,
+        checkpoint.unpack_fields,
+    )
+    return utils.CalibrationResult(dict_fields, changes, obs_mod_data)
+
+
+def load_stage(config_obj: utils.Config, pol_fields: list) -> dict:
+    """Check the inputs and load the pollen fields, T_2M and the grid.
+
+    Returns:
+        Fields of pov_infile and T_2M, and the new timestamp (time_values),
+        read-only views of the shared-memory store if
+        config_obj.shared_memory_dir is set.
+
+    """
+
+    def read_t2m():
+        t2m_fields, time_values = read_t2m_file(config_obj.t2m_file, config_obj)
+        return {**t2m_fields, "time_values": time_values}
+
+    loaded = inputs.prepare_inputs(
+        config_obj,
+        "phenology",
+        pol_fields,
+        {
+            "pov": lambda: shared_store.attach(
+                config_obj.shared_memory_dir,
+                config_obj.pov_infile,
+                "phenology",
+                lambda: read_pov_file(config_obj.pov_infile, pol_fields),
+            ),
+            "t2m": lambda: shared_store.attach(
+                config_obj.shared_memory_dir,
+                config_obj.t2m_file,
+                f"t2m:{config_obj.hour_incr}",
+                read_t2m,
+            ),
+            "grid": lambda: utils.get_grid(
+                config_obj.const_file, config_obj.shared_memory_dir
+            ),
+        },
+    )
+    return {**loaded["pov"], **loaded["t2m"]}
+
+
+def station_stage(
+    config_obj: utils.Config,
+    ptype_present: list,
+    registry,
+    verbose: bool = True,
+    end_time=None,
+) -> dict:
+    """Read the observed concentrations at the stations.
+
+    Args:
+        config_obj: Configured data structure of class Config.
+        ptype_present: Pollen types of the fields.
+        registry: stations.StationRegistry (or None).
+        verbose: Optional additional debug prints.
+        end_time: Last hour of the windows of the stations, the time of the
+            updated fields (datetime64).
+
+    Returns:
+        {pollen_type: utils.ObsModData}.
+
+    """
+    return {
+        pollen_type: utils.read_atab(
             pollen_type,
             config_obj.max_miss_stns,
             config_obj.station_obs_file,
             verbose=verbose,
+            registry=registry,
+            nhours=config_obj.window_hours,
+            end_time=end_time,
+            qc_settings=config_obj.obs_qc,
         )
-        change_phenology_fields = utils.get_change_phenol(
-            pollen_type, obs_mod_data, ds, verbose
-        )
+        for pollen_type in ptype_present
+    }
+
+
+def change_stage(obs_mod_data: dict, ds, verbose: bool = True) -> dict:
+    """Compute the changes of the phenology fields at the stations.
+
+    Returns:
+        {pollen_type: utils.ChangePhenologyFields}.
+
+    """
+    return {
+        pollen_type: utils.get_change_phenol(pollen_type, data, ds, verbose)
+        for pollen_type, data in obs_mod_data.items()
+    }
+
+
+def interpolation_stage(
+    changes: dict, obs_mod_data: dict, ds, config_obj: utils.Config, verbose: bool = True
+) -> dict:
+    """Interpolate the non-zero changes of the phenology fields on the grid.
+
+    Returns:
+        {field name: updated field} of the fields to be written.
 
+    """
+    dict_fields = {}
+    for pollen_type, change_phenology_fields in changes.items():
         for field_name, field_values in zip(
             change_phenology_fields._asdict(), change_phenology_fields
         ):
@@ -157,11 +325,111 @@ def update_phenology_realtime(config_obj: utils.Config, verbose: bool = True):
                     field_values,
                     ds,
                     pollen_type + field_name[7:],
-                    obs_mod_data.coord_stns,
+                    obs_mod_data[pollen_type].coord_stns,
                     config_obj=config_obj,
                     method="sum",
+                    mask=utils.get_active_mask(ds, pollen_type + field_name[7:]),
                 )
+    return dict_fields
 
-    utils.to_grib(
-        config_obj.pov_infile, config_obj.pov_outfile, dict_fields, config_obj.hour_incr
-    )
+
+def update_phenology_ensemble(config_obj: utils.Config, verbose: bool = True):
+    """Update the phenology fields of all members of an ensemble in one pass.
+
+    Args:
+        config_obj: Configured data structure of class Config, with the
+            members defined in config_obj.ensemble.
+        verbose: Optional additional debug prints.
+
+    Returns:
+        Files in GRIB2 format containing the updated phenology fields of
+        each member.
+
+    """
+    pol_fields = ["ALNU", "BETU", "POAC", "CORY"]
+    pol_fields = [
+        x + y for x in pol_fields for y in ["tthrs", "tthre", "saisn", "ctsum"]
+    ]
+    pol_fields[9] = "POACsaisl"
+    members = ensemble.get_members(config_obj, "phenology")
+    datasets = []
+    for member in members:
+        config_member = ensemble.member_config(config_obj, member)
+        loaded = inputs.prepare_inputs(
+            config_member,
+            "phenology",
+            pol_fields,
+            {
+                "pov": lambda c=config_member: read_pov_file(c.pov_infile, pol_fields),
+                "t2m": lambda c=config_member: read_t2m_file(c.t2m_file, c),
+            },
+        )
+        cal_fields = loaded["pov"]
+        t2m_fields, time_values = loaded["t2m"]
+        cal_fields.update(t2m_fields)
+        datasets.append(utils.create_dataset(cal_fields, time_values, config_obj))
+    ds = datasets[0]
+    registry = stations.open_registry(config_obj.station_registry)
+    stations.load_cells(registry, ds)
+    ptype_present = [
+        pollen_type
+        for pollen_type in utils.get_pollen_type(ds)
+        if all(pollen_type + "tthrs" in ds_member for ds_member in datasets)
+    ]
+
+    if verbose:
+        print(f"Detected pollen types in all {len(members)} members: {ptype_present}")
+
+    dict_fields: list = [{} for _ in members]
+    for pollen_type in ptype_present:
+        # The observations are the same for all members
+        obs_mod_data = utils.read_atab(
+            pollen_type,
+            config_obj.max_miss_stns,
+            config_obj.station_obs_file,
+            verbose=verbose,
+            registry=registry,
+            nhours=config_obj.window_hours,
+            end_time=ds.time.values,
+            qc_settings=config_obj.obs_qc,
+        )
+        changes = [
+            utils.get_change_phenol(pollen_type, obs_mod_data, ds_member, verbose)
+            for ds_member in datasets
+        ]
+        for field_name in utils.ChangePhenologyFields._fields:
+            field = pollen_type + field_name[7:]
+            # Only the members with a change are interpolated
+            group = [
+                i
+                for i, change in enumerate(changes)
+                if np.count_nonzero(getattr(change, field_name)) > 0
+            ]
+            if verbose:
+                print(f"Members with non-zero values in {field_name}: {group}")
+            if not group:
+                continue
+            values = np.stack([datasets[i][field].values for i in group])
+            field_vec = utils.interpolate(
+                np.stack([getattr(changes[i], field_name) for i in group]),
+                ds,
+                field,
+                obs_mod_data.coord_stns,
+                config_obj=config_obj,
+                method="sum",
+                mask=values != 0,
+                values=values,
+            )
+            for i, vec in zip(group, field_vec):
+                dict_fields[i][field] = vec
+
+    stations.store_cells(registry, ds)
+    for member, member_fields in zip(members, dict_fields):
+        utils.to_grib(
+            member.pov_infile,
+            member.pov_outfile,
+            member_fields,
+            config_obj.hour_incr,
+            workers=config_obj.write_workers,
+            packing=config_obj.output_packing,
+        )
@@ -10,16 +10,19 @@
 from datetime import datetime, timedelta
 
 import numpy as np
-import xarray as xr
-from eccodes import (  # type: ignore
-    codes_get,
-    codes_get_array,
-    codes_grib_new_from_file,
-    codes_release,
-)
+from eccodes import codes_get  # type: ignore
 
 # First-party
-from realtime_pollen_calibration import utils
+from realtime_pollen_calibration import (
+    checkpoint,
+    ensemble,
+    gribio,
+    inputs,
+    planner,
+    shared_store,
+    stations,
+    utils,
+)
 
 
 def read_pov_file(pov_infile, pol_fields, config_obj):
@@ -36,19 +39,14 @@ def read_pov_file(pov_infile, pol_fields, config_obj):
     """
     time_values = None
     cal_fields = {}
-    with open(pov_infile, "rb") as fh:
-        while True:
-            # Get the next message
-            rec = codes_grib_new_from_file(fh)
-            if rec is None:
-                break
-
+    with gribio.GribFile(pov_infile) as grib:
+        for rec in grib.handles():
             # Get the short name of the current field
             short_name = codes_get(rec, "shortName")
             print("POV variable short name is:", short_name)
             # Extract field if present
             if short_name in pol_fields:
-                cal_fields[short_name] = codes_get_array(rec, "values")
+                cal_fields[short_name] = gribio.decode_values(rec)
 
                 data_date = str(codes_get(rec, "dataDate"))
                 hour = str(codes_get(rec, "hour")).zfill(2)
@@ -60,70 +58,356 @@ def read_pov_file(pov_infile, pol_fields, config_obj):
                 date_obj_fmt = date_obj.strftime("%Y-%m-%dT%H:00:00.000000000")
                 time_values = np.datetime64(date_obj_fmt)
 
-            codes_release(rec)
-
-    # Check if all mandatory fields for all species read are present. If not, exit.
+    # Check if all mandatory fields for all species read are present. If not, raise.
     utils.check_mandatory_fields(cal_fields, pol_fields, pov_infile)
 
     return cal_fields, time_values
 
 
-def update_strength_realtime(config_obj: utils.Config, verbose: bool = True):
+def update_strength_realtime(
+    config_obj: utils.Config, verbose: bool = True, resume: bool = False
+):
     """Update the tune field.
 
+    The update runs in stages, see load_stage, station_stage, change_stage
+    and interpolation_stage. With config_obj.checkpoint_dir set, the outputs
+    of each stage are checkpointed (see checkpoint.py).
+
     Args:
         config_obj: Configured data structure of class Config.
         verbose: Optional additional debug prints.
+        resume: Skip the stages completed by a previous run on the same inputs.
 
     Returns:
         File in GRIB2 format containing the updated temperature tune fields.
 
     """
+    config_obj = planner.plan_run(config_obj, "strength", verbose)
+    if config_obj.ensemble:
+        update_strength_ensemble(config_obj, verbose)
+        return
     specs = ["ALNU", "BETU", "POAC", "CORY"]
     fields = ["tune", "saisn"]
     pol_fields = [x + y for x in specs for y in fields]
-    cal_fields, time_values = read_pov_file(
-        config_obj.pov_infile, pol_fields, config_obj
+    checkpoints = checkpoint.Checkpoints(config_obj, "strength", resume)
+
+    dict_fields = checkpoints.load("interpolation")
+    if dict_fields is None:
+        cal_fields = checkpoints.run(
+            "load",
+            lambda: load_stage(config_obj, pol_fields),
+            checkpoint.pack_fields,
+            checkpoint.unpack_fields,
+        )
+        time_values = cal_fields.pop("time_values")
+        ds = utils.create_dataset(cal_fields, time_values, config_obj)
+        registry = stations.open_registry(config_obj.station_registry)
+        stations.load_cells(registry, ds)
+        ptype_present = utils.get_pollen_type(ds)
+
+        if verbose:
+            print(f"Detected pollen types in the DataSet provided: {ptype_present}")
+
+        obs_mod_data = checkpoints.run(
+            "stations",
+            lambda: station_stage(
+                config_obj, ptype_present, registry, verbose, time_values
+            ),
+            checkpoint.pack_records,
+            lambda arrays: checkpoint.unpack_records(arrays, utils.ObsModData),
+        )
+        dict_fields = calibrate_strength(
+            ds, obs_mod_data, config_obj, verbose, checkpoints
+        ).fields
+        stations.store_cells(registry, ds)
+
+    utils.to_grib(
+        config_obj.pov_infile,
+        config_obj.pov_outfile,
+        dict_fields,
+        config_obj.hour_incr,
+        workers=config_obj.write_workers,
+        packing=config_obj.output_packing,
     )
-    cal_fields_arrays = utils.create_data_arrays(
-        cal_fields,
-        utils.read_clon_clat(config_obj.const_file)[0],
-        utils.read_clon_clat(config_obj.const_file)[1],
-        time_values,
+    checkpoints.clear()
+
+
+def calibrate_strength(
+    ds,
+    obs_mod_data: dict,
+    config_obj: utils.Config,
+    verbose: bool = True,
+    checkpoints=None,
+) -> utils.CalibrationResult:
+    """Update the tune fields in memory, without reading or writing files.
+
+    Args:
+        ds: xarray.DataSet of the fields <pollen_type>tune and
+            <pollen_type>saisn (see utils.make_dataset).
+        obs_mod_data: {pollen_type: utils.ObsModData} of the pollen types
+            to be updated (see utils.get_station_data).
+        config_obj: Configured data structure of class Config, its file
+            locations are not used.
+        verbose: Optional additional debug prints.
+        checkpoints: Optional checkpoint.Checkpoints of the stages.
+
+    Returns:
+        fields: {field name: updated tune field}.
+        changes: {pollen_type: change of tune at the stations}.
+        station_data: obs_mod_data.
+
+    Raises:
+        CalibrationError: If the inputs or the settings are invalid.
+
+    """
+    utils.check_dataset_fields(
+        ds,
+        [
+            pollen_type + name
+            for pollen_type in obs_mod_data
+            for name in ("tune", "saisn")
+        ],
+    )
+    if checkpoints is None:
+        checkpoints = checkpoint.Checkpoints.inactive()
+    change_tune = checkpoints.run(
+        "changes",
+        lambda: change_stage(obs_mod_data, ds, config_obj, verbose),
+        checkpoint.pack_fields,
+        checkpoint.unpack_fields,
+    )
+    dict_fields = checkpoints.run(
+        "interpolation",
+        lambda: interpolation_stage(change_tune, obs_mod_data, ds, config_obj),
+        checkpoint.pack_fields,
+        checkpoint.unpack_fields,
     )
+    return utils.CalibrationResult(dict_fields, change_tune, obs_mod_data)
 
-    ds = xr.Dataset(cal_fields_arrays)
-    ptype_present = utils.get_pollen_type(ds)
 
-    if verbose:
-        print(f"Detected pollen types in the DataSet provided: {ptype_present}")
+def load_stage(config_obj: utils.Config, pol_fields: list) -> dict:
+    """Check the inputs and load the pollen fields and the grid.
 
-    dict_fields = {}
-    for pollen_type in ptype_present:
-        obs_mod_data = utils.read_atab(
+    Returns:
+        Fields of pov_infile and their new timestamp (time_values), read-only
+        views of the shared-memory store if config_obj.shared_memory_dir is set.
+
+    """
+
+    def read_pov():
+        cal_fields, time_values = read_pov_file(
+            config_obj.pov_infile, pol_fields, config_obj
+        )
+        return {**cal_fields, "time_values": time_values}
+
+    loaded = inputs.prepare_inputs(
+        config_obj,
+        "strength",
+        pol_fields,
+        {
+            "pov": lambda: shared_store.attach(
+                config_obj.shared_memory_dir,
+                config_obj.pov_infile,
+                f"strength:{config_obj.hour_incr}",
+                read_pov,
+            ),
+            "grid": lambda: utils.get_grid(
+                config_obj.const_file, config_obj.shared_memory_dir
+            ),
+        },
+    )
+    return dict(loaded["pov"])
+
+
+def station_stage(
+    config_obj: utils.Config,
+    ptype_present: list,
+    registry,
+    verbose: bool = True,
+    end_time=None,
+) -> dict:
+    """Read the observed and modelled concentrations at the stations.
+
+    Args:
+        config_obj: Configured data structure of class Config.
+        ptype_present: Pollen types of the fields.
+        registry: stations.StationRegistry (or None).
+        verbose: Optional additional debug prints.
+        end_time: Last hour of the windows of the stations, the time of the
+            updated fields (datetime64).
+
+    Returns:
+        {pollen_type: utils.ObsModData}.
+
+    """
+    return {
+        pollen_type: utils.read_atab(
             pollen_type,
             config_obj.max_miss_stns,
             config_obj.station_obs_file,
             config_obj.station_mod_file,
             verbose=verbose,
+            registry=registry,
+            nhours=config_obj.window_hours,
+            end_time=end_time,
+            qc_settings=config_obj.obs_qc,
         )
-        change_tune = utils.get_change_tune(
+        for pollen_type in ptype_present
+    }
+
+
+def change_stage(
+    obs_mod_data: dict, ds, config_obj: utils.Config, verbose: bool = True
+) -> dict:
+    """Compute the change of tune at the stations.
+
+    Returns:
+        {pollen_type: change of tune at the stations}.
+
+    """
+    return {
+        pollen_type: utils.get_change_tune(
             pollen_type,
-            obs_mod_data,
+            data,
             ds,
             config_obj,
             verbose=verbose,
         )
-        tune_vec = utils.interpolate(
-            change_tune,
+        for pollen_type, data in obs_mod_data.items()
+    }
+
+
+def interpolation_stage(
+    change_tune: dict, obs_mod_data: dict, ds, config_obj: utils.Config
+) -> dict:
+    """Interpolate the changes of tune on the grid.
+
+    Returns:
+        {field name: updated field} of the fields to be written.
+
+    """
+    dict_fields = {}
+    for pollen_type, change in change_tune.items():
+        dict_fields[pollen_type + "tune"] = utils.interpolate(
+            change,
             ds,
             pollen_type + "tune",
-            obs_mod_data.coord_stns,
+            obs_mod_data[pollen_type].coord_stns,
             config_obj=config_obj,
             method="multiply",
+            mask=utils.get_active_mask(ds, pollen_type + "tune"),
         )
-        dict_fields[pollen_type + "tune"] = tune_vec
+    return dict_fields
 
-    utils.to_grib(
-        config_obj.pov_infile, config_obj.pov_outfile, dict_fields, config_obj.hour_incr
-    )
+
+def update_strength_ensemble(config_obj: utils.Config, verbose: bool = True):
+    """Update the tune fields of all members of an ensemble in one pass.
+
+    Args:
+        config_obj: Configured data structure of class Config, with the
+            members defined in config_obj.ensemble.
+        verbose: Optional additional debug prints.
+
+    Returns:
+        Files in GRIB2 format containing the updated tune fields of each member.
+
+    """
+    specs = ["ALNU", "BETU", "POAC", "CORY"]
+    fields = ["tune", "saisn"]
+    pol_fields = [x + y for x in specs for y in fields]
+    members = ensemble.get_members(config_obj, "strength")
+    datasets = []
+    for member in members:
+        config_member = ensemble.member_config(config_obj, member)
+        loaded = inputs.prepare_inputs(
+            config_member,
+            "strength",
+            pol_fields,
+            {"pov": lambda c=config_member: read_pov_file(c.pov_infile, pol_fields, c)},
+        )
+        datasets.append(utils.create_dataset(*loaded["pov"], config_obj))
+    ds = datasets[0]
+    registry = stations.open_registry(config_obj.station_registry)
+    stations.load_cells(registry, ds)
+    ptype_present = [
+        pollen_type
+        for pollen_type in utils.get_pollen_type(ds)
+        if all(pollen_type + "tune" in ds_member for ds_member in datasets)
+    ]
+
+    if verbose:
+        print(f"Detected pollen types in all {len(members)} members: {ptype_present}")
+
+    dict_fields: list = [{} for _ in members]
+    for pollen_type in ptype_present:
+        field = pollen_type + "tune"
+        # The observations are read once, the model data per member. The
+        # quality control and the missing values depend on the model data.
+        data_obs, headerdata, end_time = utils.read_obs_window(
+            pollen_type,
+            config_obj.station_obs_file,
+            verbose,
+            registry,
+            config_obj.window_hours,
+            ds.time.values,
+        )
+        obs_mod_data = []
+        for member in members:
+            data_mod, mod_columns, present = utils.read_mod_window(
+                pollen_type,
+                member.station_mod_file,
+                end_time,
+                config_obj.window_hours,
+                registry,
+            )
+            obs_mod_data.append(
+                utils.get_station_data(
+                    pollen_type,
+                    data_obs,
+                    headerdata,
+                    config_obj.max_miss_stns,
+                    data_mod,
+                    mod_columns,
+                    verbose=verbose,
+                    qc_settings=config_obj.obs_qc,
+                    file_mod_stns=member.station_mod_file,
+                    present=present,
+                )
+            )
+        for group in ensemble.group_members(obs_mod_data):
+            coord_stns = obs_mod_data[group[0]].coord_stns
+            tune = np.stack([datasets[i][field].values for i in group])
+            saisn = np.stack([datasets[i][pollen_type + "saisn"].values for i in group])
+            change_tune = ensemble.get_change_tune_members(
+                pollen_type,
+                [obs_mod_data[i] for i in group],
+                ensemble.get_station_values(ds, tune, coord_stns),
+                ensemble.get_station_values(ds, saisn, coord_stns),
+                config_obj,
+            )
+            if verbose:
+                for i, change in zip(group, change_tune):
+                    print(f"Change of {field} at the stations of member {i}: {change}")
+            tune_vec = utils.interpolate(
+                change_tune,
+                ds,
+                field,
+                coord_stns,
+                config_obj=config_obj,
+                method="multiply",
+                mask=tune != 0,
+                values=tune,
+            )
+            for i, vec in zip(group, tune_vec):
+                dict_fields[i][field] = vec
+
+    stations.store_cells(registry, ds)
+    for member, member_fields in zip(members, dict_fields):
+        utils.to_grib(
+            member.pov_infile,
+            member.pov_outfile,
+            member_fields,
+            config_obj.hour_incr,
+            workers=config_obj.write_workers,
+            packing=config_obj.output_packing,
+        )
@@ -6,18 +6,42 @@
 
 """Utils for the command line tool."""
 # Standard library
+import hashlib
 import logging
-import sys
-from collections import namedtuple
+import os
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass,field
 from datetime import datetime, timedelta
 
 import eccodes  # type: ignore
 import numpy as np  # type: ignore
-import numpy.typing as npt
 import pandas as pd  # type: ignore
 import xarray as xr  # type: ignore
 
+# First-party
+from realtime_pollen_calibration import (
+    atab,
+    coarse,
+    distance,
+    domain,
+    fused,
+    gribio,
+    qc,
+    rbf,
+    shared_store,
+    stations,
+    weighting,
+)
+from realtime_pollen_calibration.cache import grid_cache
+from realtime_pollen_calibration.errors import CalibrationError
+
+try:
+    import dask.array as da  # type: ignore
+except ImportError:  # dask is optional, only needed for chunk_size > 0 with use_dask
+    da = None
+
 
 @dataclass
 class Config:  # pylint: disable=too-many-instance-attributes
@@ -67,15 +91,36 @@ class Config:  # pylint: disable=too-many-instance-attributes
         stepwise=all weights are set to 1, up to 72 hours, then to 0, 
         equivalent to the non-weighted method with reduced averaging window
         switch=all weights are scaled from 1 to 0 using a switching kernel
+        or the name of a kernel defined in weighting_kernels.
+    """
+
+    weighting_kernels: dict = field(default_factory=dict)
+    """Weighting kernels with parameters, usable as weighting_type, e.g.
+       {"exp24": {"kernel": "exponential", "half_life": 24}} (see weighting.py).
+       Like the built-in kernels, they weigh the first hour of the window
+       (oldest first) with 1.
     """
 
     # This part is to set the interpolation method
     ipstyle: str="idw"
     eps_val: float=1.0
     """ Settings of the interpolation method for calculating tune and phenology field values between the stations
-        The default is inverse distance weighting (idw). Options: gaussian radial basis function (rbf_g) and 
-        inverse multiquadratic radial basis function (rbf_mq). eps_val is the free parameter of the kernel in degrees
-        it is converted to radians within the code.
+        The default is inverse distance weighting (idw). Options: gaussian radial basis function (rbf_g),
+        inverse multiquadratic radial basis function (rbf_mq) and exact gaussian radial basis function
+        interpolation reproducing the station values (rbf_exact). eps_val is the free parameter of the kernel
+        in degrees it is converted to radians within the code.
+    """
+
+    rbf_regularization: float = 0.0
+    """Regularization added to the diagonal of the station kernel matrix of rbf_exact.
+       With values > 0 the station values are no longer reproduced exactly but the
+       interpolation gets smoother and the system better conditioned.
+    """
+
+    distance_metric: str = "equirectangular"
+    """ Metric of the distances between stations and grid cells used by the interpolation
+        and to find the grid cells of the stations. Options: equirectangular (default, approximation
+        used in COSMO), chord and haversine (great-circle distance), see distance.py.
     """
 
     # max_param and min_param are limiters for the change applied to the
@@ -83,10 +128,134 @@ class Config:  # pylint: disable=too-many-instance-attributes
     max_param: dict = field(default_factory=lambda: {"ALNU": 3.389, "BETU": 4.046, "POAC": 1.875, "CORY": 7.738})
     min_param: dict = field(default_factory= lambda: {"ALNU": 0.235, "BETU": 0.222, "POAC": 0.405, "CORY": 0.216})
 
+    chunk_size: int = 0
+    """Number of grid cells per chunk along the index dimension for the
+       grid-wide operations (interpolation, clamping, edge-zeroing).
+       0 (default) processes the whole grid at once.
+    """
+
+    use_dask: bool = False
+    """Run the chunked operations lazily with dask (if installed) and
+       stream the results chunk by chunk into to_grib. Only relevant if
+       chunk_size > 0, otherwise NumPy is used.
+    """
+
+    domain_workers: int = 1
+    """Number of workers processing contiguous ranges of cells of the
+       interpolation, clamping and masking (see domain.py). 1 (default)
+       processes the grid in the calling process, 0 uses all CPUs.
+    """
+
+    domain_backend: str = "processes"
+    """Workers of domain_workers: processes (default, a process pool of the
+       node) or mpi (MPI ranks with mpi4py.futures if installed).
+    """
+
+    coarse_mesh_step: float = 0.0
+    """Step in degrees of a regular lat/lon mesh on which the interpolation
+       is evaluated before the bilinear remap to the cells (see coarse.py),
+       e.g. 0.05. 0 (default) evaluates the interpolation at every cell.
+    """
+
+    coarse_mesh_tolerance: float = 0.01
+    """Maximum deviation of the coarse mesh interpolation from the direct one,
+       relative to the largest change at the stations, checked at a sample of
+       the cells. Beyond, the interpolation is evaluated at every cell.
+    """
+
+    interpolation_backend: str = "numpy"
+    """Implementation of the interpolation: numpy (default) or numba (fused
+       kernel compiled with numba if installed, see fused.py, not used for
+       rbf_exact).
+    """
+
+    station_registry: str = ""
+    """Optional json file of the station registry (see stations.py), keeping
+       the parsed ATAB headers, the model file columns and the grid cells of
+       the stations across runs. Empty (default) disables the registry.
+    """
+
+    write_workers: int = 1
+    """Number of threads encoding the GRIB messages of the output file.
+       The messages are written in the order of the input file.
+    """
+
+    ensemble: dict = field(default_factory=dict)
+    """Optional ensemble mode (see ensemble.py): the members are calibrated
+       in one pass, with the keys pov_infiles, station_mod_files (strength)
+       and t2m_files (phenology, optional), each a glob pattern or a list,
+       and the template pov_outfile with the placeholder {member}.
+       Empty (default) calibrates pov_infile only.
+    """
+
+    result_cache_dir: str = ""
+    """Optional directory of the result cache (see result_cache.py). A run on
+       the same inputs and settings as a previous run takes pov_outfile from
+       the cache. Empty (default) disables the cache.
+    """
+
+    result_cache_max_mb: float = 0
+    """Maximum size of the result cache in MB, the least recently used
+       entries are removed beyond. 0 (default) is unlimited.
+    """
+
+    result_cache_max_age_hours: float = 0
+    """Entries of the result cache unused for this number of hours are
+       removed. 0 (default) keeps them.
+    """
+
+    checkpoint_dir: str = ""
+    """Optional directory of the checkpoints of the stages of a run (see
+       checkpoint.py), used by a run with resume. Empty (default) disables
+       the checkpoints.
+    """
+
+    shared_memory_dir: str = ""
+    """Optional directory of the shared-memory store (e.g. /dev/shm, see
+       shared_store.py). The grid and the decoded input fields are shared
+       read-only by the calibration processes of a node. Empty (default)
+       keeps them in the memory of each process.
+    """
+
+    memory_budget: float = 0
+    """Optional memory budget of a run in MB (see planner.py). chunk_size,
+       use_dask and write_workers are then chosen from the sizes of the run
+       to keep the estimated peak memory within the budget. 0 (default) uses
+       the configured settings.
+    """
+
+    obs_qc: dict = field(default_factory=dict)
+    """Optional quality control of the observations (see qc.py) with the
+       settings spike_hours, spike_threshold, spike_min, flatline_hours,
+       max_ratio and ratio_offset, missing settings take the defaults of
+       qc.defaults. Flagged observations are treated as missing values.
+       Empty (default) disables the quality control.
+    """
+
+    window_hours: int = 120
+    """Length in hours of the window of observed and modelled concentrations,
+       ending at the last observation. The rows of the ATAB files are aligned
+       on the hours of this window.
+    """
+
+    output_packing: dict = field(default_factory=dict)
+    """Packing of the updated fields in the output file, with the optional keys
+       packingType (e.g. grid_simple, grid_ccsds), bitsPerValue and
+       decimalPrecision (number of decimals kept with simple packing).
+       Empty (default) keeps the packing of the input messages.
+    """
+
 ObsModData = namedtuple(
     "ObsModData",
-    ["data_obs", "coord_stns", "missing_value", "data_mod", "istation_mod"],
-    defaults=[None, None],
+    [
+        "data_obs",
+        "coord_stns",
+        "missing_value",
+        "data_mod",
+        "istation_mod",
+        "qc_flags",
+    ],
+    defaults=[None, None, None],
 )
 HeaderData = namedtuple(
     "HeaderData", ["coord_stns", "missing_value", "stn_indicators", "n_header"]
@@ -94,9 +263,20 @@ HeaderData = namedtuple(
 ChangePhenologyFields = namedtuple(
     "ChangePhenologyFields", ["change_tthrs", "change_tthre", "change_saisl"]
 )
+CalibrationResult = namedtuple(
+    "CalibrationResult", ["fields", "changes", "station_data"]
+)
 
 pollen_types = ["ALNU", "BETU", "POAC", "CORY"]
 
+ipstyles = ("idw", "rbf_g", "rbf_mq", "rbf_exact")
+
+interpolation_backends = ("numpy", "numba")
+
+weighting_types = weighting.builtin_kernels
+
+packing_keys = ("packingType", "bitsPerValue", "decimalPrecision")
+
 # thr_con_24 and thr_con_120 are thresholds for sums of hourly observed
 # pollen observations used to make sure that pollen calibration is only
 # performed if pollen concentrations were high enough to ensure robust
@@ -136,41 +316,237 @@ def count_to_log_level(count: int) -> int:
 
 
 def read_clon_clat(const_file):
-    with open(const_file, "rb") as fh:
+    with gribio.GribFile(const_file) as grib:
         clon, clat = None, None
-        while True:
-            # Get the next message
-            rec = eccodes.codes_grib_new_from_file(fh)
-            if rec is None:
-                break
+        for rec in grib.handles():
             short_name = eccodes.codes_get(rec, "shortName")
             # Extract longitude and latitude of the ICON grid
             if short_name == "CLON":
-                clon = eccodes.codes_get_array(rec, "values")
+                clon = gribio.decode_values(rec)
             elif short_name == "CLAT":
-                clat = eccodes.codes_get_array(rec, "values")
-
-            # Delete the message
-            eccodes.codes_release(rec)
+                clat = gribio.decode_values(rec)
     return clon, clat
 
 
-def read_atab(
+def get_grid(const_file, shared_memory_dir: str = ""):
+    """Get clon and clat of the grid, read only once per process.
+
+    Args:
+        const_file: ICON GRIB2 file containing CLON and CLAT.
+        shared_memory_dir: Optional directory of the shared-memory store
+            (see shared_store.py), the grid is then read once per node.
+
+    Returns:
+        clon, clat: Longitudes and latitudes of the grid cells.
+
+    """
+
+    def read():
+        arrays = shared_store.attach(
+            shared_memory_dir,
+            const_file,
+            "grid",
+            lambda: dict(zip(("clon", "clat"), read_clon_clat(const_file))),
+        )
+        return arrays["clon"], arrays["clat"]
+
+    return grid_cache.geometry(os.path.realpath(const_file), read)
+
+
+def get_grid_xyz(ds):
+    """Get the unit vectors of the grid cells, computed once per grid.
+
+    Args:
+        ds: xarray.DataSet.
+
+    Returns:
+        Array of shape (ncells, 3).
+
+    """
+
+    def compute():
+        return distance.unit_vectors(ds.latitude.values, ds.longitude.values)
+
+    grid_key = ds.attrs.get("grid")
+    if grid_key is None:
+        return compute()
+    return grid_cache.unit_vectors(grid_key, compute)
+
+
+def read_atab_header_lines(file_data: str) -> list:
+    """Read the header lines of an ATAB file up to the PARAMETER line (included)."""
+    lines = []
+    with open(file_data, encoding="utf-8") as f:
+        for line in f:
+            lines.append(line)
+            if line.strip()[0:9] == "PARAMETER":
+                break
+    return lines
+
+
+def header_value(line: str, label: str):
+    """Text after "<label>:" of a header line, None for other lines."""
+    name, _, value = line.strip().partition(":")
+    if name != label:
+        return None
+    return value.strip()
+
+
+def parse_atab_header(lines: list, layout: str = "obs", file_data: str = ""):
+    """Parse the header lines of an ATAB file (see read_atab_header_lines).
+
+    Args:
+        lines: Header lines up to the PARAMETER line.
+        layout: "obs" for the observation file, "mod" for the model file.
+        file_data: Location of the ATAB file, for the error message.
+
+    Returns:
+        Parsed header (coordinates are empty for layout "mod").
+
+    Raises:
+        CalibrationError: If the Indicator or PARAMETER line is missing.
+
+    """
+    lat_stns = np.array([])
+    lon_stns = np.array([])
+    missing_value = None
+    stn_indicators = None
+    n_header = None
+    for n, line in enumerate(lines):
+        if (value := header_value(line, "Latitude")) is not None:
+            lat_stns = np.fromstring(value, sep=" ")
+        if (value := header_value(line, "Longitude")) is not None:
+            lon_stns = np.fromstring(value, sep=" ")
+        if (value := header_value(line, "Missing_value_code")) is not None:
+            missing_value = float(value)
+        if (value := header_value(line, "Indicator")) is not None:
+            if layout == "obs":
+                stn_indicators = np.array(value.split("\t"))
+            else:
+                # Columns are aligned with a variable number of blanks
+                stn_indicators = np.array(value.split())
+        if line.strip()[0:9] == "PARAMETER":
+            n_header = n
+            break
+    if n_header is None or stn_indicators is None:
+        raise CalibrationError(
+            f"No station header (Indicator and PARAMETER lines) found in {file_data}."
+        )
+    coord_stns = list(zip(lat_stns, lon_stns))
+    return HeaderData(coord_stns, missing_value, stn_indicators, n_header)
+
+
+def read_atab_header(file_data: str, layout: str = "obs"):
+    """Read the header lines of an ATAB file up to the PARAMETER line.
+
+    Args:
+        file_data: Location of the ATAB file.
+        layout: "obs" for the observation file, "mod" for the model file.
+
+    Returns:
+        header: Text of the header lines.
+        headerdata: Parsed header (coordinates are empty for layout "mod").
+
+    """
+    lines = read_atab_header_lines(file_data)
+    return "".join(lines), parse_atab_header(lines, layout, file_data)
+
+
+def get_atab_header(file_data: str, layout: str = "obs", registry=None):
+    """Get the parsed header of an ATAB file, from the station registry if known.
+
+    Only the header lines are read, the station lines are hashed (see
+    stations.header_key) and the header is parsed if the registry does not
+    know them.
+
+    Args:
+        file_data: Location of the ATAB file.
+        layout: "obs" for the observation file, "mod" for the model file.
+        registry: Optional stations.StationRegistry.
+
+    Returns:
+        key: Hash of the station lines of the header.
+        headerdata: Parsed header.
+
+    """
+    lines = read_atab_header_lines(file_data)
+    key = stations.header_key(lines, layout)
+    entry = None if registry is None else registry.get_header(key)
+    if entry is not None:
+        return key, HeaderData(
+            list(zip(np.array(entry["lat"]), np.array(entry["lon"]))),
+            entry["missing_value"],
+            np.array(entry["indicators"]),
+            entry["n_header"],
+        )
+    headerdata = parse_atab_header(lines, layout, file_data)
+    if registry is not None:
+        registry.put_header(
+            key,
+            {
+                "lat": [float(c[0]) for c in headerdata.coord_stns],
+                "lon": [float(c[1]) for c in headerdata.coord_stns],
+                "missing_value": headerdata.missing_value,
+                "indicators": headerdata.stn_indicators.tolist(),
+                "n_header": headerdata.n_header,
+            },
+        )
+    return key, headerdata
+
+
+def get_mod_stn_index(stn_indicators, mod_columns: dict, file_mod_stns: str):
+    """Find the column in the model file of each station of the observations.
+
+    Args:
+        stn_indicators: Indicators of the observed stations.
+        mod_columns: Mapping of the indicators to the model file columns.
+        file_mod_stns: Location of the model ATAB file (for the error message).
+
+    Returns:
+        Array of the model columns, in the order of stn_indicators.
+
+    """
+    missing = [stn for stn in stn_indicators if stn not in mod_columns]
+    if missing:
+        raise CalibrationError(
+            f"Stations {missing} are missing in the model data file {file_mod_stns}."
+        )
+    return np.array([mod_columns[stn] for stn in stn_indicators], dtype=np.int64)
+
+
+def read_atab(  # pylint: disable=too-many-positional-arguments,too-many-arguments
     pollen_type: str,
     max_miss_stns: int,
     file_obs_stns: str,
     file_mod_stns: str = "",
     verbose: bool = True,
+    registry=None,
+    nhours: int = 120,
+    end_time=None,
+    qc_settings=None,
 ) -> ObsModData:
     # pylint: disable=too-many-locals
     """Read the pollen concentrations and the station locations from the ATAB files.
 
+    The observed and modelled rows are aligned on the hourly window of
+    nhours ending at end_time. Hours without observations are filled with
+    the missing value (see treat_missing); hours without model data are
+    excluded from both series (see get_station_data).
+
     Args:
         pollen_type: String describing the pollen type analysed.
         file_obs_stns: Location of the observation ATAB file.
         file_mod_stns: Location of the model ATAB file. (Optional)
         max_miss_stns: Max. number of stations with more than 50% missing data
         verbose: Optional additional debug prints.
+        registry: Optional stations.StationRegistry, the headers are only
+                parsed if their station set is not known yet.
+        nhours: Length of the window in hours.
+        end_time: Last hour of the window (datetime64), i.e. the time of
+                the updated fields. Defaults to the last observation of
+                pollen_type.
+        qc_settings: Optional settings of the quality control of the
+                observations (see qc.py), None or empty to disable it.
 
     Returns:
         data: Array containing the observed concentration values.
@@ -180,100 +556,229 @@ def read_atab(
         missing_value: Value considered as a missing measurement.
         istation_mod: Index for the correspondence between the columns of data
                 and the columns of data_mod (if file_data_mod is provided.)
+        qc_flags: Array of the flags of the quality control of data (see
+                qc.get_flags), before the treatment of the missing values.
 
     """
-
-    def get_mod_stn_index(stn_indicators, stn_indicators_mod):
-        """Find the correspondence between station indices in the two files."""
-        [_, is1, is2] = np.intersect1d(
-            stn_indicators, stn_indicators_mod, assume_unique=True, return_indices=True
-        )
-        return is2[np.argsort(is1)]
-
-    def read_obs_header(file_data: str):
-        """Read the info from the header of the ATAB.
-
-        Args:
-            file_data: Location of the ATAB file.
-
-        Returns:
-            coord_stns: List of (lat, lon) tuples of the stations' coordinates.
-            missing_value: Value considered as a missing value.
-            stn_indicators: Used for correspondence between
-            observed and modelled data.
-
-        """
-        lat_stns = np.array([])
-        lon_stns = np.array([])
-        missing_value = None
-        stn_indicators = None
-        with open(file_data, encoding="utf-8") as f:
-            for n, line in enumerate(f):
-                if line.strip()[0:8] == "Latitude":
-                    lat_stns = np.fromstring(line.strip()[10:], sep=" ")
-                if line.strip()[0:9] == "Longitude":
-                    lon_stns = np.fromstring(line.strip()[11:], sep=" ")
-                if line.strip()[0:18] == "Missing_value_code":
-                    missing_value = float(line.strip()[20:])
-                if line.strip()[0:9] == "Indicator":
-                    stn_indicators = np.array(line.strip()[11:].split("\t"))
-                if line.strip()[0:9] == "PARAMETER":
-                    n_header = n
-                    break
-            coord_stns = list(zip(lat_stns, lon_stns))
-        return HeaderData(coord_stns, missing_value, stn_indicators, n_header)
-
-    headerdata = read_obs_header(file_obs_stns)
-    data_obs = pd.read_csv(
-        file_obs_stns,
-        header=headerdata.n_header,
-        sep=r"\s+",
-        parse_dates=[[1, 2, 3, 4, 5]],
+    data_obs, headerdata, end_time = read_obs_window(
+        pollen_type, file_obs_stns, verbose, registry, nhours, end_time
     )
-    data_obs = data_obs[data_obs["PARAMETER"] == pollen_type].iloc[:, 2:].to_numpy()
     if file_mod_stns != "":
-        stn_indicators_mod = None
-        missing_value = None
-        with open(file_mod_stns, encoding="utf-8") as f:
-            for n, line in enumerate(f):
-                if line.strip()[0:18] == "Missing_value_code":
-                    missing_value = float(line.strip()[20:])
-                if line.strip()[0:9] == "Indicator":
-                    stn_indicators_mod = np.array(line.strip()[29:].split("         "))
-                if line.strip()[0:9] == "PARAMETER":
-                    n_header_mod = n
-                    break
-        data_mod = pd.read_csv(
-            file_mod_stns,
-            header=n_header_mod,
-            sep=r"\s+",
-            parse_dates=[[3, 4, 5, 6, 7]],
+        data_mod, mod_columns, present = read_mod_window(
+            pollen_type, file_mod_stns, end_time, nhours, registry
         )
-        data_mod = data_mod[data_mod["PARAMETER"] == pollen_type].iloc[:, 4:].to_numpy()
-        if missing_value in data_mod:
-            print(
-                "There is at least one missing value",
-                f"in the model data file {file_mod_stns}.\n",
-                "Please check the reason (fieldextra retrieval namelist?).",
-                "No pollen calibration update is performed until this is fixed! ",
-                "Pollen in ICON will still work, but calibration fields get ",
-                "more and more outdated.",
-            )
-            sys.exit(1)
     else:
-        data_mod = 0
-        istation_mod = 0
-    data_obs, headerdata = treat_missing(
+        data_mod = None
+        mod_columns = None
+        present = None
+    return get_station_data(
+        pollen_type,
         data_obs,
         headerdata,
         max_miss_stns,
+        data_mod,
+        mod_columns,
+        verbose=verbose,
+        qc_settings=qc_settings,
+        file_mod_stns=file_mod_stns,
+        present=present,
+    )
+
+
+def read_obs_window(  # pylint: disable=too-many-positional-arguments,too-many-arguments
+    pollen_type: str,
+    file_obs_stns: str,
+    verbose: bool = True,
+    registry=None,
+    nhours: int = 120,
+    end_time=None,
+):
+    """Read the window of observed concentrations of a pollen type.
+
+    Args:
+        pollen_type: String describing the pollen type analysed.
+        file_obs_stns: Location of the observation ATAB file.
+        verbose: Optional additional debug prints.
+        registry: Optional stations.StationRegistry.
+        nhours: Length of the window in hours.
+        end_time: Last hour of the window (datetime64), defaults to the
+                last observation of pollen_type.
+
+    Returns:
+        data_obs: Array (nhours, nstns) of the observed concentrations,
+                the missing hours filled with the missing value.
+        headerdata: Parsed header of the observation file.
+        end_time: Last hour of the window.
+
+    Raises:
+        CalibrationError: If the file has no observations of pollen_type.
+
+    """
+    _, headerdata = get_atab_header(file_obs_stns, "obs", registry)
+    body = atab.get_body(file_obs_stns, headerdata.n_header, "obs")
+    rows = body.parameters == pollen_type
+    if not np.any(rows):
+        raise CalibrationError(f"No observations of {pollen_type} in {file_obs_stns}.")
+    if end_time is None:
+        end_time = body.times[rows].max()
+    window = atab.build_window(
+        body.times[rows],
+        body.values[rows],
+        end_time,
+        nhours,
+        headerdata.missing_value,
+    )
+    if verbose and not np.all(window.present):
+        print(
+            f"{np.count_nonzero(~window.present)} hours of the {nhours}h window",
+            f"ending {end_time} are missing in {file_obs_stns}.",
+        )
+    return window.values, headerdata, end_time
+
+
+def read_mod_window(  # pylint: disable=too-many-positional-arguments,too-many-arguments
+    pollen_type: str, file_mod_stns: str, end_time, nhours: int = 120, registry=None
+):
+    """Read the window of modelled concentrations of a pollen type.
+
+    Args:
+        pollen_type: String describing the pollen type analysed.
+        file_mod_stns: Location of the model ATAB file.
+        end_time: Last hour of the window (datetime64).
+        nhours: Length of the window in hours.
+        registry: Optional stations.StationRegistry.
+
+    Returns:
+        data_mod: Array (nhours, nmod) of the modelled concentrations, 0
+                for the missing hours.
+        mod_columns: Mapping of the station indicators to the columns.
+        present: Boolean array (nhours,), True for the hours with model
+                data (see get_station_data for the other hours).
+
+    Raises:
+        CalibrationError: If the model data has missing values.
+
+    """
+    key_mod, headerdata_mod = get_atab_header(file_mod_stns, "mod", registry)
+    mod_columns = None if registry is None else registry.get_mod_columns(key_mod)
+    if mod_columns is None:
+        mod_columns = {
+            str(stn): i for i, stn in enumerate(headerdata_mod.stn_indicators)
+        }
+        if registry is not None:
+            registry.put_mod_columns(key_mod, mod_columns)
+    missing_value = headerdata_mod.missing_value
+    body_mod = atab.get_body(file_mod_stns, headerdata_mod.n_header, "mod")
+    rows_mod = body_mod.parameters == pollen_type
+    window_mod = atab.build_window(
+        body_mod.times[rows_mod], body_mod.values[rows_mod], end_time, nhours, 0.0
+    )
+    data_mod = window_mod.values
+    if missing_value in data_mod:
+        raise CalibrationError(
+            "There is at least one missing value "
+            f"in the model data file {file_mod_stns}.\n"
+            "Please check the reason (fieldextra retrieval namelist?). "
+            "No pollen calibration update is performed until this is fixed! "
+            "Pollen in ICON will still work, but calibration fields get "
+            "more and more outdated."
+        )
+    if not np.all(window_mod.present):
+        print(
+            f"{np.count_nonzero(~window_mod.present)} hours of the {nhours}h window",
+            f"ending {end_time} are missing in {file_mod_stns},",
+            "they are excluded from the observed and modelled sums.",
+        )
+    return data_mod, mod_columns, window_mod.present
+
+
+def get_station_data(  # pylint: disable=R0913,R0914,too-many-positional-arguments
+    pollen_type: str,
+    data_obs,
+    headerdata: HeaderData,
+    max_miss_stns: int,
+    data_mod=None,
+    mod_columns=None,
+    verbose: bool = True,
+    qc_settings=None,
+    file_mod_stns: str = "the model data",
+    present=None,
+) -> ObsModData:
+    """Prepare the observed and modelled concentrations at the stations.
+
+    Runs the quality control and the treatment of the missing values on
+    hourly series already in memory, e.g. from an earlier step of a
+    workflow (read_atab does the same on the ATAB files).
+
+    Args:
+        pollen_type: String describing the pollen type analysed.
+        data_obs: Array (nhours, nstns) of the observed concentrations,
+                oldest first, missing values as headerdata.missing_value.
+        headerdata: HeaderData of the observed stations (coord_stns,
+                missing_value and stn_indicators, n_header is not used).
+        max_miss_stns: Max. number of stations with more than 50% missing data
+        data_mod: Optional array (nhours, nmod) of the modelled concentrations
+                (strength only).
+        mod_columns: Mapping of the station indicators to the columns of
+                data_mod, e.g. {"PBS": 0, "PBU": 1}.
+        verbose: Optional additional debug prints.
+        qc_settings: Optional settings of the quality control of the
+                observations (see qc.py), None or empty to disable it.
+        file_mod_stns: Origin of data_mod (for the error messages).
+        present: Optional boolean array (nhours,), False for the hours
+                without model data. These hours are excluded from the
+                treatment of the missing values and set to 0 in both
+                series, i.e. excluded from the sums.
+
+    Returns:
+        ObsModData (see read_atab).
+
+    Raises:
+        CalibrationError: If too many stations miss data or stations
+            miss in data_mod.
+
+    """
+    data_obs = np.array(data_obs, dtype=np.float64)
+    if present is None:
+        present = np.ones(len(data_obs), dtype=bool)
+    present = np.asarray(present, dtype=bool)
+    stn_indicators = headerdata.stn_indicators
+    if qc_settings:
+        qc_mod = None
+        if data_mod is not None:
+            # Stations and hours without model data are not checked
+            # against the model
+            qc_mod = np.full(data_obs.shape, np.nan)
+            for istation, stn in enumerate(stn_indicators):
+                if stn in mod_columns:
+                    qc_mod[present, istation] = data_mod[present, mod_columns[stn]]
+        qc_flags = qc.get_flags(data_obs, headerdata.missing_value, qc_settings, qc_mod)
+        if verbose:
+            for line in qc.summarize(qc_flags, stn_indicators):
+                print(f"Quality control of the {pollen_type} observations:", line)
+        data_obs = qc.clean(data_obs, qc_flags, headerdata.missing_value)
+    else:
+        qc_flags = np.where(data_obs == headerdata.missing_value, qc.MISSING, 0)
+        qc_flags = qc_flags.astype(np.uint8)
+    data_present, headerdata = treat_missing(
+        data_obs[present],
+        headerdata,
+        max_miss_stns,
         headerdata.stn_indicators,
         headerdata.missing_value,
         verbose=verbose,
     )
-    # Calculating the station correspondence indices of obs/mod data.
-    if file_mod_stns != "":
-        istation_mod = get_mod_stn_index(headerdata.stn_indicators, stn_indicators_mod)
+    data_obs = np.zeros((len(present), data_present.shape[1]))
+    data_obs[present] = data_present
+    if data_mod is None:
+        data_mod = 0
+        istation_mod = 0
+    else:
+        data_mod = np.where(present[:, None], data_mod, 0.0)
+        # Calculating the station correspondence indices of obs/mod data.
+        istation_mod = get_mod_stn_index(
+            headerdata.stn_indicators, mod_columns, file_mod_stns
+        )
 
     return ObsModData(
         data_obs,
@@ -281,15 +786,19 @@ def read_atab(
         headerdata.missing_value,
         data_mod,
         istation_mod,
+        # Flags of the stations kept by treat_missing
+        qc_flags[:, np.isin(stn_indicators, headerdata.stn_indicators)],
     )
 
 
-def create_data_arrays(cal_fields, clon, clat, time_values):
+def create_data_arrays(cal_fields, clon, clat, time_values, chunk_size: int = 0):
     # Dictionary to hold DataArrays for each variable
     cal_fields_arrays = {}
 
     # Loop through variables to create DataArrays
     for var_name, data in cal_fields.items():
+        if chunk_size > 0 and da is not None:
+            data = da.from_array(data, chunks=chunk_size)
         data_array = xr.DataArray(
             data, coords={"index": np.arange(len(data))}, dims=["index"]
         )
@@ -302,6 +811,63 @@ def create_data_arrays(cal_fields, clon, clat, time_values):
     return cal_fields_arrays
 
 
+def create_dataset(cal_fields, time_values, config_obj: Config):
+    """Create the xarray Dataset of the calibration fields on the grid.
+
+    Args:
+        cal_fields: Dictionary of the fields read from the GRIB files.
+        time_values: Timestamp of the fields.
+        config_obj: Configured data structure of class Config.
+
+    Returns:
+        xarray.DataSet, its attributes identify the grid (for the caches of
+        cache.grid_cache) and the distance metric.
+
+    """
+    clon, clat = get_grid(config_obj.const_file, config_obj.shared_memory_dir)
+    return make_dataset(
+        cal_fields,
+        clon,
+        clat,
+        time_values,
+        config_obj,
+        grid=os.path.realpath(config_obj.const_file),
+    )
+
+
+def make_dataset(  # pylint: disable=too-many-positional-arguments,too-many-arguments
+    cal_fields, clon, clat, time_values, config_obj: Config, grid: str = ""
+):
+    """Create the xarray Dataset of fields in memory on a grid in memory.
+
+    Args:
+        cal_fields: Dictionary of the fields (1D arrays over the cells).
+        clon: Longitudes of the cells in degrees.
+        clat: Latitudes of the cells in degrees.
+        time_values: Timestamp of the updated fields (datetime64).
+        config_obj: Configured data structure of class Config.
+        grid: Optional key identifying the grid (e.g. the path of its
+            file). With a key, the grid geometry, the station cells and (in
+            batch runs) the weight operators are cached in cache.grid_cache
+            across calls.
+
+    Returns:
+        xarray.DataSet.
+
+    """
+    cal_fields_arrays = create_data_arrays(
+        cal_fields,
+        clon,
+        clat,
+        time_values,
+        config_obj.chunk_size if config_obj.use_dask else 0,
+    )
+    attrs = {"distance_metric": config_obj.distance_metric}
+    if grid:
+        attrs["grid"] = grid
+    return xr.Dataset(cal_fields_arrays, attrs=attrs)
+
+
 def treat_missing(  # pylint: disable=too-many-positional-arguments,too-many-arguments
     array,
     headerdata,
@@ -364,13 +930,12 @@ def treat_missing(  # pylint: disable=too-many-positional-arguments,too-many-arg
                 )
                 stns_missing += 1
                 if stns_missing > max_miss_stns:
-                    print(
-                        f"\nALERT: More than {max_miss_stns} stations have more than\n",
-                        "50% missing data, no pollen calibration is performed!\n",
-                        "Pollen are still running but fix this asap by checking\n",
-                        "the reason for the missing observations.\n",
+                    raise CalibrationError(
+                        f"ALERT: More than {max_miss_stns} stations have more than\n"
+                        "50% missing data, no pollen calibration is performed!\n"
+                        "Pollen are still running but fix this asap by checking\n"
+                        "the reason for the missing observations."
                     )
-                    sys.exit(1)
 
                 # Remove the station from array, coord_stns, and stn_indicators
                 array = np.delete(array, istation, axis=1)
@@ -398,6 +963,34 @@ def treat_missing(  # pylint: disable=too-many-positional-arguments,too-many-arg
     return array, headerdata
 
 
+def get_station_cell(ds, coords: tuple) -> int:
+    """Get the index of the grid cell of a location (cached per grid).
+
+    Args:
+        ds: xarray.DataSet.
+        coords: (lat, lon) tuple of the location.
+
+    Returns:
+        Index of the closest cell for the distance metric of ds.
+
+    """
+    metric = ds.attrs.get("distance_metric", "equirectangular")
+
+    def nearest_cell():
+        return distance.nearest_cell(
+            ds.latitude.values,
+            ds.longitude.values,
+            coords,
+            metric,
+            None if metric == "equirectangular" else get_grid_xyz(ds),
+        )
+
+    grid_key = ds.attrs.get("grid")
+    if grid_key is None:
+        return nearest_cell()
+    return grid_cache.station_cell(grid_key, coords, nearest_cell, metric)
+
+
 def get_field_at(ds, field: str, coords: tuple):
     """Get the field in a xarray.DataSet at a given location.
 
@@ -410,30 +1003,56 @@ def get_field_at(ds, field: str, coords: tuple):
         Field at the desired location.
 
     """
-    dist = (ds.latitude - coords[0]) ** 2 + (ds.longitude - coords[1]) ** 2
-    return ds[field].where(dist == dist.min(), drop=True)
+    index = get_station_cell(ds, coords)
+    return ds[field].isel(index=[index])
 
 
-def interpolate(  # pylint: disable=R0913,R0914
+def get_active_mask(ds, field: str) -> np.ndarray:
+    """Get the cells of the grid on which a field is active.
+
+    Cells where the field is zero (outside the habitat of the species or
+    at the edge of the domain) are zeroed again by to_grib, so there is
+    no need to interpolate on them.
+
+    Args:
+        ds: xarray.DataSet.
+        field: Name of the field.
+
+    Returns:
+        Boolean array over the grid, True where the field is non-zero.
+
+    """
+    return ds[field].values != 0
+
+
+def interpolate(  # pylint: disable=R0913,R0914,too-many-positional-arguments
     change,
     ds,
     field: str,
     coord_stns,
     config_obj,
     method: str = "multiply",
+    mask=None,
+    values=None,
 ):
     """Interpolate the change of a field from its values at the stations.
 
     Args:
-        change: Value of the change at the stations.
+        change: Value of the change at the stations, (nstns,) or
+            (nmembers, nstns) for several members of an ensemble.
         ds: xarray.DataSet.
         field: Name of the field to be interpolated on.
         coord_stns: List of (lat, lon) tuples of the stations' coordinates.
         method: Either 'multiply' (strength) or 'add' (phenology)
-        verbose: Optional additional debug prints.
+        mask: Optional boolean array over the grid (see get_active_mask).
+            The interpolation is only evaluated on the cells where mask
+            is True, the other cells keep the values of the field.
+        values: Optional values of the field, (ncells,) or (nmembers, ncells),
+            instead of the ones in ds. The masks have the same shape.
 
     Returns:
-        vec: Obtained field over the full grid.
+        vec: Obtained field over the full grid (a lazy dask array if
+            config_obj.use_dask is set together with config_obj.chunk_size).
     This is a reproduction of the IDW implemented in COSMO.
     with different threshold (minima and maxima) for different species.
 
@@ -443,8 +1062,6 @@ def interpolate(  # pylint: disable=R0913,R0914
     # and gaussian radial basis function (rbf_g)
     ipstyle = config_obj.ipstyle
     eps_val=config_obj.eps_val
-    vec = None
-    nstns = len(coord_stns)
     pollen_type = field[:4]
 
     if method == "multiply":
@@ -469,58 +1086,581 @@ def interpolate(  # pylint: disable=R0913,R0914
             "POAC": -bigvalue,
             "CORY": -bigvalue,
         }
-    diff_lon = np.zeros((nstns,) + ds.longitude.shape)
-    diff_lat = np.zeros((nstns,) + ds.longitude.shape)
-    dist = np.zeros((nstns,) + ds.longitude.shape)
-    change_vec = np.zeros_like(dist)
-    eps = 1e-14  # prevents division by zero
-    for istation in range(nstns):
-        diff_lon[istation, :] = (
-            (ds.longitude - coord_stns[istation][1] + eps)
-            * np.pi
-            / 180
-            * np.cos(ds.latitude * np.pi / 180)
+    if ipstyle not in ipstyles:
+        raise CalibrationError(f"ipstyle in config must be one of {ipstyles}.")
+    metric = config_obj.distance_metric
+    if metric not in distance.metrics:
+        raise CalibrationError(
+            f"distance_metric in config must be one of {distance.metrics}."
         )
-        diff_lat[istation, :] = (ds.latitude - coord_stns[istation][0]) * np.pi / 180
-        dist[istation, :] = np.sqrt(
-            diff_lon[istation, :] ** 2 + diff_lat[istation, :] ** 2
+
+    kwargs = {
+        "change": change,
+        "coord_stns": coord_stns,
+        "ipstyle": ipstyle,
+        "eps_val": eps_val,
+        "metric": metric,
+        "regularization": config_obj.rbf_regularization,
+        "method": method,
+        "min_value": min_param[pollen_type],
+        "max_value": max_param[pollen_type],
+    }
+    if values is None:
+        values = ds[field].data
+    latitude = ds.latitude.data
+    longitude = ds.longitude.data
+    if mask is None:
+        mask = np.ones(values.shape, dtype=bool)
+    chunk_size = config_obj.chunk_size
+
+    backend = config_obj.interpolation_backend
+    if backend not in interpolation_backends:
+        raise CalibrationError(
+            f"interpolation_backend in config must be one of {interpolation_backends}."
         )
-        change_vec[istation, :] = change[istation]
-    if ipstyle=="idw":
-        weight=np.sum(change_vec / dist, axis=0) / np.sum(1 / dist, axis=0)
-    elif ipstyle=="rbf_g":
-        epsilon = eps_val*np.pi / 180  # You can tune this depending on the grid scale
-        rbf_weights = np.exp(- (dist / epsilon) ** 2)
-        weight = np.sum(change_vec * rbf_weights, axis=0) / np.sum(rbf_weights, axis=0)
-    elif ipstyle=="rbf_mq":
-        epsilon = eps_val*np.pi / 180  # You can tune this depending on the grid scale
-        rbf_weights = 1.0 / np.sqrt(1 + (dist / epsilon) ** 2)
-        weight = np.sum(change_vec * rbf_weights, axis=0) / np.sum(rbf_weights, axis=0)
-    else:
-        print("ipstyle in config must be one of idw, rbf_g or rbf_mq), exiting.")
-        sys.exit(1)
+    if backend == "numba" and ipstyle in fused.fused_ipstyles:
+        if fused.numba is not None:
+            # One pass over the whole grid, without chunks or temporaries
+            kwargs.pop("regularization")
+            return fused.interpolate_cells(
+                np.asarray(values),
+                np.asarray(latitude),
+                np.asarray(longitude),
+                np.asarray(mask),
+                **kwargs,
+            )
+        print("numba is not installed, the interpolation uses NumPy.")
+
+    if config_obj.coarse_mesh_step > 0:
+        vec = interpolate_coarse(
+            np.asarray(values),
+            np.asarray(latitude),
+            np.asarray(longitude),
+            np.asarray(mask),
+            ds,
+            config_obj,
+            **kwargs,
+        )
+        if vec is not None:
+            return vec
+
+    if chunk_size > 0 and config_obj.use_dask and da is not None and np.ndim(values) == 1:
+        # Lazy evaluation, the chunks are only computed when written by to_grib.
+        return da.map_blocks(
+            interpolate_chunk,
+            da.asarray(values).rechunk(chunk_size),
+            da.asarray(latitude).rechunk(chunk_size),
+            da.asarray(longitude).rechunk(chunk_size),
+            da.asarray(mask).rechunk(chunk_size),
+            dtype=np.float64,
+            **kwargs,
+        )
+    if config_obj.use_dask and da is None:
+        print("dask is not installed, the chunks are processed with NumPy.")
+
+    values = np.asarray(values)
+    latitude = np.asarray(latitude)
+    longitude = np.asarray(longitude)
+    mask = np.asarray(mask)
+    print(f"Interpolating {field} on {np.count_nonzero(mask)} of {values.size} cells.")
+    if config_obj.domain_workers != 1:
+        # The ranges of cells are interpolated by the workers, each in
+        # chunks of chunk_size cells.
+        return domain.map_ranges(
+            interpolate_chunks,
+            (values, latitude, longitude, mask),
+            config_obj,
+            chunk_size=chunk_size,
+            **kwargs,
+        )
+    if chunk_size <= 0:
+        cells = np.flatnonzero(np.any(np.atleast_2d(mask), axis=0))
+        return interpolate_chunk(
+            values,
+            latitude,
+            longitude,
+            mask,
+            operator=get_grid_weight_operator(ds, coord_stns, config_obj, cells),
+            **kwargs,
+        )
+    return interpolate_chunks(
+        values, latitude, longitude, mask, chunk_size=chunk_size, **kwargs
+    )
+
+
+def interpolate_chunks(  # pylint: disable=too-many-positional-arguments
+    values, latitude, longitude, mask, *, chunk_size: int, **kwargs
+):
+    """Apply the interpolated change to cells in chunks of chunk_size.
+
+    The (nstns, ncells) intermediates only exist for one chunk at a time.
+
+    Args:
+        values, latitude, longitude, mask: See interpolate_chunk.
+        chunk_size: Number of cells per chunk, 0 for all cells at once.
+        kwargs: Keyword arguments of interpolate_chunk.
+
+    Returns:
+        Updated values of the field.
+
+    """
+    if chunk_size <= 0:
+        chunk_size = max(values.shape[-1], 1)
+    vec = np.empty(values.shape, dtype=np.float64)
+    for start in range(0, values.shape[-1], chunk_size):
+        chunk = slice(start, start + chunk_size)
+        vec[..., chunk] = interpolate_chunk(
+            values[..., chunk],
+            latitude[chunk],
+            longitude[chunk],
+            mask[..., chunk],
+            **kwargs,
+        )
+    return vec
+
+
+def get_grid_weight_operator(ds, coord_stns, config_obj, cells):
+    """Get the weight operator of the stations at the active cells of the grid.
+
+    The weight operator only depends on the grid, the stations and the
+    active cells. It is only evaluated at the active cells and kept in
+    cache.grid_cache if operators are kept there (batch runs, where
+    jobs on the same grid share it).
+
+    Args:
+        ds: xarray.DataSet.
+        coord_stns: List of (lat, lon) tuples of the stations' coordinates.
+        config_obj: Configured data structure of class Config.
+        cells: Indices of the active cells.
+
+    Returns:
+        Array (nstns, ncells_active) (see get_weight_operator), None if ds
+        has no grid key.
+
+    """
+    grid_key = ds.attrs.get("grid")
+    if grid_key is None:
+        return None
+    metric = config_obj.distance_metric
+    cells = np.asarray(cells, dtype=np.int64)
+
+    def compute():
+        return get_weight_operator(
+            np.asarray(ds.latitude.data)[cells],
+            np.asarray(ds.longitude.data)[cells],
+            coord_stns,
+            config_obj.ipstyle,
+            config_obj.eps_val,
+            metric,
+            None if metric == "equirectangular" else get_grid_xyz(ds)[cells],
+        )
+
+    return grid_cache.weight_operator(
+        grid_key,
+        (
+            tuple(map(tuple, coord_stns)),
+            config_obj.ipstyle,
+            config_obj.eps_val,
+            metric,
+            hashlib.sha1(cells.tobytes()).hexdigest(),
+        ),
+        compute,
+    )
+
+
+def interpolate_chunk(  # pylint: disable=R0913,too-many-positional-arguments
+    values,
+    latitude,
+    longitude,
+    mask,
+    *,
+    change,
+    coord_stns,
+    ipstyle: str,
+    eps_val: float,
+    metric: str,
+    regularization: float,
+    method: str,
+    min_value: float,
+    max_value: float,
+    operator=None,
+):
+    """Apply the interpolated change to a chunk of cells of a field.
+
+    Args:
+        values: Values of the field on the chunk, (ncells,) or
+            (nmembers, ncells).
+        latitude: Latitudes of the cells of the chunk.
+        longitude: Longitudes of the cells of the chunk.
+        mask: Active cells of the chunk, the others keep their values
+            (same shape as values).
+        change: Value of the change at the stations, (nstns,) or
+            (nmembers, nstns).
+        coord_stns: List of (lat, lon) tuples of the stations' coordinates.
+        ipstyle: One of ipstyles.
+        eps_val: Free parameter of the rbf kernels in degrees.
+        metric: Distance metric, one of distance.metrics.
+        regularization: Regularization of the rbf_exact station system.
+        method: Either 'multiply' (strength) or 'sum' (phenology).
+        min_value: Lower limit of the updated field.
+        max_value: Upper limit of the updated field.
+        operator: Optional precomputed weight operator of the active cells
+            of the chunk (see get_weight_operator), used instead of the
+            kernels.
+
+    Returns:
+        Updated values of the field on the chunk.
 
+    """
+    # Compressed list of the active cells (of any member), the kernels
+    # are only evaluated there and the result is scattered back.
+    shape = np.shape(values)
+    values = np.atleast_2d(values)
+    mask = np.atleast_2d(mask)
+    cells = np.flatnonzero(np.any(mask, axis=0))
+    # rbf_exact interpolates the deviation from no change, far from the
+    # stations the field is left unchanged.
+    baseline = 1.0 if method == "multiply" else 0.0
+    if operator is None:
+        operator = get_weight_operator(
+            latitude[cells], longitude[cells], coord_stns, ipstyle, eps_val, metric
+        )
+    weight = apply_weight_operator(
+        change, operator, coord_stns, ipstyle, eps_val, metric, regularization, baseline
+    )
+
+    return apply_change(
+        values, mask, cells, weight, method, min_value, max_value
+    ).reshape(shape)
+
+
+def apply_change(  # pylint: disable=R0913,too-many-positional-arguments
+    values, mask, cells, weight, method: str, min_value: float, max_value: float
+):
+    """Apply the interpolated change to the active cells of a field.
+
+    Args:
+        values: Values of the field, (nmembers, ncells).
+        mask: Active cells, the others keep their values (shape of values).
+        cells: Indices of the cells active in any member.
+        weight: Interpolated change at cells, (ncells_active,) or
+            (nmembers, ncells_active).
+        method: Either 'multiply' (strength) or 'sum' (phenology).
+        min_value: Lower limit of the updated field.
+        max_value: Upper limit of the updated field.
+
+    Returns:
+        Updated values of the field, (nmembers, ncells).
+
+    """
+    vec = np.array(values, dtype=np.float64)
     if method == "multiply":
-        vec = np.maximum(
+        updated = np.maximum(
             np.minimum(
-                ds[field].values
+                values[:, cells]
                 * weight,
-                max_param[pollen_type],
+                max_value,
             ),
-            min_param[pollen_type],
+            min_value,
         )
     elif method == "sum":
-        vec = np.maximum(
+        updated = np.maximum(
             np.minimum(
-                ds[field].values
+                values[:, cells]
                 + weight,
-                max_param[pollen_type],
+                max_value,
             ),
-            min_param[pollen_type],
+            min_value,
         )
+    vec[:, cells] = np.where(mask[:, cells], updated, values[:, cells])
     return vec
 
-def get_change_tune(  # pylint: disable=R0913
+
+def interpolate_coarse(  # pylint: disable=R0913,R0914,too-many-positional-arguments
+    values,
+    latitude,
+    longitude,
+    mask,
+    ds,
+    config_obj,
+    *,
+    change,
+    coord_stns,
+    ipstyle: str,
+    eps_val: float,
+    metric: str,
+    regularization: float,
+    method: str,
+    min_value: float,
+    max_value: float,
+):
+    """Apply the change interpolated on a coarse mesh and remapped to the cells.
+
+    The kernels are only evaluated at the nodes of the mesh (see coarse.py)
+    and at a sample of the cells, including the cells of the stations, where
+    the remapped change is compared with the direct interpolation.
+
+    Args:
+        values: Values of the field, (ncells,) or (nmembers, ncells).
+        latitude: Latitudes of the cells.
+        longitude: Longitudes of the cells.
+        mask: Active cells, the others keep their values (shape of values).
+        ds: xarray.DataSet (for the cache of the remap and the station cells).
+        config_obj: Configured data structure of class Config.
+        Others: See interpolate_chunk.
+
+    Returns:
+        Updated values of the field, None if the deviation from the direct
+        interpolation exceeds config_obj.coarse_mesh_tolerance.
+
+    """
+    step = config_obj.coarse_mesh_step
+    grid_key = ds.attrs.get("grid")
+
+    def compute_remap():
+        return coarse.get_remap(latitude, longitude, step)
+
+    if grid_key is None:
+        remap_obj = compute_remap()
+    else:
+        remap_obj = grid_cache.remap(grid_key, step, compute_remap)
+    node_lat, node_lon = coarse.get_nodes(remap_obj.mesh)
+    baseline = 1.0 if method == "multiply" else 0.0
+    args = (coord_stns, ipstyle, eps_val, metric, regularization, baseline)
+    node_change = apply_weight_operator(
+        change,
+        get_weight_operator(node_lat, node_lon, coord_stns, ipstyle, eps_val, metric),
+        *args,
+    )
+
+    shape = np.shape(values)
+    values = np.atleast_2d(values)
+    mask = np.atleast_2d(mask)
+    cells = np.flatnonzero(np.any(mask, axis=0))
+    sample = np.union1d(
+        cells[:: max(1, cells.size // coarse.nsamples)],
+        [get_station_cell(ds, coords) for coords in coord_stns],
+    ).astype(np.int64)
+    direct = apply_weight_operator(
+        change,
+        get_weight_operator(
+            latitude[sample], longitude[sample], coord_stns, ipstyle, eps_val, metric
+        ),
+        *args,
+    )
+    deviation = np.max(np.abs(coarse.remap(node_change, remap_obj, sample) - direct))
+    scale = max(np.max(np.abs(np.asarray(change) - baseline)), np.finfo(float).tiny)
+    print(
+        f"Coarse mesh of {step} deg ({node_lat.size} nodes): max deviation",
+        f"{deviation / scale:.2e} (relative) from the direct interpolation",
+        f"at {sample.size} cells.",
+    )
+    if deviation > config_obj.coarse_mesh_tolerance * scale:
+        print("The deviation exceeds coarse_mesh_tolerance, interpolating at every cell.")
+        return None
+    weight = coarse.remap(node_change, remap_obj, cells)
+    return apply_change(
+        values, mask, cells, weight, method, min_value, max_value
+    ).reshape(shape)
+
+
+def apply_weight_operator(  # pylint: disable=R0913,too-many-positional-arguments
+    change,
+    operator,
+    coord_stns,
+    ipstyle: str,
+    eps_val: float,
+    metric: str = "equirectangular",
+    regularization: float = 0.0,
+    baseline: float = 0.0,
+):
+    """Interpolate the station values of the change with a weight operator.
+
+    Args:
+        change: Value of the change at the stations.
+        operator: Weight operator of the cells (see get_weight_operator).
+        coord_stns: List of (lat, lon) tuples of the stations' coordinates.
+        ipstyle: One of ipstyles.
+        eps_val: Free parameter of the rbf kernels in degrees.
+        metric: Distance metric, one of distance.metrics.
+        regularization: Regularization of the rbf_exact station system.
+        baseline: Value of the interpolated change far from the stations
+            (rbf_exact only, the other styles are normalized averages).
+
+    Returns:
+        Interpolated change at the cells.
+
+    """
+    change = np.asarray(change, dtype=np.float64)
+    if ipstyle != "rbf_exact":
+        return change @ operator
+    system = rbf.get_station_system(coord_stns, eps_val, metric, regularization)
+    return baseline + rbf.get_coefficients(change - baseline, system) @ operator
+
+
+def get_weight_operator(  # pylint: disable=R0913,too-many-positional-arguments
+    latitude,
+    longitude,
+    coord_stns,
+    ipstyle: str,
+    eps_val: float,
+    metric: str = "equirectangular",
+    xyz=None,
+):
+    """Get the normalized kernel weights of the stations at a set of cells.
+
+    Args:
+        latitude: Latitudes of the cells.
+        longitude: Longitudes of the cells.
+        coord_stns: List of (lat, lon) tuples of the stations' coordinates.
+        ipstyle: One of ipstyles.
+        eps_val: Free parameter of the rbf kernels in degrees.
+        metric: Distance metric, one of distance.metrics.
+        xyz: Optional precomputed unit vectors of the cells.
+
+    Returns:
+        Array of shape (nstns, ncells), the interpolated change at the
+        cells is change @ operator (see apply_weight_operator).
+
+    """
+    dist = distance.station_distances(latitude, longitude, coord_stns, metric, xyz)
+    return get_kernel_weights(dist, ipstyle, eps_val)
+
+
+def get_kernel_weights(dist, ipstyle: str, eps_val: float):
+    """Get the normalized kernel weights from the distances to the stations.
+
+    Args:
+        dist: Array of shape (nstns, ncells) with the distances in radians.
+        ipstyle: One of ipstyles.
+        eps_val: Free parameter of the rbf kernels in degrees.
+
+    Returns:
+        Array of shape (nstns, ncells) of weights summing up to 1 over the
+        stations, except for rbf_exact (kernel values).
+
+    """
+    rbf_weights = get_kernel(dist, ipstyle, eps_val)
+    if ipstyle=="rbf_exact":
+        return rbf_weights
+    return rbf_weights / np.sum(rbf_weights, axis=0)
+
+
+def get_kernel(dist, ipstyle: str, eps_val: float):
+    """Get the (not normalized) kernel of an interpolation style.
+
+    Args:
+        dist: Array of distances in radians.
+        ipstyle: One of ipstyles.
+        eps_val: Free parameter of the rbf kernels in degrees.
+
+    Returns:
+        Array of the same shape as dist.
+
+    """
+    if ipstyle=="rbf_exact":
+        return rbf.kernel(dist, eps_val)
+    if ipstyle=="idw":
+        return 1 / dist
+    epsilon = eps_val*np.pi / 180  # You can tune this depending on the grid scale
+    if ipstyle=="rbf_g":
+        return np.exp(- (dist / epsilon) ** 2)
+    # rbf_mq
+    return 1.0 / np.sqrt(1 + (dist / epsilon) ** 2)
+
+
+def get_weights(
+    weighting_type: str, nhours: int = 120, kernels: dict | None = None
+) -> np.ndarray:
+    """Get the weighting vector of the pollen history for the tuning factor.
+
+    The purpose is to gradually scale down the importance of the
+    observed/modelled ratio for the tuning factor.
+
+    Args:
+        weighting_type: One of weighting_types or of the kernels defined in
+            the config (see Config.weighting_type and weighting.py).
+        nhours: Length of the history in hours.
+        kernels: Kernels defined in the config (Config.weighting_kernels).
+
+    Returns:
+        Weights of the hours of the history (read-only).
+
+    """
+    return get_weight_bank((weighting_type,), nhours, kernels)[0]
+
+
+def get_weight_bank(
+    weighting_types_used, nhours: int = 120, kernels: dict | None = None
+) -> np.ndarray:
+    """Get the weighting vectors of several weighting types.
+
+    Args:
+        weighting_types_used: Names of the weighting types.
+        nhours: Length of the history in hours.
+        kernels: Kernels defined in the config (Config.weighting_kernels).
+
+    Returns:
+        Read-only array (nkernels, nhours) of the weights.
+
+    """
+    bank = weighting.get_kernel_bank(tuple(weighting_types_used), nhours, kernels)
+    if bank is None:
+        raise CalibrationError(
+            "weighting_type in config must be one of "
+            f"{weighting.get_kernel_names(kernels)}."
+        )
+    return bank
+
+
+def get_weighted_sums(data, weights):
+    """Get the weighted sums of the hourly concentrations of all stations.
+
+    Args:
+        data: Array (nhours, nstns) of hourly concentrations, or
+            (nmembers, nhours, nstns) for several members of an ensemble.
+        weights: Array (nhours_weights,) or (nkernels, nhours_weights) of
+            weights. They are trimmed to the length of data, to avoid a
+            crash if the data is shorter than the weights.
+
+    Returns:
+        Array (nstns,) or (nkernels, nstns) of the weighted sums, with the
+        leading dimension nmembers for several members.
+
+    """
+    weights = np.asarray(weights)
+    return weights[..., : data.shape[-2]] @ data
+
+
+def get_change_tune_stns(  # pylint: disable=R0913,too-many-positional-arguments
+    pollen_type: str,
+    sum_obs,
+    sum_mod,
+    sum_obs_dyn,
+    sum_mod_dyn,
+    tune_stns,
+    saisn_stns,
+):
+    """Get the change of the tune field at the stations from the sums.
+
+    All arguments are arrays over the stations. The weighted sums may have
+    additional leading dimensions (e.g. several weighting types).
+
+    Returns:
+        Amount by which tune should be changed at each station.
+
+    """
+    tune_pol_default = 1.0
+    season = saisn_stns > 0
+    low = (sum_obs <= thr_con_120[pollen_type]) | (sum_mod <= thr_con_120[pollen_type])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_low = (tune_pol_default / tune_stns) ** (1 / 24)
+        change_high = (sum_obs_dyn / sum_mod_dyn) ** (1 / 24)
+    change_tune = np.where(season & ~low, change_high, 1.0)
+    return np.where(season & low, change_low, change_tune)
+
+
+def get_change_tune(  # pylint: disable=R0913,R0914
     pollen_type: str,
     obs_mod_data: ObsModData,
     ds,
@@ -543,63 +1683,47 @@ def get_change_tune(  # pylint: disable=R0913
     tune(station, T+dT) = tune(station, T) * change_tune(station).
 
     """
-    tune_pol_default = 1.0
     nstns = obs_mod_data.data_obs.shape[1]
-    change_tune = np.ones(nstns)
     weighting_type = config_obj.weighting_type
     print(weighting_type)
-    # In this part we define a weighting vector for the tuning factor calculation.
-    # The purpose is to gradually scale down the importance of the observed/modelled ratio for the tuning factor.
-    # declare the type once
-
-    weights: npt.NDArray[np.floating]
-
-    if weighting_type == "constant":
-        weights = np.ones(120)
-
-    elif weighting_type == "linear":
-        weights = np.linspace(1.0, 0.0, 120)
-
-    elif weighting_type == "stepwise":
-        weights = np.zeros(120)
-        weights[:36] = 1
-    elif weighting_type == "switch":
-        sharpness = 25
-        shift = 0.6
-        weights=np.linspace(1,0,120)
-        weights = 1 / (1 + np.exp(-sharpness * (weights - shift)))
+    # constant weights for the plain sums, then the weighting type
+    weights = get_weight_bank(
+        ("constant", weighting_type),
+        config_obj.window_hours,
+        config_obj.weighting_kernels,
+    )
 
+    data_mod = obs_mod_data.data_mod[:, obs_mod_data.istation_mod]
+    # sums of hourly observed/modelled concentrations of the last 5 days,
+    # plain and weighted, of obs and model at once
+    sums = get_weighted_sums(np.hstack([obs_mod_data.data_obs, data_mod]), weights)
+    sum_obs, sum_mod = sums[0, :nstns], sums[0, nstns:]
+    sum_obs_dyn, sum_mod_dyn = sums[1, :nstns], sums[1, nstns:]
+
+    # tuning factor at the stations
+    tune_stns = np.array(
+        [
+            get_field_at(ds, pollen_type + "tune", coords).values[0]
+            for coords in obs_mod_data.coord_stns
+        ]
+    )
+    # saison days at the stations
+    # if > 0 then the pollen season has started
+    saisn_stns = np.array(
+        [
+            get_field_at(ds, pollen_type + "saisn", coords).values[0]
+            for coords in obs_mod_data.coord_stns
+        ]
+    )
+    change_tune = get_change_tune_stns(
+        pollen_type, sum_obs, sum_mod, sum_obs_dyn, sum_mod_dyn, tune_stns, saisn_stns
+    )
 
-    #Trim weights to match the actual data lengths to avoid crash
-    #if any of the station data is shorter than 120 hours for some reasn
-    weights_obs = weights[: obs_mod_data.data_obs.shape[0]]
-    weights_mod = weights[: obs_mod_data.data_mod.shape[0]]
     for istation in range(nstns):
-        # sum of hourly observed concentrations of the last 5 days
-        sum_obs = np.sum(obs_mod_data.data_obs[:, istation])
-        # sum of hourly observed concentrations weighted
-        sum_obs_dyn = np.sum(obs_mod_data.data_obs[:, istation]*weights_obs)
-        print(f"observed non-weighted:{sum_obs}",
-              f"observed weighted : {sum_obs_dyn}")
-        # sum of hourly modelled concentrations of the last 5 days
-        sum_mod = np.sum(obs_mod_data.data_mod[:, obs_mod_data.istation_mod[istation]])
-        sum_mod_dyn =np.sum(obs_mod_data.data_mod[:, obs_mod_data.istation_mod[istation]]*weights_mod)
-        print(f"modelled non-weighted:{sum_mod}",
-              f"observed weighted: {sum_mod_dyn}")
-
-
-
-        # tuning factor at the current station
-        tune_stns = get_field_at(
-            ds,
-            pollen_type + "tune",
-            obs_mod_data.coord_stns[istation],
-        )
-        # saison days at the current station
-        # if > 0 then the pollen season has started
-        saisn_stns = get_field_at(
-            ds, pollen_type + "saisn", obs_mod_data.coord_stns[istation]
-        )
+        print(f"observed non-weighted:{sum_obs[istation]}",
+              f"observed weighted : {sum_obs_dyn[istation]}")
+        print(f"modelled non-weighted:{sum_mod[istation]}",
+              f"observed weighted: {sum_mod_dyn[istation]}")
         if verbose:
             print(
                 f"Current pollen type is: {pollen_type}, ",
@@ -608,32 +1732,22 @@ def get_change_tune(  # pylint: disable=R0913
                 f"lon: {obs_mod_data.coord_stns[istation][1]}), ",
             )
             print(
-                f"Current tune value {tune_stns.values[0]} ",
-                f"and saisn: {saisn_stns.values[0]}",
+                f"Current tune value {tune_stns[istation]} ",
+                f"and saisn: {saisn_stns[istation]}",
             )
-        if saisn_stns > 0 and (
-            sum_obs <= thr_con_120[pollen_type] or sum_mod <= thr_con_120[pollen_type]
-        ):
-
-            if verbose:
+            if saisn_stns[istation] > 0 and (
+                sum_obs[istation] <= thr_con_120[pollen_type]
+                or sum_mod[istation] <= thr_con_120[pollen_type]
+            ):
                 print(
                     "Season started but low observation or modeled concentrations, "
                     "(tune)**(-1/24) = "
-                    f"{(tune_pol_default / tune_stns.values[0]) ** (1 / 24)}"
+                    f"{change_tune[istation]}"
                 )
-            change_tune[istation] = (tune_pol_default / tune_stns) ** (1 / 24)
-        if (
-            saisn_stns > 0
-            and sum_obs > thr_con_120[pollen_type]
-            and sum_mod > thr_con_120[pollen_type]
-        ):
-            if verbose:
+            elif saisn_stns[istation] > 0:
                 print(
                     "Season started and high observation ", "and modeled concentrations"
                 )
-            change_tune[istation] = (sum_obs_dyn / sum_mod_dyn ) ** (1 / 24)
-            # change_tune[istation] = (sum_obs / sum_mod) ** (1 / 24)
-        if verbose:
             print(f"Change tune is now: {change_tune[istation]}")
             print("-----------------------------------------")
     return change_tune
@@ -684,7 +1798,7 @@ def get_change_phenol(  # pylint: disable=R0912,R0914,R0915
             ds, pollen_type + "ctsum", obs_mod_data.coord_stns[istation]
         )
         t_2m_stns = get_field_at(ds, "T_2M", obs_mod_data.coord_stns[istation]) - 273.15
-        sum_obs_24 = np.sum(obs_mod_data.data_obs[96:, istation])
+        sum_obs_24 = np.sum(obs_mod_data.data_obs[-24:, istation])
         sum_obs = np.sum(obs_mod_data.data_obs[:, istation])
         if verbose:
             print(
@@ -816,8 +1930,8 @@ def check_mandatory_fields(cal_fields, pol_fields, pov_infile):
         pol_fields: Names of the pollen fields.
         pov_infile: GRIB2 file containing pollen fields.
 
-    Exits:
-        If any mandatory fields are missing.
+    Raises:
+        CalibrationError: If any mandatory fields are missing.
 
     """
     species_read = {key[:4] for key in cal_fields.keys()}
@@ -826,21 +1940,40 @@ def check_mandatory_fields(cal_fields, pol_fields, pov_infile):
     print(f"Mandatory fields required for species: {req_fields}")
     missing_fields = [fld for fld in req_fields if fld not in cal_fields.keys()]
     if missing_fields:
-        print(
-            f"The mandatory field(s): {missing_fields}\n",
+        raise CalibrationError(
+            f"The mandatory field(s): {missing_fields}\n"
             f"is/are missing in {pov_infile}\n"
             "No pollen calibration is done until this is fixed!\n"
             "Pollen are still calculated but this should be fixed "
-            "within a few days.",
+            "within a few days."
         )
-        sys.exit(1)
     else:
         print("All mandatory fields have been read from pov_infile.")
 
 
-def to_grib(inp: str, outp: str, dict_fields: dict, hour_incr: int) -> None:
+def check_dataset_fields(ds, field_names: list) -> None:
+    """Check the presence of fields in a dataset, raise if any is missing."""
+    missing_fields = [name for name in field_names if name not in ds]
+    if missing_fields:
+        raise CalibrationError(
+            f"The mandatory field(s) {missing_fields} is/are missing in the dataset."
+        )
+
+
+def to_grib(  # pylint: disable=too-many-positional-arguments,too-many-arguments
+    inp: str,
+    outp: str,
+    dict_fields: dict,
+    hour_incr: int,
+    workers: int = 1,
+    packing: dict | None = None,
+) -> None:
     """Output fields to a GRIB file.
 
+    The messages are written to a temporary file in the directory of outp,
+    which is renamed to outp once complete. Readers of outp never see a
+    partially written file.
+
     Args:
         inp: Location of the GRIB file which must contain at least the same
             fields as the ones in the dictionary that are to be outputted.
@@ -848,51 +1981,136 @@ def to_grib(inp: str, outp: str, dict_fields: dict, hour_incr: int) -> None:
         dict_fields: Dictionary containing the fields to be outputted as
             { name : value }
         hour_incr: number of hour increments in the output compared to input.
+        workers: Number of threads encoding the messages. The messages are
+            still written in the order of inp.
+        packing: Optional packing of the fields of dict_fields
+            (see Config.output_packing).
 
     """
-    # copy all the fields from input into output,
-    # besides the ones in the dictionary given as input
-    with open(inp, "rb") as fin, open(outp, "wb") as fout:
-        while True:
-            gid = eccodes.codes_grib_new_from_file(fin)
-            if gid is None:
-                break
-            # clone record
-            clone_id = eccodes.codes_clone(gid)
+    packing = packing or {}
+    check_packing(packing)
+    tmp_outp = f"{outp}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        # copy all the fields from input into output,
+        # besides the ones in the dictionary given as input
+        with gribio.GribFile(inp) as grib, open(
+            tmp_outp, "wb", buffering=1 << 22
+        ) as fout:
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    # Bounded queue of the encoded messages, written in order
+                    pending: deque = deque()
+                    for message in grib.messages:
+                        pending.append(
+                            executor.submit(
+                                encode_message,
+                                grib.handle(message),
+                                dict_fields,
+                                hour_incr,
+                                packing,
+                            )
+                        )
+                        if len(pending) > 2 * workers:
+                            fout.write(pending.popleft().result())
+                    while pending:
+                        fout.write(pending.popleft().result())
+            else:
+                for message in grib.messages:
+                    fout.write(
+                        encode_message(
+                            grib.handle(message), dict_fields, hour_incr, packing
+                        )
+                    )
+        os.replace(tmp_outp, outp)
+    finally:
+        if os.path.exists(tmp_outp):
+            os.remove(tmp_outp)
 
-            # get short_name
-            short_name = eccodes.codes_get_string(clone_id, "shortName")
 
-            # get time information, advance by hour_incr hours and
-            # set the new time information
-            data_date_hour = str(eccodes.codes_get(clone_id, "dataDate")) + str(
-                str(eccodes.codes_get(clone_id, "hour")).zfill(2)
-            )
-            date_new = datetime.strptime(data_date_hour, "%Y%m%d%H") + timedelta(
-                hours=hour_incr
-            )
+def encode_message(
+    gid, dict_fields: dict, hour_incr: int, packing: dict | None = None
+) -> bytes:
+    """Encode a GRIB message of the output file.
 
-            eccodes.codes_set(
-                clone_id, "dataDate", int(date_new.date().strftime("%Y%m%d"))
-            )
-            eccodes.codes_set(clone_id, "hour", int(date_new.time().strftime("%H")))
+    Only the values of the fields in dict_fields are decoded and encoded,
+    the other messages are copied with the new time information.
+
+    Args:
+        gid: Handle of the input message, modified and released here.
+        dict_fields: Dictionary containing the fields to be outputted as
+            { name : value }
+        hour_incr: number of hour increments in the output compared to input.
+        packing: Optional packing of the fields of dict_fields
+            (see Config.output_packing).
 
-            # read values
-            values = eccodes.codes_get_values(clone_id)
+    Returns:
+        The encoded message.
 
-            if short_name in dict_fields:
+    """
+    # get short_name
+    short_name = eccodes.codes_get_string(gid, "shortName")
 
-                # set values in dict_fields[short_name] to zero where
-                # values are zero (edge values)
-                # This is because COSMO-1E was slightly smaller than ICON-CH1
-                dict_fields[short_name][values == 0] = 0
-                eccodes.codes_set_values(clone_id, dict_fields[short_name].flatten())
-            else:
-                eccodes.codes_set_values(clone_id, values)
+    # get time information, advance by hour_incr hours and
+    # set the new time information
+    data_date_hour = str(eccodes.codes_get(gid, "dataDate")) + str(
+        str(eccodes.codes_get(gid, "hour")).zfill(2)
+    )
+    date_new = datetime.strptime(data_date_hour, "%Y%m%d%H") + timedelta(
+        hours=hour_incr
+    )
+
+    eccodes.codes_set(gid, "dataDate", int(date_new.date().strftime("%Y%m%d")))
+    eccodes.codes_set(gid, "hour", int(date_new.time().strftime("%H")))
+
+    if short_name in dict_fields:
+        # read values
+        values = gribio.decode_values(gid)
+
+        # set values in dict_fields[short_name] to zero where
+        # values are zero (edge values)
+        # This is because COSMO-1E was slightly smaller than ICON-CH1
+        field_values = materialize_field(dict_fields[short_name], values)
+        field_values[values == 0] = 0
+        packing = packing or {}
+        for key in ("packingType", "bitsPerValue"):
+            if key in packing:
+                eccodes.codes_set(gid, key, packing[key])
+        eccodes.codes_set_values(gid, field_values.flatten())
+        if "decimalPrecision" in packing:
+            eccodes.codes_set(gid, "changeDecimalPrecision", packing["decimalPrecision"])
+
+    message = eccodes.codes_get_message(gid)
+    eccodes.codes_release(gid)
+    return message
+
+
+def check_packing(packing: dict) -> None:
+    """Check the output packing options, raise if unknown keys are given."""
+    unknown = sorted(set(packing) - set(packing_keys))
+    if unknown:
+        raise CalibrationError(
+            f"Unknown output_packing options {unknown}. "
+            f"Valid options are {list(packing_keys)}."
+        )
 
-            eccodes.codes_write(clone_id, fout)
-            eccodes.codes_release(clone_id)
-            eccodes.codes_release(gid)
+
+def materialize_field(field_values, template):
+    """Get an updated field as NumPy array for the GRIB encoding.
+
+    Args:
+        field_values: Updated field, either a NumPy or a dask array.
+        template: Decoded values of the GRIB message (used for the shape).
+
+    Returns:
+        NumPy array of the field. Dask arrays are computed chunk by chunk
+        directly into the returned array.
+
+    """
+    if isinstance(field_values, np.ndarray):
+        return field_values
+    out = np.empty(template.shape, dtype=np.float64)
+    da.store(field_values.reshape(template.shape), out, lock=False)
+    return out
 
 
 def get_pollen_type(ds) -> list:
@@ -0,0 +1,220 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Leave-one-station-out cross-validation of the interpolated changes.
+
+For each species and field the change at each station is predicted by the
+interpolation from all other stations and compared with the change
+computed at the station. The predictions come from the weights of the
+stations at the station cells, i.e. the columns of the weight operator of
+utils.interpolate: leaving a station out only drops its own term (or, for
+rbf_exact, uses the factorized station system with Rippa's formula), so
+no interpolation is re-run per station.
+"""
+
+# Standard library
+import dataclasses
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+# First-party
+from realtime_pollen_calibration import rbf, stations, utils
+from realtime_pollen_calibration.update_phenology import read_t2m_file
+from realtime_pollen_calibration.update_phenology import (
+    read_pov_file as read_pov_file_phenology,
+)
+from realtime_pollen_calibration.update_strength import (
+    read_pov_file as read_pov_file_strength,
+)
+
+ValidationScore = namedtuple(
+    "ValidationScore", ["station_obs_file", "pollen_type", "field", "rmse", "bias", "nstns"]
+)
+
+
+def loo_predictions(change, kernel_stns, ipstyle: str, system=None, baseline: float = 0.0):
+    """Predict the change at each station from the other stations.
+
+    Args:
+        change: Array (..., nstns) of the change at the stations.
+        kernel_stns: Array (nstns, nstns), kernel_stns[i, j] is the
+            (normalized or not) weight of station i at station j.
+        ipstyle: One of utils.ipstyles.
+        system: Factorized station system (rbf.get_station_system),
+            only needed for rbf_exact.
+        baseline: Value of no change (1 for tune, 0 for the phenology).
+
+    Returns:
+        Array (..., nstns) of the leave-one-out predictions.
+
+    """
+    change = np.asarray(change, dtype=np.float64)
+    if ipstyle != "rbf_exact":
+        # Normalized average without the station itself
+        kernel = np.array(kernel_stns, dtype=np.float64)
+        np.fill_diagonal(kernel, 0.0)
+        return (change @ kernel) / np.sum(kernel, axis=0)
+
+    # Rippa (1999): the leave-one-out error of the exact interpolation is
+    # coefficient_i / (A^-1)_ii, no refit per station needed.
+    inverse_diag = np.diag(rbf.get_coefficients(np.eye(change.shape[-1]), system))
+    coefficients = rbf.get_coefficients(change - baseline, system)
+    return change - coefficients / inverse_diag
+
+
+def get_scores(change, predictions):
+    """Get the RMSE and the bias of the predictions."""
+    errors = np.asarray(predictions) - np.asarray(change)
+    return float(np.sqrt(np.mean(errors**2))), float(np.mean(errors))
+
+
+def validate_change(  # pylint: disable=too-many-positional-arguments,R0913
+    change, ds, coord_stns, config_obj: utils.Config, baseline: float
+):
+    """Get the leave-one-out predictions of a change vector.
+
+    Args:
+        change: Change at the stations.
+        ds: xarray.DataSet of the grid.
+        coord_stns: List of (lat, lon) tuples of the stations' coordinates.
+        config_obj: Configured data structure of class Config.
+        baseline: Value of no change (1 for tune, 0 for the phenology).
+
+    Returns:
+        Leave-one-out predictions at the stations.
+
+    """
+    cells = [utils.get_station_cell(ds, coords) for coords in coord_stns]
+    # Columns of the weight operator of the grid at the station cells
+    kernel_stns = utils.get_weight_operator(
+        ds.latitude.values[cells],
+        ds.longitude.values[cells],
+        coord_stns,
+        config_obj.ipstyle,
+        config_obj.eps_val,
+        config_obj.distance_metric,
+    )
+    system = None
+    if config_obj.ipstyle == "rbf_exact":
+        system = rbf.get_station_system(
+            coord_stns,
+            config_obj.eps_val,
+            config_obj.distance_metric,
+            config_obj.rbf_regularization,
+        )
+    return loo_predictions(change, kernel_stns, config_obj.ipstyle, system, baseline)
+
+
+def validate(  # pylint: disable=too-many-locals
+    config_obj: utils.Config,
+    mode: str = "strength",
+    station_files=None,
+    verbose: bool = False,
+) -> list:
+    """Cross-validate the interpolated changes of one or several hours.
+
+    Args:
+        config_obj: Configured data structure of class Config.
+        mode: Either 'strength' (tune) or 'phenology' (tthrs, tthre, saisl).
+        station_files: Optional list of (station_obs_file, station_mod_file)
+            of several hours (hindcast). The POV fields are only read once.
+            Defaults to the files of config_obj.
+        verbose: Optional additional debug prints.
+
+    Returns:
+        List of ValidationScore per hour, species and field.
+
+    """
+    specs = ["ALNU", "BETU", "POAC", "CORY"]
+    if mode == "strength":
+        pol_fields = [x + y for x in specs for y in ["tune", "saisn"]]
+        cal_fields, time_values = read_pov_file_strength(
+            config_obj.pov_infile, pol_fields, config_obj
+        )
+    else:
+        pol_fields = [
+            x + y for x in specs for y in ["tthrs", "tthre", "saisn", "ctsum"]
+        ]
+        pol_fields[9] = "POACsaisl"
+        cal_fields = read_pov_file_phenology(config_obj.pov_infile, pol_fields)
+        t2m_fields, time_values = read_t2m_file(config_obj.t2m_file, config_obj)
+        cal_fields.update(t2m_fields)
+    ds = utils.create_dataset(cal_fields, time_values, config_obj)
+    registry = stations.open_registry(config_obj.station_registry)
+    stations.load_cells(registry, ds)
+
+    # The window of the files of config_obj ends at the time of the fields,
+    # the hours of a hindcast end at their last observation
+    end_time = None
+    if station_files is None:
+        station_files = [(config_obj.station_obs_file, config_obj.station_mod_file)]
+        end_time = time_values
+    scores = []
+    for station_obs_file, station_mod_file in station_files:
+        config_hour = dataclasses.replace(
+            config_obj,
+            station_obs_file=station_obs_file,
+            station_mod_file=station_mod_file,
+        )
+        for pollen_type in utils.get_pollen_type(ds):
+            obs_mod_data = utils.read_atab(
+                pollen_type,
+                config_hour.max_miss_stns,
+                config_hour.station_obs_file,
+                config_hour.station_mod_file if mode == "strength" else "",
+                verbose=verbose,
+                registry=registry,
+                nhours=config_obj.window_hours,
+                end_time=end_time,
+                qc_settings=config_obj.obs_qc,
+            )
+            if mode == "strength":
+                changes = {
+                    "tune": utils.get_change_tune(
+                        pollen_type, obs_mod_data, ds, config_hour, verbose
+                    )
+                }
+                baseline = 1.0
+            else:
+                changes = {
+                    field_name[7:]: field_values
+                    for field_name, field_values in zip(
+                        utils.ChangePhenologyFields._fields,
+                        utils.get_change_phenol(pollen_type, obs_mod_data, ds, verbose),
+                    )
+                    if np.count_nonzero(field_values) > 0
+                }
+                baseline = 0.0
+            for field, change in changes.items():
+                predictions = validate_change(
+                    change, ds, obs_mod_data.coord_stns, config_hour, baseline
+                )
+                rmse, bias = get_scores(change, predictions)
+                scores.append(
+                    ValidationScore(
+                        station_obs_file,
+                        pollen_type,
+                        pollen_type + field,
+                        rmse,
+                        bias,
+                        len(change),
+                    )
+                )
+    stations.store_cells(registry, ds)
+    return scores
+
+
+def print_scores(scores: list, output: str = "") -> None:
+    """Print the validation scores (and their mean over several hours), optionally save them as csv."""
+    table = pd.DataFrame(scores, columns=ValidationScore._fields)
+    print(table.to_string(index=False))
+    if table.station_obs_file.nunique() > 1:
+        print("=== Mean over all hours ===")
+        print(table.groupby("field")[["rmse", "bias"]].mean().to_string())
+    if output:
+        table.to_csv(output, index=False)
@@ -0,0 +1,158 @@
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Bank of the weighting kernels of the pollen history for the tuning factor.
+
+A kernel gives the weight of each hour of the window, in the order of the
+rows of the ATAB files (oldest first). All kernels have the same orientation:
+the weight of the first hour of the window is the largest (1), and the
+weights decrease (constant: stay) along the window. Besides the built-in
+kernels, kernels with parameters can be defined in the config
+(weighting_kernels), e.g.:
+
+    weighting_kernels:
+      exp24:
+        kernel: exponential
+        half_life: 24
+
+The weight vectors are computed once per (kernel, window length, parameters)
+and shared read-only.
+"""
+
+# Standard library
+from functools import lru_cache
+
+import numpy as np  # type: ignore
+
+
+def _constant(nhours: int) -> np.ndarray:
+    return np.ones(nhours)
+
+
+def _linear(nhours: int) -> np.ndarray:
+    return np.linspace(1.0, 0.0, nhours)
+
+
+def _stepwise(nhours: int) -> np.ndarray:
+    weights = np.zeros(nhours)
+    weights[:36] = 1
+    return weights
+
+
+def _switch(nhours: int) -> np.ndarray:
+    sharpness = 25
+    shift = 0.6
+    weights = np.linspace(1, 0, nhours)
+    return 1 / (1 + np.exp(-sharpness * (weights - shift)))
+
+
+def _exponential(nhours: int, half_life: float) -> np.ndarray:
+    """Weight 1 for the first hour of the window, halved every half_life hours."""
+    return 0.5 ** (np.arange(nhours, dtype=np.float64) / half_life)
+
+
+# Kernel functions and the names of their parameters
+kernel_functions = {
+    "constant": (_constant, ()),
+    "linear": (_linear, ()),
+    "stepwise": (_stepwise, ()),
+    "switch": (_switch, ()),
+    "exponential": (_exponential, ("half_life",)),
+}
+
+builtin_kernels = ("constant", "linear", "stepwise", "switch")
+
+
+def check_kernels(definitions: dict) -> list:
+    """Check the kernels defined in the config.
+
+    Args:
+        definitions: {name: {"kernel": kind, parameter: value, ...}}.
+
+    Returns:
+        List of the problems found, empty if all kernels are valid.
+
+    """
+    problems = []
+    for name, definition in definitions.items():
+        if name in builtin_kernels:
+            problems.append(f"Weighting kernel {name} is built-in and cannot be redefined.")
+            continue
+        kind = definition.get("kernel")
+        if kind not in kernel_functions:
+            problems.append(
+                f"Weighting kernel {name}: kernel must be one of {list(kernel_functions)}."
+            )
+            continue
+        parameters = set(definition) - {"kernel"}
+        expected = set(kernel_functions[kind][1])
+        if parameters != expected:
+            problems.append(
+                f"Weighting kernel {name}: {kind} needs the parameters {sorted(expected)},"
+                f" got {sorted(parameters)}."
+            )
+            continue
+        for parameter in expected:
+            value = definition[parameter]
+            # bool is a subclass of int, but half_life: true is not a number
+            if (
+                isinstance(value, bool)
+                or not isinstance(value, (int, float))
+                or value <= 0
+            ):
+                problems.append(
+                    f"Weighting kernel {name}: {parameter} must be a positive number."
+                )
+    return problems
+
+
+def get_kernel_names(definitions: dict | None = None) -> tuple:
+    """Get the names of all available kernels."""
+    return builtin_kernels + tuple(definitions or {})
+
+
+def resolve(name: str, definitions: dict | None = None):
+    """Get (kind, parameters) of a kernel, None if the name is unknown."""
+    if name in builtin_kernels:
+        return name, ()
+    definition = (definitions or {}).get(name)
+    if definition is None:
+        return None
+    kind = definition["kernel"]
+    return kind, tuple(float(definition[p]) for p in kernel_functions[kind][1])
+
+
+@lru_cache(maxsize=64)
+def _compute(kind: str, nhours: int, parameters: tuple) -> np.ndarray:
+    weights = kernel_functions[kind][0](nhours, *parameters)
+    weights.flags.writeable = False
+    return weights
+
+
+def get_kernel(name: str, nhours: int = 120, definitions: dict | None = None):
+    """Get the weights of a kernel, None if the name is unknown."""
+    resolved = resolve(name, definitions)
+    if resolved is None:
+        return None
+    return _compute(resolved[0], nhours, resolved[1])
+
+
+@lru_cache(maxsize=64)
+def _bank(resolved: tuple, nhours: int) -> np.ndarray:
+    bank = np.stack([_compute(kind, nhours, parameters) for kind, parameters in resolved])
+    bank.flags.writeable = False
+    return bank
+
+
+def get_kernel_bank(names, nhours: int = 120, definitions: dict | None = None):
+    """Get the weights of several kernels as array (nkernels, nhours).
+
+    Returns None if a name is unknown.
+    """
+    resolved = tuple(resolve(name, definitions) for name in names)
+    if None in resolved:
+        return None
+    return _bank(resolved, nhours)
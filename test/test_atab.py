@@ -0,0 +1,44 @@
+"""Test module ``realtime_pollen_calibration/atab.py``."""
+
+import numpy as np
+
+from realtime_pollen_calibration import atab
+
+MOD_ATAB = """ATAB - Version 1.0
+Missing_value_code: -9999.0
+Indicator:                   AAA         BBB
+PARAMETER LEVTYPE LEVEL YYYY MM DD hh mm AAA BBB
+ALNU SFC 0 2024 02 28 23 00 1.5 2.0
+BETU SFC 0 2024 02 29 00 30 3.0 -9999.0
+
+"""
+
+
+def test_read_body(tmp_path):
+    mod_file = tmp_path / "mod.atab"
+    mod_file.write_text(MOD_ATAB)
+
+    body = atab.read_body(str(mod_file), 3, "mod")
+    np.testing.assert_array_equal(body.parameters, ["ALNU", "BETU"])
+    np.testing.assert_array_equal(
+        body.times,
+        np.array(["2024-02-28T23:00", "2024-02-29T00:30"], dtype="datetime64[m]"),
+    )
+    np.testing.assert_array_equal(body.values, [[1.5, 2.0], [3.0, -9999.0]])
+
+    cached = atab.get_body(str(mod_file), 3, "mod")
+    assert cached is atab.get_body(str(mod_file), 3, "mod")
+    assert not cached.values.flags.writeable
+
+
+def test_build_window():
+    times = np.array(
+        ["2024-02-01T16:00", "2024-02-01T18:00", "2024-02-01T18:30", "2024-02-01T10:00"],
+        dtype="datetime64[m]",
+    )
+    values = np.array([[1.0], [3.0], [9.0], [7.0]])
+
+    window = atab.build_window(times, values, np.datetime64("2024-02-01T18:00"), 3, -1.0)
+    np.testing.assert_array_equal(window.values[:, 0], [1.0, -1.0, 3.0])
+    np.testing.assert_array_equal(window.present, [True, False, True])
+    assert window.times[-1] == np.datetime64("2024-02-01T18:00")
@@ -0,0 +1,50 @@
+"""Test module ``realtime_pollen_calibration/batch.py``."""
+
+import pytest
+import yaml
+
+from realtime_pollen_calibration import batch
+from realtime_pollen_calibration.utils import CalibrationError
+
+
+def test_run_batch(config, tmp_path, monkeypatch):
+    config_path, _ = config
+    batch_file = tmp_path / "batch.yaml"
+    with open(batch_file, "w") as f:
+        yaml.dump(
+            {
+                "max_workers": 2,
+                "jobs": [
+                    {"name": "ok", "mode": "strength", "config": str(config_path)},
+                    {"name": "fails", "mode": "phenology", "config": str(config_path)},
+                ],
+            },
+            f,
+        )
+    jobs, max_workers = batch.read_batch_config(str(batch_file))
+    assert max_workers == 2
+    assert [job.mode for job in jobs] == ["strength", "phenology"]
+
+    monkeypatch.setitem(batch.modes, "strength", lambda config_obj, verbose: None)
+
+    def fail(config_obj, verbose):
+        raise CalibrationError("No observations of ALNU.")
+
+    monkeypatch.setitem(batch.modes, "phenology", fail)
+    results = batch.run_batch(jobs, max_workers)
+
+    assert [result.ok for result in results] == [True, False]
+    assert results[1].message == "No observations of ALNU."
+    assert not batch.print_report(results)
+
+
+def test_read_batch_config_invalid(tmp_path):
+    batch_file = tmp_path / "batch.yaml"
+    batch_file.write_text(
+        yaml.dump({"jobs": [{"name": "typo", "mode": "strenght", "config": "x.yaml"}]})
+    )
+    with pytest.raises(CalibrationError, match="Mode of job typo"):
+        batch.read_batch_config(str(batch_file))
+    batch_file.write_text(yaml.dump({"max_workers": 2}))
+    with pytest.raises(CalibrationError):
+        batch.read_batch_config(str(batch_file))
@@ -0,0 +1,47 @@
+"""Test module ``realtime_pollen_calibration/cache.py``."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from realtime_pollen_calibration.cache import GridCache
+
+
+def test_compute_outside_lock():
+    cache = GridCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append("slow")
+        started.set()
+        release.wait(5)
+        return "grid A"
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        first = executor.submit(cache.geometry, "A", slow)
+        assert started.wait(5)
+        waiting = executor.submit(cache.geometry, "A", slow)
+        # Another grid is not blocked by the computation of grid A
+        assert cache.geometry("B", lambda: "grid B") == "grid B"
+        release.set()
+        assert first.result() == waiting.result() == "grid A"
+    assert calls == ["slow"]
+
+
+def test_weight_operator():
+    cache = GridCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    # Without max_operators the operators are not kept
+    assert cache.weight_operator("A", ("stns",), compute) == 1
+    assert cache.weight_operator("A", ("stns",), compute) == 2
+    cache.set_max_operators(1)
+    assert cache.weight_operator("A", ("stns",), compute) == 3
+    assert cache.weight_operator("A", ("stns",), compute) == 3
+    assert cache.weight_operator("A", ("other",), compute) == 4
+    assert cache.weight_operator("A", ("stns",), compute) == 5
@@ -0,0 +1,71 @@
+"""Test module ``realtime_pollen_calibration/checkpoint.py``."""
+
+import numpy as np
+
+from realtime_pollen_calibration import checkpoint
+from realtime_pollen_calibration.utils import Config, ObsModData
+
+
+def test_pack_records():
+    records = {
+        "BETU": ObsModData(
+            np.ones((120, 3)), [(46.5, 7.0), (47.0, 8.5), (46.0, 9.0)], -9999.0, 0, 0
+        )
+    }
+    unpacked = checkpoint.unpack_records(checkpoint.pack_records(records), ObsModData)
+    np.testing.assert_array_equal(unpacked["BETU"].data_obs, records["BETU"].data_obs)
+    assert unpacked["BETU"].coord_stns == records["BETU"].coord_stns
+    assert unpacked["BETU"].missing_value == -9999.0
+    assert unpacked["BETU"].data_mod == 0
+
+
+def test_pack_records_phenology(tmp_path):
+    # Without model data, as read for the phenology
+    records = {
+        "ALNU": ObsModData(np.ones((120, 2)), [(46.5, 7.0), (47.0, 8.5)], -9999.0)
+    }
+    np.savez(tmp_path / "stations.npz", **checkpoint.pack_records(records))
+    with np.load(tmp_path / "stations.npz") as data:
+        arrays = {name: data[name] for name in data.files}
+    unpacked = checkpoint.unpack_records(arrays, ObsModData)
+    np.testing.assert_array_equal(unpacked["ALNU"].data_obs, records["ALNU"].data_obs)
+    assert unpacked["ALNU"].coord_stns == records["ALNU"].coord_stns
+    assert unpacked["ALNU"].data_mod is None
+    assert unpacked["ALNU"].istation_mod is None
+    assert unpacked["ALNU"].qc_flags is None
+
+
+def test_resume(tmp_path):
+    for name in ("pov", "const", "obs", "mod"):
+        (tmp_path / name).write_text(name)
+    config_obj = Config(
+        pov_infile=str(tmp_path / "pov"),
+        const_file=str(tmp_path / "const"),
+        station_obs_file=str(tmp_path / "obs"),
+        station_mod_file=str(tmp_path / "mod"),
+        checkpoint_dir=str(tmp_path / "checkpoints"),
+    )
+    runs = []
+
+    def compute():
+        runs.append(1)
+        return {"ALNUtune": np.arange(5.0)}
+
+    def run_stage(resume):
+        checkpoints = checkpoint.Checkpoints(config_obj, "strength", resume)
+        return checkpoints, checkpoints.run(
+            "load", compute, checkpoint.pack_fields, checkpoint.unpack_fields
+        )
+
+    run_stage(False)
+    checkpoints, fields = run_stage(True)
+    assert len(runs) == 1
+    np.testing.assert_array_equal(fields["ALNUtune"], np.arange(5.0))
+
+    # Changed inputs invalidate the checkpoints
+    (tmp_path / "obs").write_text("obs2")
+    run_stage(True)
+    assert len(runs) == 2
+
+    checkpoints.clear()
+    assert not list((tmp_path / "checkpoints").glob(f"{checkpoints.key}.*"))
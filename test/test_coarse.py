@@ -0,0 +1,48 @@
+"""Test module ``realtime_pollen_calibration/coarse.py``."""
+
+import numpy as np
+import xarray as xr
+
+from realtime_pollen_calibration import coarse, utils
+from realtime_pollen_calibration.utils import Config
+
+
+def test_remap_bilinear():
+    rng = np.random.default_rng(5)
+    latitude = rng.uniform(45.5, 48.0, 1000)
+    longitude = rng.uniform(5.5, 10.5, 1000)
+    remap_obj = coarse.get_remap(latitude, longitude, 0.1)
+    node_lat, node_lon = coarse.get_nodes(remap_obj.mesh)
+    np.testing.assert_allclose(remap_obj.weights.sum(axis=1), 1.0)
+    # Bilinear functions are reproduced exactly
+    def bilinear(lat, lon):
+        return 2.0 * lat - lon + 0.5 * lat * lon
+
+    values = coarse.remap(bilinear(node_lat, node_lon), remap_obj)
+    np.testing.assert_allclose(values, bilinear(latitude, longitude))
+
+
+def test_interpolate_coarse():
+    rng = np.random.default_rng(6)
+    ncells = 20000
+    clat = rng.uniform(45.5, 48.0, ncells)
+    clon = rng.uniform(5.5, 10.5, ncells)
+    tune = rng.uniform(0.3, 3.0, ncells)
+    ds = xr.Dataset(
+        utils.create_data_arrays(
+            {"ALNUtune": tune}, clon, clat, np.datetime64("2024-02-01T12")
+        )
+    )
+    coord_stns = list(zip(rng.uniform(46, 47.5, 10), rng.uniform(6, 10, 10)))
+    change = rng.uniform(0.8, 1.2, 10)
+    for ipstyle, exact in (("rbf_mq", False), ("idw", True)):
+        direct = utils.interpolate(
+            change, ds, "ALNUtune", coord_stns, Config(ipstyle=ipstyle)
+        )
+        config_obj = Config(ipstyle=ipstyle, coarse_mesh_step=0.05)
+        remapped = utils.interpolate(change, ds, "ALNUtune", coord_stns, config_obj)
+        if exact:
+            # The singular idw kernel exceeds the tolerance near the stations
+            np.testing.assert_array_equal(remapped, direct)
+        else:
+            np.testing.assert_allclose(remapped, direct, rtol=1e-3)
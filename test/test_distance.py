@@ -0,0 +1,36 @@
+"""Test module ``realtime_pollen_calibration/distance.py``."""
+
+import numpy as np
+
+from realtime_pollen_calibration import distance
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def test_station_distances():
+    # Zurich and Bern, about 95 km apart
+    latitude = np.array([47.3769, 46.9480])
+    longitude = np.array([8.5417, 7.4474])
+    coord_stns = [(47.3769, 8.5417)]
+    dist = {
+        metric: distance.station_distances(latitude, longitude, coord_stns, metric)
+        for metric in distance.metrics
+    }
+    assert dist["haversine"].shape == (1, 2)
+    np.testing.assert_allclose(dist["haversine"][0, 1] * EARTH_RADIUS_KM, 95.5, atol=0.5)
+    np.testing.assert_allclose(dist["chord"], dist["haversine"], rtol=1e-4)
+    np.testing.assert_allclose(dist["equirectangular"][0, 1], dist["haversine"][0, 1], rtol=1e-2)
+    # Distance of a station to itself is clipped, not zero
+    assert dist["haversine"][0, 0] > 0
+
+
+def test_nearest_cell():
+    rng = np.random.default_rng(0)
+    latitude = rng.uniform(45.5, 48.0, 1000)
+    longitude = rng.uniform(5.5, 10.5, 1000)
+    xyz = distance.unit_vectors(latitude, longitude)
+    for coords in [(46.0, 7.0), (47.5, 9.3)]:
+        dist = distance.station_distances(latitude, longitude, [coords], "haversine")
+        expected = int(np.argmin(dist))
+        assert distance.nearest_cell(latitude, longitude, coords, "haversine", xyz) == expected
+        assert distance.nearest_cell(latitude, longitude, coords, "chord") == expected
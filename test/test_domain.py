@@ -0,0 +1,47 @@
+"""Test module ``realtime_pollen_calibration/domain.py``."""
+
+import numpy as np
+import pytest
+
+from realtime_pollen_calibration import domain, utils
+
+
+def test_get_ranges():
+    ranges = domain.get_ranges(10, 4)
+    assert [(cells.start, cells.stop) for cells in ranges] == [
+        (0, 2),
+        (2, 5),
+        (5, 7),
+        (7, 10),
+    ]
+    assert len(domain.get_ranges(3, 8)) == 3
+    with pytest.raises(utils.CalibrationError):
+        domain.get_workers(-1)
+
+
+@pytest.mark.parametrize("chunk_size", [0, 100])
+@pytest.mark.parametrize("ipstyle", ["idw", "rbf_exact"])
+def test_interpolate_ranges(chunk_size, ipstyle):
+    # Local-only: a pool of two processes, without MPI
+    rng = np.random.default_rng(5)
+    ncells = 3000
+    values = rng.uniform(0.3, 3.0, (2, ncells))
+    values[:, :500] = 0
+    ds = utils.make_dataset(
+        {"ALNUtune": values[0]},
+        rng.uniform(5.5, 10.5, ncells),
+        rng.uniform(45.5, 48.0, ncells),
+        np.datetime64("2024-02-01T13"),
+        utils.Config(),
+    )
+    coord_stns = list(zip(rng.uniform(46, 47.5, 6), rng.uniform(6, 10, 6)))
+    change = rng.uniform(0.8, 1.2, (2, 6))
+    args = (ds, "ALNUtune", coord_stns)
+    kwargs = {"mask": values != 0, "values": values}
+    serial = utils.interpolate(
+        change, *args, utils.Config(ipstyle=ipstyle, chunk_size=chunk_size), **kwargs
+    )
+    config_obj = utils.Config(ipstyle=ipstyle, chunk_size=chunk_size, domain_workers=2)
+    decomposed = utils.interpolate(change, *args, config_obj, **kwargs)
+    np.testing.assert_allclose(decomposed, serial, rtol=1e-12)
+    np.testing.assert_array_equal(decomposed[:, :500], 0)
@@ -0,0 +1,68 @@
+"""Test module ``realtime_pollen_calibration/ensemble.py``."""
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from realtime_pollen_calibration import ensemble, utils
+from realtime_pollen_calibration.utils import Config
+
+
+def test_get_members(tmp_path):
+    for i in range(3):
+        (tmp_path / f"pov_{i}.grib2").touch()
+    config_obj = Config(
+        ensemble={
+            "pov_infiles": str(tmp_path / "pov_*.grib2"),
+            "station_mod_files": [f"mod_{i}.atab" for i in range(3)],
+            "pov_outfile": str(tmp_path / "out_{member:03d}.grib2"),
+        }
+    )
+    members = ensemble.get_members(config_obj, "strength")
+    assert [m.pov_infile for m in members] == [
+        str(tmp_path / f"pov_{i}.grib2") for i in range(3)
+    ]
+    assert members[2].station_mod_file == "mod_2.atab"
+    assert members[2].pov_outfile == str(tmp_path / "out_002.grib2")
+    assert ensemble.member_config(config_obj, members[1]).pov_infile.endswith("pov_1.grib2")
+
+    config_obj.ensemble["station_mod_files"] = ["mod_0.atab"]
+    with pytest.raises(utils.CalibrationError):
+        ensemble.get_members(config_obj, "strength")
+
+
+def test_interpolate_members():
+    rng = np.random.default_rng(3)
+    ncells = 4000
+    clat = rng.uniform(45.5, 48.0, ncells)
+    clon = rng.uniform(5.5, 10.5, ncells)
+    tune = rng.uniform(0.3, 3.0, (3, ncells))
+    tune[rng.random((3, ncells)) < 0.3] = 0
+    ds = xr.Dataset(
+        utils.create_data_arrays(
+            {"ALNUtune": tune[0]}, clon, clat, np.datetime64("2024-02-01T12")
+        )
+    )
+    coord_stns = list(zip(rng.uniform(46, 47.5, 10), rng.uniform(6, 10, 10)))
+    change = rng.uniform(0.8, 1.2, (3, 10))
+    for config_obj in (Config(ipstyle="rbf_g"), Config(chunk_size=999)):
+        stacked = utils.interpolate(
+            change,
+            ds,
+            "ALNUtune",
+            coord_stns,
+            config_obj,
+            mask=tune != 0,
+            values=tune,
+        )
+        for i in range(3):
+            single = utils.interpolate(
+                change[i],
+                ds,
+                "ALNUtune",
+                coord_stns,
+                config_obj,
+                mask=tune[i] != 0,
+                values=tune[i],
+            )
+            np.testing.assert_allclose(stacked[i], single)
@@ -0,0 +1,37 @@
+"""Test module ``realtime_pollen_calibration/fused.py``."""
+
+import numpy as np
+import pytest
+
+from realtime_pollen_calibration import fused, utils
+
+
+@pytest.mark.parametrize("ipstyle", ["idw", "rbf_g", "rbf_mq"])
+@pytest.mark.parametrize("metric", ["equirectangular", "haversine"])
+def test_interpolate_cells(ipstyle, metric):
+    # Without numba the kernel runs as plain Python, hence the small grid
+    rng = np.random.default_rng(4)
+    ncells = 600  # three blocks of the parallel loop, the last partial
+    latitude = rng.uniform(45.5, 48.0, ncells)
+    longitude = rng.uniform(5.5, 10.5, ncells)
+    values = rng.uniform(0.3, 3.0, (2, ncells))
+    values[rng.random((2, ncells)) < 0.3] = 0
+    coord_stns = list(zip(rng.uniform(46, 47.5, 6), rng.uniform(6, 10, 6)))
+    change = rng.uniform(0.8, 1.2, (2, 6))
+    kwargs = {
+        "change": change,
+        "coord_stns": coord_stns,
+        "ipstyle": ipstyle,
+        "eps_val": 1.0,
+        "metric": metric,
+        "method": "multiply",
+        "min_value": 0.5,
+        "max_value": 2.0,
+    }
+    fused_values = fused.interpolate_cells(
+        values, latitude, longitude, values != 0, **kwargs
+    )
+    numpy_values = utils.interpolate_chunk(
+        values, latitude, longitude, values != 0, regularization=0.0, **kwargs
+    )
+    np.testing.assert_allclose(fused_values, numpy_values, rtol=1e-9)
@@ -0,0 +1,25 @@
+"""Test module ``realtime_pollen_calibration/gribio.py``."""
+
+import eccodes  # type: ignore
+import numpy as np
+
+from realtime_pollen_calibration import gribio
+
+
+def test_grib_file(tmp_path):
+    path = tmp_path / "in.grib2"
+    with open(path, "wb") as fout:
+        fout.write(b"padding")
+        for i in range(3):
+            gid = eccodes.codes_grib_new_from_samples("GRIB2")
+            eccodes.codes_set_values(gid, np.arange(496, dtype=np.float64) * i)
+            eccodes.codes_write(gid, fout)
+            eccodes.codes_release(gid)
+
+    with gribio.GribFile(str(path)) as grib:
+        assert len(grib) == 3
+        assert grib.messages[0].offset == len(b"padding")
+        for i, gid in enumerate(grib.handles()):
+            values = gribio.decode_values(gid)
+            assert values.dtype == np.float64
+            np.testing.assert_allclose(values, np.arange(496) * i, atol=1e-3)
@@ -0,0 +1,76 @@
+"""Test module ``realtime_pollen_calibration/inputs.py``."""
+
+import asyncio
+
+import numpy as np
+
+from realtime_pollen_calibration import inputs
+from realtime_pollen_calibration.utils import Config
+
+OBS_ATAB = """ATAB - Version 1.0
+Missing_value_code: -9999.0
+Indicator: AAA\tBBB\tCCC
+Latitude: 47.0 46.5 46.0
+Longitude: 7.0 8.0 9.0
+PARAMETER YYYY MM DD hh mm AAA BBB CCC
+ALNU 2024 01 27 19 00 1.0 -9999.0 3.0
+ALNU 2024 01 27 20 00 2.0 -9999.0 -9999.0
+BETU 2024 01 27 19 00 1.0 2.0 3.0
+"""
+
+MOD_ATAB = """ATAB - Version 1.0
+Type_of_product: Model
+Missing_value_code: -9999.0
+Indicator:                   AAA         BBB
+PARAMETER LEVTYPE LEVEL YYYY MM DD hh mm AAA BBB
+ALNU SFC 0 2024 01 27 18 00 -9999.0 1.0
+ALNU SFC 0 2024 01 27 19 00 1.0 2.0
+ALNU SFC 0 2024 01 27 20 00 2.0 3.0
+BETU SFC 0 2024 01 27 19 00 1.0 -9999.0
+"""
+
+
+def test_check_obs_atab(tmp_path):
+    obs_file = tmp_path / "obs.atab"
+    obs_file.write_text(OBS_ATAB)
+
+    problems, stations = inputs.check_obs_atab(str(obs_file), nhours=2)
+    assert not problems
+    # BBB (100% missing) and CCC (50% missing) are removed
+    assert stations["ALNU"] == (2, {"AAA"}, 2)
+    # BETU has only one of the two hours of the window
+    assert stations["BETU"] == (1, set(), 3)
+    assert stations["POAC"][0] == 0
+
+    removed = inputs.get_removed_stations(
+        np.array([[1.0, -9999.0], [2.0, 3.0], [3.0, 4.0]]), -9999.0
+    )
+    np.testing.assert_array_equal(removed, [False, False])
+
+
+def test_check_mod_atab(tmp_path):
+    mod_file = tmp_path / "mod.atab"
+    mod_file.write_text(MOD_ATAB)
+
+    # The missing value of ALNU at 18:00 is outside of the window
+    indicators, types_missing = inputs.check_mod_atab(str(mod_file), nhours=2)
+    assert indicators == {"AAA", "BBB"}
+    assert types_missing == {"BETU"}
+    _, types_missing = inputs.check_mod_atab(
+        str(mod_file), nhours=2, end_time=np.datetime64("2024-01-27T19:00")
+    )
+    assert types_missing == {"ALNU", "BETU"}
+
+
+def test_check_inputs_missing_files(tmp_path):
+    config_obj = Config(
+        pov_infile=str(tmp_path / "pov.grib2"),
+        const_file=str(tmp_path / "const.grib2"),
+        station_obs_file=str(tmp_path / "obs.atab"),
+        station_mod_file=str(tmp_path / "mod.atab"),
+    )
+    (tmp_path / "obs.atab").write_text(OBS_ATAB)
+
+    problems = asyncio.run(inputs.check_inputs(config_obj, "strength", ["ALNUtune"]))
+    assert len(problems) == 3
+    assert all("does not exist" in problem for problem in problems)
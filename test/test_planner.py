@@ -0,0 +1,50 @@
+"""Test module ``realtime_pollen_calibration/planner.py``."""
+
+import pytest
+
+from realtime_pollen_calibration import planner
+from realtime_pollen_calibration.utils import Config
+
+sizes = planner.Sizes(
+    ncells=1_000_000, nstns=40, nspecies=4, ninputs=8, noutputs=4, nmembers=1
+)
+
+
+def test_make_plan():
+    # Without budget the settings of the config are kept
+    plan = planner.make_plan(sizes, Config(chunk_size=5000, write_workers=2))
+    assert (plan.chunk_size, plan.write_workers, plan.fits) == (5000, 2, True)
+
+    # The whole grid fits in a large budget
+    plan = planner.make_plan(sizes, Config(memory_budget=16000))
+    assert plan.chunk_size == 0
+    assert plan.fits and plan.peak <= 16000 * 2**20
+
+    # Chunks within a smaller budget, the largest that fit
+    config_obj = Config(memory_budget=400)
+    plan = planner.make_plan(sizes, config_obj)
+    assert plan.fits and plan.peak <= 400 * 2**20
+    assert 0 < plan.chunk_size < sizes.ncells
+    larger = planner.estimate(sizes, config_obj, 2 * plan.chunk_size, 1, plan.use_dask)
+    assert max(stage.memory for stage in larger) > 400 * 2**20
+
+    # Beyond the smallest footprint
+    plan = planner.make_plan(sizes, Config(memory_budget=10))
+    assert not plan.fits
+
+
+def test_apply_plan():
+    plan = planner.make_plan(sizes, Config(memory_budget=400))
+    config_obj = planner.apply_plan(Config(memory_budget=400), plan)
+    assert config_obj.chunk_size == plan.chunk_size
+    assert config_obj.write_workers == plan.write_workers
+    assert planner.plan_run(Config(), "strength") == Config()
+
+
+def test_estimate_members():
+    # The interpolation of the members scales with their number
+    config_obj = Config()
+    single = planner.estimate(sizes, config_obj, 4096, 1, False)
+    members = planner.estimate(sizes._replace(nmembers=10), config_obj, 4096, 1, False)
+    assert members[1].seconds == pytest.approx(10 * single[1].seconds)
+    assert members[1].memory > single[1].memory
@@ -0,0 +1,48 @@
+"""Test module ``realtime_pollen_calibration/qc.py``."""
+
+import numpy as np
+
+from realtime_pollen_calibration import qc
+
+
+def test_get_flags():
+    rng = np.random.default_rng(0)
+    data_obs = rng.uniform(50, 150, (4, 120, 5))
+    data_obs[0, 60, 1] = 20000.0
+    data_obs[1, 10:30, 2] = 42.0
+    data_obs[2, 5, 3] = -3.0
+    data_obs[3, 7, 0] = -9999.0
+    data_mod = np.full(data_obs.shape, 100.0)
+    data_mod[3, 90, 4] = 1e6
+
+    flags = qc.get_flags(data_obs, -9999.0, {}, data_mod)
+
+    assert flags.shape == data_obs.shape
+    assert flags[0, 60, 1] == qc.SPIKE | qc.RATIO
+    assert np.all(flags[1, 10:30, 2] == qc.FLATLINE)
+    assert flags[2, 5, 3] == qc.NEGATIVE
+    assert flags[3, 7, 0] == qc.MISSING
+    assert flags[3, 90, 4] == qc.RATIO
+    assert np.count_nonzero(flags) == 1 + 20 + 1 + 1 + 1
+
+    # The pollen types are checked independently
+    np.testing.assert_array_equal(
+        qc.get_flags(data_obs[1], -9999.0, {}, data_mod[1]), flags[1]
+    )
+    cleaned = qc.clean(data_obs, flags, -9999.0)
+    assert np.all(cleaned[flags != 0] == -9999.0)
+    np.testing.assert_array_equal(cleaned[flags == 0], data_obs[flags == 0])
+
+
+def test_rolling_median():
+    values = np.array([1.0, 3.0, np.nan, 2.0, 10.0, 4.0])[:, None]
+    median, mad = qc.rolling_median(values, 3)
+    np.testing.assert_allclose(median[:, 0], [2.0, 2.0, 2.5, 6.0, 4.0, 7.0])
+    np.testing.assert_allclose(mad[:, 0], [1.0, 1.0, 0.5, 4.0, 2.0, 3.0])
+
+
+def test_check_settings():
+    assert not qc.check_settings({"flatline_hours": 24})
+    assert qc.check_settings({"spike_hour": 5})
+    assert qc.check_settings({"max_ratio": 0.5})
+    assert qc.check_settings({"spike_min": -1})
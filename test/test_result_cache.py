@@ -0,0 +1,56 @@
+"""Test module ``realtime_pollen_calibration/result_cache.py``."""
+
+import os
+import time
+
+from realtime_pollen_calibration import result_cache
+from realtime_pollen_calibration.utils import Config
+
+
+def test_run_cached(tmp_path):
+    for name in ("pov", "const", "obs", "mod"):
+        (tmp_path / name).write_text(name)
+    config_obj = Config(
+        pov_infile=str(tmp_path / "pov"),
+        const_file=str(tmp_path / "const"),
+        station_obs_file=str(tmp_path / "obs"),
+        station_mod_file=str(tmp_path / "mod"),
+        pov_outfile=str(tmp_path / "out"),
+        result_cache_dir=str(tmp_path / "cache"),
+    )
+    runs = []
+
+    def run():
+        runs.append(1)
+        (tmp_path / "out").write_text(f"result {len(runs)}")
+
+    result_cache.run_cached(config_obj, "strength", run)
+    (tmp_path / "out").unlink()
+    result_cache.run_cached(config_obj, "strength", run)
+    assert len(runs) == 1
+    assert (tmp_path / "out").read_text() == "result 1"
+
+    # A different input, setting or --no-cache runs the calibration again
+    (tmp_path / "mod").write_text("mod2")
+    result_cache.run_cached(config_obj, "strength", run)
+    config_obj.eps_val = 2
+    result_cache.run_cached(config_obj, "strength", run)
+    result_cache.run_cached(config_obj, "strength", run, use_cache=False)
+    assert len(runs) == 4
+    # Settings without influence on the result share the entry
+    config_obj.write_workers = 4
+    result_cache.run_cached(config_obj, "strength", run)
+    assert len(runs) == 4
+
+
+def test_evict(tmp_path):
+    for i in range(3):
+        entry = tmp_path / f"{i:02d}" / f"{i:02d}.grib2"
+        entry.parent.mkdir()
+        entry.write_bytes(b"x" * 1024**2)
+        os.utime(entry, (time.time() - 3600 * (10 - i),) * 2)
+    removed = result_cache.evict(str(tmp_path), max_age_hours=9.5)
+    assert [os.path.basename(path) for path in removed] == ["00.grib2"]
+    removed = result_cache.evict(str(tmp_path), max_mb=1.5)
+    assert [os.path.basename(path) for path in removed] == ["01.grib2"]
+    assert (tmp_path / "02" / "02.grib2").exists()
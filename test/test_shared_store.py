@@ -0,0 +1,39 @@
+"""Test module ``realtime_pollen_calibration/shared_store.py``."""
+
+import os
+
+import numpy as np
+import pytest
+
+from realtime_pollen_calibration import shared_store
+
+
+def test_attach_release(tmp_path):
+    source = tmp_path / "const.grib2"
+    source.write_bytes(b"GRIB")
+    store = str(tmp_path / "store")
+    loads = []
+
+    def load():
+        loads.append(1)
+        return {"clon": np.arange(4.0), "time_values": np.datetime64("2024-02-01T12")}
+
+    arrays = shared_store.attach(store, str(source), "grid", load)
+    again = shared_store.attach(store, str(source), "grid", load)
+    assert len(loads) == 1
+    np.testing.assert_array_equal(again["clon"], np.arange(4.0))
+    assert arrays["time_values"] == np.datetime64("2024-02-01T12")
+    with pytest.raises(ValueError):
+        arrays["clon"][0] = 1.0
+
+    entry = shared_store.get_entry(store, str(source), "grid")
+    assert shared_store.get_references(entry) == [os.getpid()]
+    # The entry is kept while another running process references it
+    (tmp_path / "store" / os.path.basename(entry) / "refs" / str(os.getppid())).touch()
+    shared_store.release(store, entry)
+    assert os.path.isdir(entry)
+    os.remove(os.path.join(entry, "refs", str(os.getppid())))
+    shared_store.attach(store, str(source), "grid", load)
+    shared_store.release_all()
+    assert not os.path.exists(entry)
+    assert len(loads) == 1
@@ -0,0 +1,79 @@
+"""Test module ``realtime_pollen_calibration/stations.py``."""
+
+import numpy as np
+import pytest
+
+from realtime_pollen_calibration import stations, utils
+
+
+def test_registry_roundtrip(tmp_path):
+    path = str(tmp_path / "registry.json")
+    registry = stations.StationRegistry(path)
+    key = stations.header_key(["Indicator: ABC\tDEF\n"])
+    registry.put_header(key, {"indicators": ["ABC", "DEF"]})
+    registry.put_mod_columns(key, {"ABC": 1, "DEF": 0})
+    registry.put_cells("grid", {"46.0,7.0": 12})
+    registry.save()
+
+    loaded = stations.StationRegistry(path)
+    assert loaded.get_header(key) == {"indicators": ["ABC", "DEF"]}
+    assert loaded.get_cells("grid") == {"46.0,7.0": 12}
+    assert loaded.get_header(stations.header_key(["other\n"], "mod")) is None
+    istation_mod = utils.get_mod_stn_index(
+        np.array(["DEF", "ABC"]), loaded.get_mod_columns(key), path
+    )
+    np.testing.assert_array_equal(istation_mod, [0, 1])
+    with pytest.raises(utils.CalibrationError):
+        utils.get_mod_stn_index(np.array(["XYZ"]), loaded.get_mod_columns(key), path)
+
+
+def test_get_atab_header(tmp_path, monkeypatch):
+    atab_file = tmp_path / "mod.atab"
+    atab_file.write_text(
+        "ATAB - Version 1.0\n"
+        "Missing_value_code: -9999.0\n"
+        "Indicator:  PA0      PB1   PC2\n"
+        "PARAMETER LEVTYPE LEVEL YYYY MM DD hh mm PA0 PB1 PC2\n",
+        encoding="utf-8",
+    )
+    registry = stations.StationRegistry(str(tmp_path / "registry.json"))
+    key, headerdata = utils.get_atab_header(str(atab_file), "mod", registry)
+    np.testing.assert_array_equal(headerdata.stn_indicators, ["PA0", "PB1", "PC2"])
+    assert (headerdata.missing_value, headerdata.n_header) == (-9999.0, 3)
+
+    # Known headers are not parsed again
+    def parse(*args):
+        raise AssertionError("parsed")
+
+    monkeypatch.setattr(utils, "parse_atab_header", parse)
+    cached_key, cached = utils.get_atab_header(str(atab_file), "mod", registry)
+    assert cached_key == key
+    np.testing.assert_array_equal(cached.stn_indicators, headerdata.stn_indicators)
+
+
+def test_header_key(tmp_path, monkeypatch):
+    lines = [
+        "ATAB - Version 1.0\n",
+        "Creation_date: 2024-02-01 13:05\n",
+        "Missing_value_code: -9999.0\n",
+        "Indicator: ABC\tDEF\n",
+        "PARAMETER YYYY MM DD hh mm ABC DEF\n",
+    ]
+    key = stations.header_key(lines)
+    # Only the station lines (and the number of lines) make the key
+    changed_date = lines[:1] + ["Creation_date: 2024-02-02 13:05\n"] + lines[2:]
+    assert stations.header_key(changed_date) == key
+    assert stations.header_key(lines[:3] + ["Indicator: ABC\n"] + lines[4:]) != key
+    assert stations.header_key(lines, "mod") != key
+
+    monkeypatch.setattr(stations, "max_headers", 2)
+    registry = stations.StationRegistry(str(tmp_path / "registry.json"))
+    for name in ("a", "b"):
+        registry.put_header(name, {})
+        registry.put_mod_columns(name, {})
+    assert registry.get_header("a") == {}
+    registry.put_header("c", {})
+    # The least recently used header is dropped, with its model columns
+    assert registry.get_header("b") is None
+    assert registry.get_mod_columns("b") is None
+    assert registry.get_header("a") == registry.get_header("c") == {}
@@ -0,0 +1,30 @@
+"""Test module ``realtime_pollen_calibration/sweep.py``."""
+
+import pandas as pd
+
+from realtime_pollen_calibration.sweep import print_sweep, sweep_strength
+
+
+def test_sweep_strength(config, tmp_path):
+    _, parsed_config = config
+    results = sweep_strength(
+        parsed_config,
+        ipstyles=("idw", "rbf_g"),
+        eps_vals=(0.5, 1.0),
+        weighting_types=("constant", "linear"),
+    )
+    # idw has no eps_val, hence (1 + 2) * 2 combinations
+    assert len(results) == 6
+    assert {(result.ipstyle, result.eps_val) for result in results} == {
+        ("idw", None),
+        ("rbf_g", 0.5),
+        ("rbf_g", 1.0),
+    }
+    assert all(result.rmse >= abs(result.bias) for result in results)
+    assert len({result.nstns for result in results}) == 1
+
+    output = tmp_path / "sweep.csv"
+    print_sweep(results, str(output))
+    table = pd.read_csv(output)
+    assert len(table) == 6
+    assert table["rmse"].is_monotonic_increasing
@@ -1,8 +1,13 @@
 import pytest
 from pathlib import Path
 import eccodes
+import numpy as np
 
-from realtime_pollen_calibration.update_strength import update_strength_realtime
+from realtime_pollen_calibration import utils
+from realtime_pollen_calibration.update_strength import (
+    calibrate_strength,
+    update_strength_realtime,
+)
 
 def test_update_strength_realtime(config, tmp_path):
     _, parsed_config = config
@@ -24,3 +29,53 @@ def test_update_strength_realtime(config, tmp_path):
         assert short_name == "CORYtthrs", "CORYtthrs is expected to be the first field but it is not!"
         
         eccodes.codes_release(gid)
+
+
+def test_calibrate_strength():
+    rng = np.random.default_rng(0)
+    ncells, nstns = 2000, 5
+    clat = rng.uniform(45.5, 48.0, ncells)
+    clon = rng.uniform(5.5, 10.5, ncells)
+    config_obj = utils.Config()
+    ds = utils.make_dataset(
+        {"ALNUtune": rng.uniform(0.5, 2.0, ncells), "ALNUsaisn": np.full(ncells, 10.0)},
+        clon,
+        clat,
+        np.datetime64("2024-02-01T13"),
+        config_obj,
+    )
+    indicators = np.array([f"S{i}" for i in range(nstns)])
+    headerdata = utils.HeaderData(
+        list(zip(rng.uniform(46, 47.5, nstns), rng.uniform(6, 10, nstns))),
+        -9999.0,
+        indicators,
+        None,
+    )
+    data_obs = rng.uniform(50, 150, (120, nstns))
+    data_obs[:100, 0] = -9999.0
+    data_mod = rng.uniform(20, 60, (120, nstns))
+    obs_mod_data = {
+        "ALNU": utils.get_station_data(
+            "ALNU",
+            data_obs,
+            headerdata,
+            1,
+            data_mod,
+            {stn: i for i, stn in enumerate(indicators)},
+            verbose=False,
+        )
+    }
+    # The station with more than 50% missing data is removed
+    assert len(obs_mod_data["ALNU"].coord_stns) == nstns - 1
+
+    result = calibrate_strength(ds, obs_mod_data, config_obj, verbose=False)
+    assert list(result.fields) == ["ALNUtune"]
+    assert result.changes["ALNU"].shape == (nstns - 1,)
+    # No state is kept between the calls
+    again = calibrate_strength(ds, obs_mod_data, config_obj, verbose=False)
+    np.testing.assert_array_equal(again.fields["ALNUtune"], result.fields["ALNUtune"])
+
+    with pytest.raises(utils.CalibrationError):
+        calibrate_strength(ds.drop_vars("ALNUsaisn"), obs_mod_data, config_obj)
+    with pytest.raises(utils.CalibrationError):
+        utils.get_station_data("ALNU", data_obs, headerdata, 0, verbose=False)
@@ -4,10 +4,13 @@
 import logging
 
 import cfgrib  # type: ignore
+import eccodes  # type: ignore
 import numpy as np
+import pytest
+import xarray as xr
 
 # First-party
-from realtime_pollen_calibration import utils
+from realtime_pollen_calibration import distance, rbf, utils
 from realtime_pollen_calibration.utils import Config
 def test_count_to_log_level():
     assert utils.count_to_log_level(0) == logging.ERROR
@@ -59,3 +62,164 @@ def test_interpolation(test_data_dir,config):
     )
     err = ds2.ALNUtune - tune_vec_2
     assert np.amax(np.abs(err.values)) < 1e-1
+
+
+def test_interpolate_active_mask():
+    rng = np.random.default_rng(0)
+    ncells = 5000
+    clat = rng.uniform(45.5, 48.0, ncells)
+    clon = rng.uniform(5.5, 10.5, ncells)
+    tune = rng.uniform(0.3, 3.0, ncells)
+    tune[rng.random(ncells) < 0.3] = 0
+    ds = xr.Dataset(
+        utils.create_data_arrays(
+            {"ALNUtune": tune}, clon, clat, np.datetime64("2024-02-01T12")
+        )
+    )
+    coord_stns = list(zip(rng.uniform(46, 47.5, 10), rng.uniform(6, 10, 10)))
+    change = rng.uniform(0.8, 1.2, 10)
+    config_obj = Config(ipstyle="rbf_g")
+    full = utils.interpolate(change, ds, "ALNUtune", coord_stns, config_obj)
+    masked = utils.interpolate(
+        change,
+        ds,
+        "ALNUtune",
+        coord_stns,
+        config_obj,
+        mask=utils.get_active_mask(ds, "ALNUtune"),
+    )
+    active = tune != 0
+    np.testing.assert_allclose(masked[active], full[active])
+    assert np.all(masked[~active] == 0)
+
+
+def test_interpolate_chunked():
+    rng = np.random.default_rng(1)
+    ncells = 5000
+    clat = rng.uniform(45.5, 48.0, ncells)
+    clon = rng.uniform(5.5, 10.5, ncells)
+    tthrs = rng.uniform(100.0, 900.0, ncells)
+    ds = xr.Dataset(
+        utils.create_data_arrays(
+            {"BETUtthrs": tthrs}, clon, clat, np.datetime64("2024-02-01T12")
+        )
+    )
+    coord_stns = list(zip(rng.uniform(46, 47.5, 10), rng.uniform(6, 10, 10)))
+    change = rng.uniform(-50.0, 50.0, 10)
+    full = utils.interpolate(
+        change, ds, "BETUtthrs", coord_stns, Config(), method="sum"
+    )
+    chunked = utils.interpolate(
+        change, ds, "BETUtthrs", coord_stns, Config(chunk_size=999), method="sum"
+    )
+    np.testing.assert_allclose(chunked, full)
+
+
+def test_rbf_exact_reproduces_stations():
+    rng = np.random.default_rng(2)
+    coord_stns = list(zip(rng.uniform(46, 47.5, 12), rng.uniform(6, 10, 12)))
+    stns = np.array(coord_stns)
+    change = rng.uniform(0.8, 1.2, 12)
+    for metric in ["equirectangular", "haversine"]:
+        operator = utils.get_weight_operator(
+            stns[:, 0], stns[:, 1], coord_stns, "rbf_exact", 0.5, metric
+        )
+        at_stns = utils.apply_weight_operator(
+            change, operator, coord_stns, "rbf_exact", 0.5, metric, baseline=1.0
+        )
+        np.testing.assert_allclose(at_stns, change, rtol=1e-8)
+
+
+@pytest.mark.parametrize("use_scipy", [True, False])
+def test_rbf_station_system(use_scipy, monkeypatch):
+    if not use_scipy:
+        monkeypatch.setattr(rbf, "linalg", None)
+    rbf._factorize.cache_clear()  # pylint: disable=protected-access
+    rng = np.random.default_rng(3)
+    stns = np.column_stack([rng.uniform(46, 47.5, 10), rng.uniform(6, 10, 10)])
+    values = rng.uniform(-1, 1, (2, 10))
+    for metric in ["equirectangular", "haversine"]:
+        system = rbf.get_station_system(stns, 0.5, metric, 1e-3)
+        assert system.kind in (("cholesky", "lu") if rbf.linalg else ("inverse",))
+        matrix = rbf.kernel(
+            distance.station_distances(stns[:, 0], stns[:, 1], stns, metric), 0.5
+        ).T
+        np.fill_diagonal(matrix, 1.0 + 1e-3)
+        coefficients = rbf.get_coefficients(values, system)
+        np.testing.assert_allclose(coefficients @ matrix.T, values, atol=1e-8)
+    rbf._factorize.cache_clear()  # pylint: disable=protected-access
+
+
+def write_sample_grib(path, nmessages=5):
+    """Write messages of the GRIB2 sample, return their short name."""
+    with open(path, "wb") as fout:
+        for i in range(nmessages):
+            gid = eccodes.codes_grib_new_from_samples("GRIB2")
+            eccodes.codes_set_values(gid, np.arange(496, dtype=np.float64) + i)
+            eccodes.codes_write(gid, fout)
+            eccodes.codes_release(gid)
+    with open(path, "rb") as fin:
+        gid = eccodes.codes_grib_new_from_file(fin)
+        short_name = eccodes.codes_get_string(gid, "shortName")
+        eccodes.codes_release(gid)
+    return short_name
+
+
+def test_to_grib_workers(tmp_path):
+    inp = tmp_path / "in.grib2"
+    dict_fields = {write_sample_grib(inp): np.full(496, 2.0)}
+
+    utils.to_grib(str(inp), str(tmp_path / "serial.grib2"), dict_fields, 1)
+    utils.to_grib(str(inp), str(tmp_path / "threads.grib2"), dict_fields, 1, workers=3)
+
+    assert (tmp_path / "serial.grib2").read_bytes() == (
+        tmp_path / "threads.grib2"
+    ).read_bytes()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "in.grib2",
+        "serial.grib2",
+        "threads.grib2",
+    ]
+
+
+def test_to_grib_packing(tmp_path):
+    inp = tmp_path / "in.grib2"
+    outp = tmp_path / "out.grib2"
+    short_name = write_sample_grib(inp, 1)
+    dict_fields = {short_name: np.linspace(0.5, 3.0, 496)}
+
+    utils.to_grib(str(inp), str(outp), dict_fields, 1, packing={"bitsPerValue": 12})
+    with open(outp, "rb") as fin:
+        gid = eccodes.codes_grib_new_from_file(fin)
+        assert eccodes.codes_get(gid, "bitsPerValue") == 12
+        values = eccodes.codes_get_values(gid)
+        eccodes.codes_release(gid)
+    np.testing.assert_allclose(values[1:], dict_fields[short_name][1:], atol=1e-3)
+
+    with pytest.raises(utils.CalibrationError):
+        utils.to_grib(str(inp), str(outp), dict_fields, 1, packing={"bits": 12})
+
+
+def test_get_station_data_present():
+    headerdata = utils.HeaderData(
+        [(46.5, 7.0), (47.0, 8.5)], -9999.0, np.array(["PBS", "PBU"]), 0
+    )
+    data_obs = np.array([[-9999.0, 1.0], [2.0, 1.0], [4.0, 1.0], [60.0, 1.0]])
+    data_mod = np.full((4, 2), 3.0)
+    present = np.array([True, True, True, False])
+    obs_mod_data = utils.get_station_data(
+        "ALNU",
+        data_obs,
+        headerdata,
+        0,
+        data_mod,
+        {"PBS": 0, "PBU": 1},
+        verbose=False,
+        present=present,
+    )
+    # The hour without model data is not used for the missing value and
+    # is excluded from both series
+    np.testing.assert_array_equal(
+        obs_mod_data.data_obs, [[3.0, 1.0], [2.0, 1.0], [4.0, 1.0], [0.0, 0.0]]
+    )
+    np.testing.assert_array_equal(obs_mod_data.data_mod[3], [0.0, 0.0])
@@ -0,0 +1,33 @@
+"""Test module ``realtime_pollen_calibration/validation.py``."""
+
+import numpy as np
+
+from realtime_pollen_calibration import distance, rbf, utils
+from realtime_pollen_calibration.validation import loo_predictions
+
+
+def test_loo_predictions():
+    rng = np.random.default_rng(3)
+    stns = np.stack([rng.uniform(46, 47.5, 10), rng.uniform(6, 10, 10)], axis=1)
+    change = rng.uniform(0.8, 1.2, (2, 10))
+    dist = distance.station_distances(stns[:, 0], stns[:, 1], stns, "haversine")
+    system = rbf.get_station_system(stns, 0.5, "haversine", 1e-3)
+    for ipstyle in utils.ipstyles:
+        predictions = loo_predictions(
+            change, utils.get_kernel(dist, ipstyle, 0.5), ipstyle, system, baseline=1.0
+        )
+        # Refit without each station
+        for istation in range(10):
+            others = np.delete(np.arange(10), istation)
+            operator = utils.get_weight_operator(
+                stns[istation : istation + 1, 0],
+                stns[istation : istation + 1, 1],
+                stns[others],
+                ipstyle,
+                0.5,
+                "haversine",
+            )
+            expected = utils.apply_weight_operator(
+                change[:, others], operator, stns[others], ipstyle, 0.5, "haversine", 1e-3, 1.0
+            )
+            np.testing.assert_allclose(predictions[:, istation], expected[:, 0])
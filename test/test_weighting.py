@@ -0,0 +1,44 @@
+"""Test module ``realtime_pollen_calibration/weighting.py``."""
+
+import numpy as np
+import pytest
+
+from realtime_pollen_calibration import utils, weighting
+
+
+def test_kernel_bank():
+    kernels = {"exp24": {"kernel": "exponential", "half_life": 24}}
+    assert not weighting.check_kernels(kernels)
+
+    bank = utils.get_weight_bank(("constant", "exp24"), 120, kernels)
+    assert bank.shape == (2, 120)
+    np.testing.assert_allclose(bank[1, [0, 24, 48]], [1.0, 0.5, 0.25])
+    assert bank is utils.get_weight_bank(("constant", "exp24"), 120, kernels)
+    assert not bank.flags.writeable
+    np.testing.assert_array_equal(utils.get_weights("linear"), np.linspace(1, 0, 120))
+
+    with pytest.raises(utils.CalibrationError):
+        utils.get_weights("exp24")
+
+
+def test_check_kernels():
+    problems = weighting.check_kernels(
+        {
+            "linear": {"kernel": "exponential", "half_life": 1},
+            "a": {"kernel": "gaussian"},
+            "b": {"kernel": "exponential"},
+            "c": {"kernel": "exponential", "half_life": -1},
+            "d": {"kernel": "exponential", "half_life": True},
+        }
+    )
+    assert len(problems) == 5
+
+
+def test_kernel_orientation():
+    kernels = {"exp24": {"kernel": "exponential", "half_life": 24}}
+    # All kernels weigh the first hour of the window with 1 and decrease
+    for name in ("linear", "switch", "stepwise", "exp24"):
+        weights = weighting.get_kernel(name, 120, kernels)
+        assert weights[0] == pytest.approx(1.0, abs=1e-3)
+        assert np.all(np.diff(weights) <= 0)
+        assert weights[-1] < weights[0]
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Compare the ATAB body parser with the former pandas.read_csv parsing.
+
+Example:
+    python tools/bench_atab.py obs.atab --layout obs
+    python tools/bench_atab.py --generate 200 --hours 2400
+
+With --generate a synthetic observation file with the given number of
+stations is written to a temporary directory and parsed.
+"""
+
+# Standard library
+import argparse
+import os
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+# First-party
+from realtime_pollen_calibration import atab, utils
+
+
+def read_pandas(file_data: str, n_header: int, layout: str):
+    """Parsing of read_atab before the atab module."""
+    date_columns = [1, 2, 3, 4, 5] if layout == "obs" else [3, 4, 5, 6, 7]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        data = pd.read_csv(
+            file_data, header=n_header, sep=r"\s+", parse_dates=[date_columns]
+        )
+    return data.iloc[:, 2 if layout == "obs" else 4 :].to_numpy()
+
+
+def write_obs_file(path: str, nstns: int, hours: int) -> None:
+    """Write a synthetic observation ATAB file."""
+    rng = np.random.default_rng(0)
+    indicators = [f"P{i:03d}" for i in range(nstns)]
+    times = np.datetime64("2024-01-01T00:00") + np.arange(hours) * np.timedelta64(1, "h")
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("ATAB - Version 1.0\nMissing_value_code: -9999.0\n")
+        fh.write("Indicator: " + "\t".join(indicators) + "\n")
+        fh.write("Latitude: " + " ".join(["46.5"] * nstns) + "\n")
+        fh.write("Longitude: " + " ".join(["8.0"] * nstns) + "\n")
+        fh.write("PARAMETER YYYY MM DD hh mm " + " ".join(indicators) + "\n")
+        for pollen_type in utils.pollen_types:
+            values = rng.gamma(1.0, 10.0, size=(hours, nstns))
+            for t, row in zip(times.tolist(), values):
+                fh.write(
+                    f"{pollen_type} {t:%Y %m %d %H %M} "
+                    + " ".join(f"{v:.1f}" for v in row)
+                    + "\n"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("atab_file", nargs="?")
+    parser.add_argument("--layout", choices=list(atab.layouts), default="obs")
+    parser.add_argument("--generate", type=int, metavar="NSTNS")
+    parser.add_argument("--hours", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        atab_file = args.atab_file
+        if args.generate:
+            atab_file = os.path.join(tmp_dir, "obs.atab")
+            write_obs_file(atab_file, args.generate, args.hours)
+            args.layout = "obs"
+        _, headerdata = utils.read_atab_header(atab_file, args.layout)
+        print(f"{atab_file}: {os.path.getsize(atab_file)} bytes")
+
+        timings = {}
+        for name, parse in (
+            ("pandas.read_csv", read_pandas),
+            ("atab.read_body", lambda *a: atab.read_body(*a).values),
+        ):
+            elapsed = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                values = parse(atab_file, headerdata.n_header, args.layout)
+                elapsed.append(time.perf_counter() - start)
+            timings[name] = (min(elapsed), values)
+            print(f"{name:16s} {min(elapsed) * 1000:9.2f} ms")
+        reference, values = (timings[name][1] for name in timings)
+        print("identical values:", np.array_equal(reference.astype(np.float64), values))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Compare the NumPy interpolation with the fused numba kernel.
+
+Example:
+    python tools/bench_interpolation.py --cells 1000000 --stations 40
+    python tools/bench_interpolation.py --ipstyle rbf_g --chunk-size 100000
+
+The fields and stations are synthetic. The first call of the fused kernel
+includes the compilation by numba, it is reported separately.
+"""
+
+# Standard library
+import argparse
+import time
+
+import numpy as np
+import xarray as xr
+
+# First-party
+from realtime_pollen_calibration import fused, utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cells", type=int, default=1_000_000)
+    parser.add_argument("--stations", type=int, default=40)
+    parser.add_argument("--ipstyle", choices=list(fused.fused_ipstyles), default="idw")
+    parser.add_argument("--chunk-size", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    clat = rng.uniform(45.5, 48.0, args.cells)
+    clon = rng.uniform(5.5, 10.5, args.cells)
+    tune = rng.uniform(0.3, 3.0, args.cells)
+    tune[rng.random(args.cells) < 0.3] = 0
+    # Without the grid attribute the NumPy weight operator is not cached
+    ds = xr.Dataset(
+        utils.create_data_arrays(
+            {"ALNUtune": tune}, clon, clat, np.datetime64("2024-02-01T12")
+        )
+    )
+    coord_stns = list(
+        zip(rng.uniform(46, 47.5, args.stations), rng.uniform(6, 10, args.stations))
+    )
+    change = rng.uniform(0.8, 1.2, args.stations)
+    mask = tune != 0
+
+    if fused.numba is None:
+        print("numba is not installed, only the NumPy path is timed.")
+    results = {}
+    for backend in ("numpy", "numba"):
+        if backend == "numba" and fused.numba is None:
+            continue
+        config_obj = utils.Config(
+            ipstyle=args.ipstyle,
+            chunk_size=args.chunk_size,
+            interpolation_backend=backend,
+        )
+        elapsed = []
+        for _ in range(args.repeat + (backend == "numba")):
+            start = time.perf_counter()
+            results[backend] = utils.interpolate(
+                change, ds, "ALNUtune", coord_stns, config_obj, mask=mask
+            )
+            elapsed.append(time.perf_counter() - start)
+        if backend == "numba":
+            print(f"numba compilation and first call {elapsed.pop(0):9.3f} s")
+        print(f"{backend:5s} {min(elapsed):9.3f} s")
+    if len(results) == 2:
+        diff = np.max(np.abs(results["numba"] - results["numpy"]))
+        print(f"max abs difference: {diff:.3e}")
+
+
+if __name__ == "__main__":
+    main()
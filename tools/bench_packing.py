@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# Copyright (c) 2022 MeteoSwiss, contributors listed in AUTHORS
+
+# Distributed under the terms of the BSD 3-Clause License.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Compare output packings of the updated fields on a POV file.
+
+For each packing the fields of the POV file are re-encoded with
+utils.to_grib and the encode time, the decode time (all values of the
+output, as read by ICON), the file size and the max. error are printed.
+
+Example:
+    python tools/bench_packing.py POV_FILE \\
+        "" "bitsPerValue=16" "packingType=grid_ccsds,bitsPerValue=16" \\
+        "decimalPrecision=3"
+
+An empty string is the packing of the input file.
+"""
+
+# Standard library
+import argparse
+import os
+import tempfile
+import time
+
+import eccodes  # type: ignore
+import numpy as np
+
+# First-party
+from realtime_pollen_calibration import utils
+
+
+def parse_packing(text: str) -> dict:
+    """Parse "key=value,key=value" into a packing dictionary."""
+    packing = {}
+    for item in filter(None, text.split(",")):
+        key, value = item.split("=")
+        packing[key] = value if key == "packingType" else int(value)
+    return packing
+
+
+def read_fields(pov_file: str) -> dict:
+    """Read the values of all messages of a GRIB file by short name."""
+    fields = {}
+    with open(pov_file, "rb") as fh:
+        while True:
+            gid = eccodes.codes_grib_new_from_file(fh)
+            if gid is None:
+                break
+            fields[eccodes.codes_get_string(gid, "shortName")] = (
+                eccodes.codes_get_values(gid)
+            )
+            eccodes.codes_release(gid)
+    return fields
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pov_file")
+    parser.add_argument("packings", nargs="*", default=[""])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fields = read_fields(args.pov_file)
+    print(f"{len(fields)} fields, input size {os.path.getsize(args.pov_file)} bytes")
+    print(f"{'packing':45s} {'encode_s':>9s} {'decode_s':>9s} {'bytes':>12s} {'max_err':>10s}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        outp = os.path.join(tmp_dir, "out.grib2")
+        for text in args.packings:
+            packing = parse_packing(text)
+            encode = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                utils.to_grib(
+                    args.pov_file, outp, fields, 0, workers=args.workers, packing=packing
+                )
+                encode.append(time.perf_counter() - start)
+            decode = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                decoded = read_fields(outp)
+                decode.append(time.perf_counter() - start)
+            max_err = max(
+                float(np.max(np.abs(decoded[name] - values)))
+                for name, values in fields.items()
+            )
+            print(
+                f"{text or 'input':45s} {min(encode):9.3f} {min(decode):9.3f}",
+                f"{os.path.getsize(outp):12d} {max_err:10.3g}",
+            )
+
+
+if __name__ == "__main__":
+    main()